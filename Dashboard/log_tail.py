@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+THAW - Incremental pipeline log reader
+
+The dashboard refreshes pipeline logs every few seconds while a run is
+active. Instead of re-reading the whole log each time, the reader keeps the
+byte offset and the last lines of every log in st.session_state and only
+reads what was appended since the previous refresh.
+
+Terminal status comes from the sidecar <log>_status.json written by the
+pipeline Logger (GEE/drive_io.py); the sidecar names and the status writer
+are shared with it in GEE/run_files.py. Logs without a sidecar (older runs) fall
+back to the PIPELINE_SUCCESS / PIPELINE_ERROR markers seen while tailing.
+
+Progress bars and ETAs come from the JSON-lines event file <log>_events.jsonl
+(see drive_io.emit). Events are folded into a small summary as they are read,
+again from the last byte offset only.
+"""
+
+import os
+import sys
+import json
+import time
+from collections import deque
+
+import streamlit as st
+
+GEE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "GEE")
+if GEE_DIR not in sys.path:
+    sys.path.insert(0, GEE_DIR)
+
+from run_files import events_path_for, status_path_for  # noqa: E402
+
+MAX_LINES = 300  # lines kept and shown per log
+_STATE_KEY = "log_tails"
+_EVENTS_KEY = "log_events"
+
+
+def read_status_file(log_path):
+    """Status from the sidecar file ('running' | 'success' | 'failed'), or None if absent."""
+    try:
+        with open(status_path_for(log_path), encoding="utf-8") as f:
+            return json.load(f).get("status")
+    except (OSError, ValueError):
+        return None
+
+
+def _marker_status(text):
+    if "PIPELINE_SUCCESS" in text:
+        return "success"
+    if "PIPELINE_ERROR" in text:
+        return "failed"
+    return None
+
+
+def tail_log(log_path, max_lines=MAX_LINES):
+    """
+    Read the lines appended to a log since the last call and return its tail.
+
+    Parameters
+    ----------
+    log_path : str
+        Pipeline or tracking log file.
+    max_lines : int
+        Number of trailing lines kept per log.
+
+    Returns
+    -------
+    (text, status, truncated)
+        text      — last max_lines lines of the log
+        status    — 'running' | 'success' | 'failed'
+        truncated — True if earlier lines are not shown
+    """
+    tails = st.session_state.setdefault(_STATE_KEY, {})
+    state = tails.get(log_path)
+    try:
+        size = os.path.getsize(log_path)
+    except OSError:
+        size = 0
+
+    # New log, changed line budget, or a rewritten (shorter) file: start over
+    if state is None or state["lines"].maxlen != max_lines or size < state["offset"]:
+        state = {"offset": 0, "lines": deque(maxlen=max_lines), "partial": b"",
+                 "n_lines": 0, "marker": None}
+        tails[log_path] = state
+
+    if size > state["offset"]:
+        with open(log_path, "rb") as f:
+            f.seek(state["offset"])
+            chunk = state["partial"] + f.read(size - state["offset"])
+        state["offset"] = size
+        # Keep an unterminated last line (or split UTF-8 sequence) for the next read
+        complete, newline, state["partial"] = chunk.rpartition(b"\n")
+        if newline:
+            text = complete.decode("utf-8", errors="replace")
+            new_lines = text.split("\n")
+            state["lines"].extend(new_lines)
+            state["n_lines"] += len(new_lines)
+            state["marker"] = _marker_status(text) or state["marker"]
+
+    lines = list(state["lines"])
+    if state["partial"]:
+        lines.append(state["partial"].decode("utf-8", errors="replace"))
+    status = (read_status_file(log_path)
+              or state["marker"]
+              or _marker_status(lines[-1] if lines else "")
+              or "running")
+    return "\n".join(lines), status, state["n_lines"] > len(state["lines"])
+
+
+def log_status(log_path):
+    """Status of a run log, from the sidecar if present, else by tailing the log."""
+    return read_status_file(log_path) or tail_log(log_path)[1]
+
+
+# ── progress events ────────────────────────────────────────────────────────
+
+def _new_summary():
+    return {
+        "pipeline": None, "stages": None, "started": None, "stage": None,
+        "stage_index": 0, "stage_started": None, "stages_done": 0,
+        "files_total": 0, "files_done": 0, "bytes": 0, "first_download": None,
+        "tasks": {}, "retries": 0, "errors": [], "status": None, "updated": None,
+    }
+
+
+def _fold_event(summary, ev):
+    """Update a progress summary with one event."""
+    kind, t = ev.get("event"), ev.get("t")
+    summary["updated"] = t
+    if kind == "pipeline_start":
+        summary.update(pipeline=ev.get("pipeline"), stages=ev.get("stages"), started=t)
+    elif kind == "stage_start":
+        summary.update(stage=ev.get("stage"), stage_index=ev.get("index", 0),
+                       stages=ev.get("total", summary["stages"]), stage_started=t)
+    elif kind == "stage_end":
+        summary["stages_done"] = max(summary["stages_done"], ev.get("index", 0))
+        if ev.get("status") == "failed":
+            summary["errors"].append(f"{ev.get('stage')}: {ev.get('error', '')}")
+    elif kind == "downloads_planned":
+        summary["files_total"] += ev.get("total", 0)
+    elif kind == "task_state":
+        summary["tasks"][ev.get("label")] = ev.get("state")
+    elif kind == "file_downloaded":
+        summary["files_done"] += 1
+        summary["bytes"] += ev.get("bytes", 0)
+        if summary["first_download"] is None:
+            summary["first_download"] = t
+    elif kind == "retry":
+        summary["retries"] += 1
+    elif kind == "error":
+        summary["errors"].append(f"{ev.get('label')}: {ev.get('message', '')}")
+    elif kind == "pipeline_end":
+        summary["status"] = ev.get("status")
+
+
+def read_progress(log_path):
+    """
+    Progress summary of a run from its event file, or None if it has none.
+
+    Only events appended since the previous call are parsed; the folded
+    summary is kept in st.session_state.
+    """
+    path = events_path_for(log_path)
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return None
+    states = st.session_state.setdefault(_EVENTS_KEY, {})
+    state = states.get(path)
+    if state is None or size < state["offset"]:
+        state = {"offset": 0, "partial": b"", "summary": _new_summary()}
+        states[path] = state
+    if size > state["offset"]:
+        with open(path, "rb") as f:
+            f.seek(state["offset"])
+            chunk = state["partial"] + f.read(size - state["offset"])
+        state["offset"] = size
+        complete, _, state["partial"] = chunk.rpartition(b"\n")
+        for line in complete.splitlines():
+            try:
+                _fold_event(state["summary"], json.loads(line))
+            except ValueError:
+                continue
+    return state["summary"]
+
+
+def _fmt_duration(seconds):
+    seconds = int(max(seconds, 0))
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+def progress_estimate(summary, now=None):
+    """
+    Overall fraction, label and ETA (seconds or None) from a progress summary.
+
+    Within the download stage the fraction follows the downloaded files and
+    the ETA extrapolates the mean time per file; other stages count as one
+    step each.
+    """
+    now = now or time.time()
+    total = summary["stages"] or 1
+    index = summary["stage_index"]
+    frac_in_stage, eta = 0.0, None
+    if summary["stage"] == "download" and summary["files_total"]:
+        done, n = summary["files_done"], summary["files_total"]
+        frac_in_stage = min(done / n, 1.0)
+        if 0 < done < n:
+            t0 = summary["stage_started"] or summary["first_download"]
+            eta = (now - t0) / done * (n - done)
+    done_stages = summary["stages_done"]
+    frac = min((done_stages + (frac_in_stage if index > done_stages else 0)) / total, 1.0)
+    if summary["status"] == "success":
+        frac = 1.0
+    label = f"Step {index}/{total}: {summary['stage']}" if summary["stage"] else "Preparing..."
+    return frac, label, eta
+
+
+def show_progress(log_path):
+    """Progress bar and one-line status of a run, if it writes progress events."""
+    summary = read_progress(log_path)
+    if summary is None or summary["pipeline"] is None:
+        return
+    frac, label, eta = progress_estimate(summary)
+    st.progress(frac, text=label)
+    parts = []
+    if summary["files_total"]:
+        parts.append(f"{summary['files_done']}/{summary['files_total']} files")
+    if summary["bytes"]:
+        parts.append(f"{summary['bytes'] / 1e6:.1f} MB downloaded")
+    pending = [s for s in summary["tasks"].values() if s in ("READY", "RUNNING")]
+    if pending:
+        parts.append(f"{len(pending)} GEE task(s) pending")
+    if summary["started"]:
+        parts.append(f"elapsed {_fmt_duration(time.time() - summary['started'])}")
+    if eta is not None:
+        parts.append(f"ETA {_fmt_duration(eta)}")
+    if summary["retries"]:
+        parts.append(f"{summary['retries']} retr{'y' if summary['retries'] == 1 else 'ies'}")
+    if parts:
+        st.caption(" · ".join(parts))
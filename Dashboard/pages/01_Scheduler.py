@@ -9,7 +9,6 @@ Created in Feb 2026
 """
 
 import os
-import glob
 import json
 import subprocess
 import sys
@@ -18,13 +17,15 @@ import requests
 import pandas as pd  # Added for GLOF CSV processing
 import rasterio
 from rasterio.warp import transform_bounds
-from datetime import datetime, date as dt_date
+from datetime import date as dt_date
 import streamlit as st
 import folium
 from folium.plugins import Draw
 from folium import MacroElement
 from jinja2 import Template
 from streamlit_folium import st_folium
+from log_tail import MAX_LINES, show_progress, tail_log
+from run_files import write_status_file  # GEE/ is on sys.path via log_tail
 
 # 1. Function Definitions
 def load_gee_creds():
@@ -116,6 +117,9 @@ TEMP_DIR = os.path.join(ROOT_DIR, "temp")
 CRED_FILE = os.path.join(TEMP_DIR, "gee_credentials.txt")
 DRIVE_TOKEN_FILE = os.path.join(TEMP_DIR, "drive_token.json")
 GEE_DIR = os.path.join(ROOT_DIR, "GEE")
+if GEE_DIR not in sys.path:
+    sys.path.insert(0, GEE_DIR)
+from catalog import artifacts, ensure_catalog, recent_folders
 OUTPUT_DIR = os.path.join(ROOT_DIR, "Outputs")
 CONFIG_DIR = os.path.join(ROOT_DIR, "config")
 os.makedirs(CONFIG_DIR, exist_ok=True)
@@ -131,17 +135,9 @@ if not project_id:
     st.stop()
 
 # 4. Data Discovery
-output_folders = glob.glob(os.path.join(OUTPUT_DIR, "Outputs_*"))
-dated_folders = []
-for f in output_folders:
-    try:
-        suffix = os.path.basename(f).replace("Outputs_", "", 1)
-        folder_date = datetime.strptime(suffix[:10], "%Y-%m-%d")
-        dated_folders.append((f, folder_date))
-    except ValueError:
-        continue
-
-dated_folders.sort(key=lambda x: x[1], reverse=True)
+# Outputs folders are listed from the SQLite catalog the pipelines keep up to
+# date; the first visit scans folders written before the catalog existed.
+ensure_catalog(OUTPUT_DIR)
 
 # 5. UI Header and Map Setup
 st.title("THAW Task Manager and Scheduler")
@@ -397,8 +393,9 @@ if run_now_clicked:
         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
     )
     st.session_state.pipeline_running = False
-    _time.sleep(8)
-    st.rerun()
+    # The log panel below polls until the new run shows up
+    st.session_state.pipeline_launched_at = _time.time()
+    status_container.empty()
 
 # 9. Execution Task Scheduling
 if schedule_clicked:
@@ -435,16 +432,6 @@ if schedule_clicked:
 st.divider()
 st.subheader("Pipeline Logs")
 
-def _get_log_status(log_path):
-    with open(log_path, encoding="utf-8", errors="replace") as f:
-        content = f.read()
-    if "PIPELINE_SUCCESS" in content:
-        return "success", content
-    elif "PIPELINE_ERROR" in content:
-        return "failed", content
-    else:
-        return "running", content
-
 def _is_pid_running(pid):
     try:
         out = subprocess.check_output(
@@ -455,61 +442,107 @@ def _is_pid_running(pid):
     except Exception:
         return False
 
-recent_folders = sorted(
-    [f for f, _ in dated_folders],
-    key=lambda f: (
-        0 if os.path.exists(os.path.join(f, "pipeline.pid")) else 1,
-        -os.path.getmtime(f),
-    ),
-)[:4]
-any_running = False
-for folder in recent_folders:
-    folder_name = os.path.basename(folder)
-    log_files = sorted(glob.glob(os.path.join(folder, "pipeline_log_*.txt")))
-    if not log_files:
-        folder_age = _time.time() - os.path.getmtime(folder)
-        if folder_age < 300:
+_LAUNCH_TIMEOUT_S = 120  # stop waiting for a launched run that never writes a log
+
+def _scan_pipeline_logs():
+    """
+    Status of the four most recent output folders, running ones first.
+    Returns a list of (folder, log_path or None, status, log tail, truncated) with
+    status in 'running' | 'success' | 'failed' | 'starting' | 'none'. Logs are
+    read incrementally (see log_tail), so a refresh only reads new lines.
+    """
+    # Most recently updated folders from the catalog, running ones first
+    recent = sorted(
+        [f for f in recent_folders(OUTPUT_DIR, limit=8) if os.path.isdir(f)],
+        key=lambda f: 0 if os.path.exists(os.path.join(f, "pipeline.pid")) else 1,
+    )[:4]
+    runs = []
+    for folder in recent:
+        log_files = artifacts(OUTPUT_DIR, folder, "pipeline_log")
+        if not log_files:
+            folder_age = _time.time() - os.path.getmtime(folder)
+            runs.append((folder, None, "starting" if folder_age < 300 else "none", "", False))
+            continue
+        content, status, truncated = tail_log(log_files[0])
+        runs.append((folder, log_files[0], status, content, truncated))
+    return runs
+
+def _launch_pending(runs):
+    """True while a manually launched run has not yet written a log file."""
+    launched_at = st.session_state.get("pipeline_launched_at")
+    if not launched_at:
+        return False
+    if _time.time() - launched_at > _LAUNCH_TIMEOUT_S or any(
+        log and os.path.getmtime(log) >= launched_at - 5 for _, log, _, _, _ in runs
+    ):
+        st.session_state.pop("pipeline_launched_at", None)
+        return False
+    return True
+
+def _needs_polling(runs):
+    return _launch_pending(runs) or any(status in ("running", "starting") for _, _, status, _, _ in runs)
+
+def _pipeline_logs(polling):
+    """
+    Log panel of recent pipeline runs. Runs as a fragment that refreshes on its
+    own every few seconds while a pipeline is active, so the map and the rest of
+    the page are not rebuilt; once everything has finished, one full rerun
+    switches polling off again.
+    """
+    runs = _scan_pipeline_logs()
+    if polling and not _needs_polling(runs):
+        st.rerun()
+
+    if _launch_pending(runs):
+        st.info("Starting pipeline, please wait...")
+
+    for folder, log_path, status, content, truncated in runs:
+        folder_name = os.path.basename(folder)
+        if status == "none":
+            continue
+        if status == "starting":
             st.markdown(f"**[Starting] {folder_name}**")
             st.info("Pipeline starting, please wait...")
-            _time.sleep(2)
-            st.rerun()
-        continue
-    status, content = _get_log_status(log_files[-1])
-
-    pid_file = os.path.join(folder, "pipeline.pid")
-
-    if status == "running":
-        any_running = True
-        st.markdown(f"**[Running] {folder_name}**")
-        st.code(content)
-        if os.path.exists(pid_file):
-            try:
-                _pid = int(open(pid_file).read().strip())
-                if st.button("Cancel", key=f"cancel_{folder_name}"):
-                    if _is_pid_running(_pid):
-                        subprocess.call(["taskkill", "/F", "/PID", str(_pid)])
-                    try:
-                        os.remove(pid_file)
-                    except Exception:
-                        pass
-                    with open(log_files[-1], "a", encoding="utf-8") as _lf:
-                        _lf.write("\nPIPELINE_ERROR: Cancelled by user.\n")
-                    st.rerun()
-            except Exception:
-                pass
-    else:
-        label = (
-            f"[Done] {folder_name}"   if status == "success" else
-            f"[Failed] {folder_name}"
-        )
-        with st.expander(label, expanded=False):
-            if status == "success":
-                st.success(f"Pipeline complete! Files saved in: {folder}")
-            st.code(content)
+            continue
 
-if any_running:
-    _time.sleep(3)
-    st.rerun()
+        pid_file = os.path.join(folder, "pipeline.pid")
+
+        if status == "running":
+            st.markdown(f"**[Running] {folder_name}**")
+            show_progress(log_path)
+            if truncated:
+                st.caption(f"Showing the last {MAX_LINES} lines of {os.path.basename(log_path)}")
+            st.code(content)
+            if os.path.exists(pid_file):
+                try:
+                    _pid = int(open(pid_file).read().strip())
+                    if st.button("Cancel", key=f"cancel_{folder_name}"):
+                        if _is_pid_running(_pid):
+                            subprocess.call(["taskkill", "/F", "/PID", str(_pid)])
+                        try:
+                            os.remove(pid_file)
+                        except Exception:
+                            pass
+                        with open(log_path, "a", encoding="utf-8") as _lf:
+                            _lf.write("\nPIPELINE_ERROR: Cancelled by user.\n")
+                        write_status_file(log_path, "failed", "Cancelled by user.")
+                        st.rerun(scope="fragment")
+                except Exception:
+                    pass
+        else:
+            label = (
+                f"[Done] {folder_name}"   if status == "success" else
+                f"[Failed] {folder_name}"
+            )
+            with st.expander(label, expanded=False):
+                if status == "success":
+                    st.success(f"Pipeline complete! Files saved in: {folder}")
+                if truncated:
+                    st.caption(f"Showing the last {MAX_LINES} lines of {os.path.basename(log_path)}")
+                st.code(content)
+
+_polling = _needs_polling(_scan_pipeline_logs())
+st.fragment(_pipeline_logs, run_every=3 if _polling else None)(_polling)
 
 # 11. Active Scheduled Tasks
 st.divider()
@@ -1,9 +1,9 @@
 # -*- coding: utf-8 -*-
-import re as _re
 import streamlit as st
 import os
 import glob
 import numpy as np
+import pandas as pd
 import folium
 import json
 import csv
@@ -18,9 +18,10 @@ from folium.plugins import MeasureControl, Draw, Fullscreen
 from folium import MacroElement
 from jinja2 import Template
 from tracking_viewer import render_tracking_viewer
+from log_tail import MAX_LINES, log_status, show_progress, tail_log
+from run_files import write_status_file  # GEE/ is on sys.path via log_tail
 import matplotlib.pyplot as plt
 from PIL import Image
-import time as _time
 
 # --- 1. Function Definitions ---
 
@@ -56,10 +57,8 @@ def generate_tracking_report(tracking_dir, task_date, task_name, folder_path=Non
     z_score overlay as an interactive Folium iframe.
     Returns (html_bytes, filename) or (None, None) if no data found.
     """
-    import pandas as pd
-    from tracking_viewer import (
-        PANEL_CFG, _read_masked, _render_to_pil, _discover_frames
-    )
+    from tracking_viewer import PANEL_CFG, _discover_frames
+    from rendering import cached_panel
     from PIL import ImageDraw, ImageFont
 
     frames = _discover_frames(tracking_dir)
@@ -76,11 +75,7 @@ def generate_tracking_report(tracking_dir, task_date, task_name, folder_path=Non
         panels, captions = [], []
         for band, cfg in PANEL_CFG.items():
             try:
-                data = _read_masked(frame[band])
-                im   = _render_to_pil(data, cfg["cmap"], cfg["vmin"], cfg["vmax"], cfg["nan_fill"])
-                ratio = PANEL_W / im.width
-                im = im.resize((PANEL_W, max(1, int(im.height * ratio))), Image.LANCZOS)
-                panels.append(im)
+                panels.append(cached_panel(tracking_dir, frame[band], band, PANEL_W))
             except Exception:
                 panels.append(Image.new("RGB", (PANEL_W, PANEL_W), (80, 80, 80)))
             captions.append(cfg["label"])
@@ -234,12 +229,7 @@ def generate_tracking_report(tracking_dir, task_date, task_name, folder_path=Non
                     wgs = transform_bounds(_MERC, "EPSG:4326",
                                            dt.c, dt.f + dt.e * dh,
                                            dt.c + dt.a * dw, dt.f)
-                nodata_mask = np.isnan(dst)
-                norm = np.clip((dst - VIS["min"]) / (VIS["max"] - VIS["min"]), 0, 1)
-                norm[nodata_mask] = 0.0
-                cmap_ = plt.get_cmap(VIS["palette"])
-                rgba  = (cmap_(norm) * 255).astype(np.uint8)
-                rgba[nodata_mask, 3] = 0
+                rgba = colorize(dst, VIS["palette"], VIS["min"], VIS["max"], alpha=True)
                 buf_ = BytesIO()
                 Image.fromarray(rgba, mode="RGBA").save(buf_, format="PNG")
                 z_b64 = base64.b64encode(buf_.getvalue()).decode()
@@ -443,38 +433,15 @@ def write_timetrack_config(folder_path, aoi, start_date, end_date, selected_ids,
     return cfg_path
 
 def _discover_tracking_runs(folder_path):
-    """Return [(label, path), …] in display order: legacy first (empty label), then Tracking 1, 2, …"""
-    import re as _re_runs
-    runs = []
-    legacy = os.path.join(folder_path, "tracking_results")
-    if os.path.isdir(legacy):
-        runs.append(("Tracking", legacy))
-    numbered = []
-    try:
-        for entry in os.scandir(folder_path):
-            if not entry.is_dir():
-                continue
-            m = _re_runs.fullmatch(r"tracking_results_(\d+)", entry.name)
-            if m:
-                numbered.append((int(m.group(1)), entry.path))
-    except OSError:
-        pass
-    for n, path in sorted(numbered, key=lambda x: x[0]):
-        runs.append((f"Tracking {n}", path))
-    return runs
+    """Return [(label, path), …] in display order: legacy first, then Tracking 1, 2, … (from the catalog)."""
+    return tracking_runs(OUTPUT_DIR, folder_path)
 
 def _get_run_status(tracking_dir):
     """Return 'idle' | 'running' | 'success' | 'failed' for one tracking dir."""
-    log_files = sorted(glob.glob(os.path.join(tracking_dir, "tracking_log_*.txt")))
+    log_files = artifacts(OUTPUT_DIR, tracking_dir, "tracking_log")
     if not log_files:
         return "idle"
-    with open(log_files[-1], encoding="utf-8", errors="replace") as _f:
-        content = _f.read()
-    if "PIPELINE_SUCCESS" in content:
-        return "success"
-    if "PIPELINE_ERROR" in content:
-        return "failed"
-    return "running"
+    return log_status(log_files[0])
 
 # --- 2. Directory & Auth Setup ---
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__)) 
@@ -487,6 +454,12 @@ GEE_DIR = os.path.join(ROOT_DIR, "GEE")
 OUTPUT_DIR = os.path.join(ROOT_DIR, "Outputs")
 CONFIG_DIR = os.path.join(ROOT_DIR, "config")
 os.makedirs(CONFIG_DIR, exist_ok=True)
+if GEE_DIR not in sys.path:
+    sys.path.insert(0, GEE_DIR)
+from rendering import VIS_BY_LAYER, colorize
+from catalog import artifacts, backfill, cluster_history, ensure_catalog, list_folders, tracking_runs
+from cube import find_cubes, point_history
+from tile_server import TileServer, register_layer
 
 # Load GEE Credentials (Same as Scheduler)
 project_id, _ = load_gee_creds()
@@ -516,29 +489,14 @@ st.markdown(
 )
 
 # --- 4. Visualization & Data Discovery ---
-VIS_BY_LAYER = {
-    "z_score": {"min": -2, "max": 2, "palette": "RdYlGn"},
-    "potential_water": {"min": 0, "max": 1, "palette": "Blues"},
-    "mean_diff": {"min": -5, "max": 5, "palette": "RdBu"},
-}
-
-output_folders = glob.glob(os.path.join(OUTPUT_DIR, "Outputs_*"))
-_DATE_RE = _re.compile(r"(\d{4}-\d{2}-\d{2})")
-dated_folders = []
-for f in output_folders:
-    suffix = os.path.basename(f).replace("Outputs_", "", 1)
-    m = _DATE_RE.search(suffix)
-    if not m:
-        continue
-    try:
-        folder_date = datetime.strptime(m.group(1), "%Y-%m-%d")
-    except ValueError:
-        continue
-    # Everything after the matched date (and any leading underscore) is the location
-    remainder = suffix[m.end():]
-    location = remainder.lstrip("_")
-    dated_folders.append((f, folder_date, location))
-dated_folders.sort(key=lambda x: (x[1], x[2]), reverse=True)
+# Outputs folders and their files are looked up in the SQLite catalog the
+# pipelines keep up to date; the first visit scans older folders once.
+ensure_catalog(OUTPUT_DIR)
+if st.sidebar.button("Rescan Outputs folder", help="Rebuild the output catalog from the files on disk, "
+                     "e.g. after copying or deleting Outputs folders by hand."):
+    with st.spinner("Scanning Outputs folder..."):
+        backfill(OUTPUT_DIR)
+dated_folders = list_folders(OUTPUT_DIR)
 
 if not dated_folders:
     st.info("No data found.")
@@ -569,7 +527,11 @@ selected_display = st.sidebar.selectbox("Date", date_options)
 selected_idx = date_options.index(selected_display)
 folder_path, selected_folder_dt, _ = dated_folders[selected_idx]
 selected_folder_date = selected_folder_dt.strftime("%Y-%m-%d")
-tif_files = glob.glob(os.path.join(folder_path, "*_cog.tif"))
+if not os.path.isdir(folder_path):
+    # Folder removed outside the dashboard: resync the catalog and start over
+    backfill(OUTPUT_DIR)
+    st.rerun()
+tif_files = artifacts(OUTPUT_DIR, folder_path, "cog")
 
 st.title(f"Preview: {selected_folder_date}")
 st.caption(f"Connected to GEE Project: `{project_id}`")
@@ -667,12 +629,7 @@ def _render_tif(tif_path, vis_min, vis_max, palette, mask_below_zero, mtime):
         merc_e = merc_w + dst_transform.a * dst_w
         merc_s = merc_n + dst_transform.e * dst_h
         tb = transform_bounds(_MERCATOR, 'EPSG:4326', merc_w, merc_s, merc_e, merc_n)
-        nodata_mask = np.isnan(dst)
-        norm = np.clip((dst - vis_min) / (vis_max - vis_min), 0, 1)
-        norm[nodata_mask] = 0.0
-        cmap = plt.get_cmap(palette)
-        rgba = (cmap(norm) * 255).astype(np.uint8)
-        rgba[nodata_mask, 3] = 0
+        rgba = colorize(dst, palette, vis_min, vis_max, alpha=True)
         img_io = BytesIO()
         Image.fromarray(rgba, mode='RGBA').save(img_io, format='PNG')
         img_io.seek(0)
@@ -680,16 +637,43 @@ def _render_tif(tif_path, vis_min, vis_max, palette, mask_below_zero, mtime):
     except Exception:
         return None
 
-# Add TIF Layers
+@st.cache_resource(show_spinner=False)
+def _tile_server():
+    """Local XYZ tile server, started once per Streamlit process (None if it cannot start)."""
+    try:
+        return TileServer()
+    except Exception:
+        return None
+
+def _add_tile_layer(server, tif, vis, layer_label):
+    """Add a COG as an on-demand XYZ tile layer; returns False if the file cannot be tiled."""
+    try:
+        with rasterio.open(tif) as src:
+            w, s_, e, n = transform_bounds(src.crs, 'EPSG:4326', *src.bounds)
+        token = register_layer(tif, vis['min'], vis['max'], vis['palette'],
+                               mask_below_zero=vis.get('mask_below_zero', False))
+    except Exception:
+        return False
+    folium.TileLayer(
+        tiles=server.tile_url(token), attr="THAW", name=layer_label,
+        overlay=True, control=True, opacity=0.7, max_zoom=20,
+        bounds=[[s_, w], [n, e]],
+    ).add_to(m)
+    return True
+
+# Add TIF Layers — served as XYZ tiles, base64 overlays only as a fallback
 if tif_files:
+    tile_server = _tile_server()
     with st.spinner("Loading map layers..."):
         for tif in tif_files:
             basename = os.path.basename(tif)
             vis = get_vis_params(basename)
             # Use readable label from VIS_BY_LAYER instead of raw filename
             layer_label = next((k.replace("_", " ").title() for k in VIS_BY_LAYER if k in basename), basename)
+            if tile_server is not None and _add_tile_layer(tile_server, tif, vis, layer_label):
+                continue
             result = _render_tif(tif, vis['min'], vis['max'], vis['palette'],
-                                 'potential_water' in basename, os.path.getmtime(tif))
+                                 vis.get('mask_below_zero', False), os.path.getmtime(tif))
             if result:
                 img_b64, south, west, north, east = result
                 folium.raster_layers.ImageOverlay(
@@ -726,12 +710,68 @@ for _bb_label, _bb_dir in _all_runs:
         pass
 
 # Handle Clusters GeoJson
-geojson_files = glob.glob(os.path.join(folder_path, "detected_clusters*.geojson"))
-if geojson_files:
-    geojson_files.sort(key=os.path.getmtime, reverse=True)
+@st.cache_data(show_spinner=False)
+def _load_candidates(npz_path, mtime):
+    from reporting import load_z_candidates
+    return load_z_candidates(npz_path)
+
+@st.cache_data(show_spinner=False)
+def _recluster(npz_path, mtime, z_thres, min_size_cluster, pix):
+    """Re-cluster from the sparse candidate cache. Cached by (path, mtime, parameters)."""
+    from reporting import recluster_from_candidates
+    return recluster_from_candidates(_load_candidates(npz_path, mtime), z_thres, min_size_cluster, pix)
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _cluster_history_props(geometries_json, until_date):
+    """Popup fields (first seen, times flagged, area trend) of each polygon, up to until_date."""
+    props = []
+    for h in cluster_history(OUTPUT_DIR, json.loads(geometries_json), until_date):
+        areas = h["areas"]
+        if len(areas) >= 2:
+            (d0, a0), (d1, a1) = areas[0], areas[-1]
+            change = f" ({(a1 - a0) / a0:+.0%})" if a0 else ""
+            trend = f"{a0:,.0f} m² ({d0}) → {a1:,.0f} m² ({d1}){change}"
+        elif areas:
+            trend = f"{areas[0][1]:,.0f} m² (first detection)"
+        else:
+            trend = "—"
+        props.append({
+            "first_seen": h["first_seen"] or "—",
+            "times_flagged": h["times_flagged"],
+            "area_trend": trend,
+        })
+    return props
+
+# Interactive re-clustering from the candidate cache written by the lakedetection run
+gj = None
+recluster_rows = None
+candidate_files = artifacts(OUTPUT_DIR, folder_path, "z_candidates")
+if candidate_files:
+    _cand_path = candidate_files[0]
+    _cand_mtime = os.path.getmtime(_cand_path)
+    try:
+        _cand = _load_candidates(_cand_path, _cand_mtime)
+        st.sidebar.header("Cluster detection")
+        _z_thres = st.sidebar.slider("z-score threshold", -5.0, -0.5, float(_cand["z_thres"]), 0.1,
+                                     key=f"z_thres_{folder_path}")
+        _min_size = st.sidebar.slider("Min. cluster size (pixels)", 3, 100, int(_cand["min_size_cluster"]),
+                                      key=f"min_size_{folder_path}")
+        _eps = st.sidebar.slider("Neighbourhood radius (pixels)", 1, 15, int(_cand["pix"]),
+                                 key=f"eps_{folder_path}")
+        if (_z_thres, _min_size, _eps) != (float(_cand["z_thres"]), int(_cand["min_size_cluster"]), int(_cand["pix"])):
+            with st.spinner("Re-clustering..."):
+                gj, recluster_rows = _recluster(_cand_path, _cand_mtime, _z_thres, _min_size, _eps)
+            st.sidebar.caption(f"Showing re-clustered result ({len(recluster_rows)} polygons). "
+                               "Saved clusters are unchanged.")
+    except Exception as e:
+        st.sidebar.warning(f"Could not re-cluster: {e}")
+
+geojson_files = artifacts(OUTPUT_DIR, folder_path, "clusters")
+if gj is None and geojson_files:
     with open(geojson_files[0], "r", encoding="utf-8") as fh:
         gj = json.load(fh)
 
+if gj is not None:
     # Inject centroid lat/lon into properties from geometry if not already present
     for feat in gj.get("features", []):
         props = feat.get("properties") or {}
@@ -754,6 +794,16 @@ if geojson_files:
             except Exception:
                 pass
 
+    # Detection history of each polygon across all catalogued runs (R*Tree query)
+    try:
+        _history = _cluster_history_props(json.dumps([f.get("geometry") for f in gj.get("features", [])]),
+                                          selected_folder_date)
+        for feat, hist in zip(gj.get("features", []), _history):
+            feat["properties"] = {**(feat.get("properties") or {}), **hist}
+    except Exception as e:
+        _history = []
+        st.sidebar.warning(f"Cluster history unavailable: {e}")
+
     _sample_props = next(
         (f["properties"] for f in gj.get("features", []) if f.get("properties")), {}
     )
@@ -766,9 +816,14 @@ if geojson_files:
     _tooltip_fields  = [f for f in _field_map if f in _sample_props]
     _tooltip_aliases = [_field_map[f] for f in _tooltip_fields]
     _tooltip = folium.GeoJsonTooltip(fields=_tooltip_fields, aliases=_tooltip_aliases) if _tooltip_fields else None
+    _id_field = ["cluster_id"] if "cluster_id" in _sample_props else []
+    _popup = folium.GeoJsonPopup(
+        fields=_id_field + ["first_seen", "times_flagged", "area_trend"],
+        aliases=["ID"][:len(_id_field)] + ["First seen", "Times flagged", "Area trend"],
+    ) if _history else None
     folium.GeoJson(gj, name="All Clusters",
         style_function=lambda feat: {"color": "red", "weight": 2, "fillColor": "red", "fillOpacity": 0.1},
-        tooltip=_tooltip
+        tooltip=_tooltip, popup=_popup,
     ).add_to(m)
 
 Fullscreen(
@@ -778,7 +833,8 @@ Fullscreen(
     force_separate_button=True,
 ).add_to(m)
 folium.LayerControl(collapsed=False).add_to(m)
-map_output = st_folium(m, width="100%", height=620, returned_objects=["all_drawings"], key=f"map_{folder_path}")
+map_output = st_folium(m, width="100%", height=620, returned_objects=["all_drawings", "last_clicked"],
+                     key=f"map_{folder_path}")
 
 if st.session_state.get("tracking_just_launched"):
     _dirs_at_launch = st.session_state.get("tracking_dirs_at_launch", set())
@@ -805,24 +861,45 @@ if map_output and map_output.get("all_drawings"):
         lons, lats = [c[0] for c in coords], [c[1] for c in coords]
         drawn_aoi = [min(lons), min(lats), max(lons), max(lats)]
 
+# Pixel history: z-score and potential water of the clicked pixel in every
+# run of this AOI, read from the per-AOI time-series cube (GEE/cube.py)
+_clicked = (map_output or {}).get("last_clicked")
+if _clicked:
+    _lat, _lon = _clicked["lat"], _clicked["lng"]
+    _cubes = find_cubes(OUTPUT_DIR, _lon, _lat)
+    _location_name = dated_folders[selected_idx][2]
+    _cubes.sort(key=lambda d: not (_location_name and os.path.basename(d).startswith(f"{_location_name}_")))
+    _hist = point_history(_cubes[0], _lon, _lat) if _cubes else None
+    with st.expander(f"Pixel history at {_lat:.5f}, {_lon:.5f}", expanded=True):
+        if _hist is None:
+            st.caption("No pixel history for this location yet. It is recorded by each lake detection run "
+                       "(or `python GEE/cube.py Outputs` for earlier runs).")
+        else:
+            _hist_df = pd.DataFrame({"z-score": _hist["z_score"], "Potential water": _hist["potential_water"]},
+                                    index=pd.to_datetime(_hist["dates"]))
+            st.line_chart(_hist_df)
+            st.caption(f"{len(_hist['dates'])} run(s) in {os.path.basename(_cubes[0])}")
+
 # --- 7. Data Sync & Table ---
-cluster_csv_files = glob.glob(os.path.join(folder_path, "cluster_summary*.csv"))
+cluster_csv_files = artifacts(OUTPUT_DIR, folder_path, "cluster_summary")
 data_rows = []
 selected_ids = []
 
-if cluster_csv_files:
-    cluster_csv_files.sort(key=os.path.getmtime, reverse=True)
-    with open(cluster_csv_files[0], mode='r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            data_rows.append({
-                "Cluster_ID": row["Cluster_ID"],
-                "Pixel_Count": int(row["Pixel_Count"]),
-                "Area_m2": float(row["Area_m2"]),
-                "Centroid_Lon": float(row["Centroid_Lon"]),
-                "Centroid_Lat": float(row["Centroid_Lat"]),
-                "Selected": " " 
-            })
+if cluster_csv_files or recluster_rows is not None:
+    if recluster_rows is not None:
+        _summary_rows = recluster_rows
+    else:
+        with open(cluster_csv_files[0], mode='r', encoding='utf-8') as f:
+            _summary_rows = list(csv.DictReader(f))
+    for row in _summary_rows:
+        data_rows.append({
+            "Cluster_ID": str(row["Cluster_ID"]),
+            "Pixel_Count": int(row["Pixel_Count"]),
+            "Area_m2": float(row["Area_m2"]),
+            "Centroid_Lon": float(row["Centroid_Lon"]),
+            "Centroid_Lat": float(row["Centroid_Lat"]),
+            "Selected": " " 
+        })
 
     if drawn_aoi:
         min_lon, min_lat, max_lon, max_lat = drawn_aoi
@@ -902,10 +979,66 @@ else:
 # --- 9. Multi-Run Display ---
 st.write("### Analysis Progress")
 
-if tracking_status == "idle" and st.session_state.get("tracking_just_launched"):
+def _launch_pending():
+    """True while a launched tracking run has not yet written its log."""
+    if not st.session_state.get("tracking_just_launched"):
+        return False
+    _dirs_at_launch = st.session_state.get("tracking_dirs_at_launch", set())
+    _new = [d for _, d in _discover_tracking_runs(folder_path) if d not in _dirs_at_launch]
+    return not _new or _get_run_status(_new[-1]) == "idle"
+
+def _launch_watch():
+    """Polls (as a fragment) until the launched run appears, then reruns the page once."""
+    if not _launch_pending():
+        st.rerun()
     st.info("Tracking analysis starting, please wait...")
-    _time.sleep(2)
-    st.rerun()
+
+def _show_log(log_path):
+    """Last lines of a run log, read incrementally across refreshes."""
+    _text, _, _truncated = tail_log(log_path)
+    if _truncated:
+        st.caption(f"Showing the last {MAX_LINES} lines of {os.path.basename(log_path)}")
+    st.code(_text)
+
+def _run_progress(run_label, run_dir, key):
+    """
+    Log and cancel control of a running tracking run. Runs as a fragment that
+    refreshes every few seconds on its own, so the map, tables and viewers are
+    not rebuilt; when the run ends, one full rerun shows its results.
+    """
+    _run_status = _get_run_status(run_dir)
+    if _run_status != "running":
+        st.rerun()
+    _log_files = artifacts(OUTPUT_DIR, run_dir, "tracking_log")  # newest first
+    _expander_label = f"[Running] {run_label}".strip()
+
+    with st.expander(_expander_label, expanded=True):
+        if _log_files:
+            show_progress(_log_files[0])
+            _show_log(_log_files[0])
+        else:
+            st.info("Starting tracking analysis, please wait...")
+        _pid_file = os.path.join(run_dir, "pipeline.pid")
+        if os.path.exists(_pid_file):
+            try:
+                _pid = int(open(_pid_file).read().strip())
+                if st.button("Cancel", key=f"cancel_tracking_{key}"):
+                    if _is_pid_running(_pid):
+                        subprocess.call(["taskkill", "/F", "/PID", str(_pid)])
+                    try:
+                        os.remove(_pid_file)
+                    except Exception:
+                        pass
+                    if _log_files:
+                        with open(_log_files[0], "a", encoding="utf-8") as _lf2:
+                            _lf2.write("\nPIPELINE_ERROR: Cancelled by user.\n")
+                        write_status_file(_log_files[0], "failed", "Cancelled by user.")
+                    st.rerun()
+            except Exception:
+                pass
+
+if _launch_pending():
+    st.fragment(_launch_watch, run_every=2)()
 
 if not _all_runs:
     st.info("No tracking analysis run yet for this folder.")
@@ -914,7 +1047,7 @@ _, _location = dated_folders[selected_idx][1], dated_folders[selected_idx][2]
 
 for _run_label, _run_dir in _all_runs:
     _run_status = _get_run_status(_run_dir)
-    _log_files  = sorted(glob.glob(os.path.join(_run_dir, "tracking_log_*.txt")))
+    _log_files  = artifacts(OUTPUT_DIR, _run_dir, "tracking_log")  # newest first
     _key        = _run_label or os.path.basename(_run_dir)  # stable non-empty widget key
 
     if _run_label:
@@ -923,77 +1056,47 @@ for _run_label, _run_dir in _all_runs:
     if _run_status == "idle":
         if st.session_state.get("tracking_just_launched") and _run_dir == _all_runs[-1][1]:
             st.info("Tracking analysis starting, please wait...")
-            _time.sleep(2)
-            st.rerun()
         else:
             st.info("Run directory exists but no log found yet.")
         continue
 
-    _status_prefix = (
-        "[Running]" if _run_status == "running" else
-        "[Done]"    if _run_status == "success"  else
-        "[Failed]"
-    )
+    if _run_status == "running":
+        st.fragment(_run_progress, run_every=3)(_run_label, _run_dir, _key)
+        continue
+
+    _status_prefix = "[Done]" if _run_status == "success" else "[Failed]"
     _expander_label = f"{_status_prefix} {_run_label}".strip()
 
     if _run_status == "success":
         st.success(f"Tracking analysis complete! Files saved in: {_run_dir}")
 
-    with st.expander(_expander_label, expanded=(_run_status == "running")):
+    with st.expander(_expander_label, expanded=False):
         if _log_files:
-            with open(_log_files[-1], encoding="utf-8", errors="replace") as _lf:
-                st.code(_lf.read())
+            _show_log(_log_files[0])
         else:
             st.info("Starting tracking analysis, please wait...")
-        if _run_status == "running":
-            _pid_file = os.path.join(_run_dir, "pipeline.pid")
-            if os.path.exists(_pid_file):
-                try:
-                    _pid = int(open(_pid_file).read().strip())
-                    if st.button("Cancel", key=f"cancel_tracking_{_key}"):
-                        if _is_pid_running(_pid):
-                            subprocess.call(["taskkill", "/F", "/PID", str(_pid)])
-                        try:
-                            os.remove(_pid_file)
-                        except Exception:
-                            pass
-                        if _log_files:
-                            with open(_log_files[-1], "a", encoding="utf-8") as _lf2:
-                                _lf2.write("\nPIPELINE_ERROR: Cancelled by user.\n")
-                        st.rerun()
-                except Exception:
-                    pass
-
-    if _run_status == "running":
-        _time.sleep(3)
-        st.rerun()
-
-    if _run_status != "running":
-        _viewer_title = _run_label.replace("Tracking", "Tracking Results", 1)
-        render_tracking_viewer(_run_dir, title=_viewer_title)
-
-        if os.path.isdir(_run_dir):
-            st.write("---")
-            if st.button("Export Tracking Report (.html)", key=f"export_{_key}"):
-                with st.spinner("Generating report..."):
-                    _task_name = f"{_location}_{_run_label.replace(' ', '_')}" if _run_label else _location
-                    _html_bytes, _filename = generate_tracking_report(
-                        _run_dir,
-                        task_date=selected_folder_date,
-                        task_name=_task_name,
-                        folder_path=folder_path,
-                    )
-                if _html_bytes:
-                    st.download_button(
-                        label="Download Report",
-                        data=_html_bytes,
-                        file_name=_filename,
-                        mime="text/html",
-                        key=f"dl_{_key}",
-                    )
-                else:
-                    st.warning("No tracking results found to export.")
 
-if st.session_state.get("tracking_just_launched"):
-    _time.sleep(3)
-    st.rerun()
+    _viewer_title = _run_label.replace("Tracking", "Tracking Results", 1)
+    render_tracking_viewer(_run_dir, title=_viewer_title)
+
+    if os.path.isdir(_run_dir):
+        st.write("---")
+        if st.button("Export Tracking Report (.html)", key=f"export_{_key}"):
+            with st.spinner("Generating report..."):
+                _task_name = f"{_location}_{_run_label.replace(' ', '_')}" if _run_label else _location
+                _html_bytes, _filename = generate_tracking_report(
+                    _run_dir,
+                    task_date=selected_folder_date,
+                    task_name=_task_name,
+                    folder_path=folder_path,
+                )
+            if _html_bytes:
+                st.download_button(
+                    label="Download Report",
+                    data=_html_bytes,
+                    file_name=_filename,
+                    mime="text/html",
+                    key=f"dl_{_key}",
+                )
+            else:
+                st.warning("No tracking results found to export.")
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+THAW - Local XYZ tile server
+
+Serves the Output page COG layers (z_score, potential_water, mean_diff) as
+on-demand 256 px Web-Mercator PNG tiles, so folium can use TileLayer URLs
+instead of embedding a base64 image of every layer in the page HTML.
+
+Tiles come from the run's pre-rendered pyramid (GEE/tiles.py) when it is up
+to date; other zoom levels, or runs without a pyramid, are read with
+rio-tiler and colourised with the shared LUT renderer on demand. Tiles are
+kept in an in-memory LRU cache. The server runs in a daemon thread on
+127.0.0.1 and is started once per Streamlit process.
+"""
+
+import os
+import sys
+import hashlib
+import threading
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+from PIL import Image
+from rio_tiler.io import Reader
+
+GEE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "GEE")
+if GEE_DIR not in sys.path:
+    sys.path.insert(0, GEE_DIR)
+from tiles import TILE_SIZE, pyramid_for, render_tile
+
+TILE_CACHE_SIZE = 2048  # tiles, roughly 50–150 MB of PNG bytes
+
+# ── layer registry ─────────────────────────────────────────────────────────
+
+_layers = {}
+_layers_lock = threading.Lock()
+
+
+def register_layer(tif_path, vis_min, vis_max, palette, mask_below_zero=False):
+    """
+    Make a COG available for tiling and return its URL token.
+
+    The token covers the file path, its mtime and the visualisation
+    parameters, so a rewritten file or changed styling gets fresh tiles.
+    A matching pre-rendered pyramid is looked up once, at registration.
+    """
+    vis = {"min": vis_min, "max": vis_max, "palette": palette, "mask_below_zero": bool(mask_below_zero)}
+    pyramid = pyramid_for(tif_path, vis)
+    spec = (os.path.abspath(tif_path), os.path.getmtime(tif_path),
+            float(vis_min), float(vis_max), palette, bool(mask_below_zero))
+    token = hashlib.sha1(repr(spec).encode()).hexdigest()[:16]
+    with _layers_lock:
+        _layers[token] = (spec, pyramid)
+    return token
+
+
+@lru_cache(maxsize=TILE_CACHE_SIZE)
+def _render_tile(token, z, x, y):
+    """Tile PNG bytes, or None when it lies outside the layer or holds no data."""
+    (path, _mtime, vis_min, vis_max, palette, mask_below_zero), pyramid = _layers[token]
+    if pyramid and pyramid["minzoom"] <= z <= pyramid["maxzoom"]:
+        # Empty tiles are not written to the pyramid
+        try:
+            with open(os.path.join(pyramid["dir"], str(z), str(x), f"{y}.png"), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+    with Reader(path) as src:
+        return render_tile(src, x, y, z, vis_min, vis_max, palette, mask_below_zero)
+
+
+def _empty_tile():
+    buf = BytesIO()
+    Image.new("RGBA", (TILE_SIZE, TILE_SIZE), (0, 0, 0, 0)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+_EMPTY_TILE = _empty_tile()
+
+# ── HTTP server ────────────────────────────────────────────────────────────
+
+
+class _TileHandler(BaseHTTPRequestHandler):
+    """GET /tiles/{token}/{z}/{x}/{y}.png"""
+
+    def do_GET(self):
+        parts = self.path.split("?")[0].strip("/").split("/")
+        if len(parts) != 5 or parts[0] != "tiles" or parts[1] not in _layers:
+            self.send_error(404)
+            return
+        try:
+            z, x, y = int(parts[2]), int(parts[3]), int(parts[4].split(".")[0])
+            png = _render_tile(parts[1], z, x, y) or _EMPTY_TILE
+        except ValueError:
+            self.send_error(400)
+            return
+        except Exception as e:
+            self.send_error(500, str(e))
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(png)))
+        self.send_header("Cache-Control", "max-age=3600")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(png)
+
+    def log_message(self, format, *args):
+        pass  # keep the Streamlit console clean
+
+
+class TileServer:
+    """Threaded tile server bound to 127.0.0.1 on a free port."""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.httpd = ThreadingHTTPServer((host, port), _TileHandler)
+        self.httpd.daemon_threads = True
+        self.host, self.port = self.httpd.server_address[:2]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="thaw-tile-server",
+                                       daemon=True)
+        self.thread.start()
+
+    def tile_url(self, token):
+        """XYZ URL template of a registered layer, for folium.TileLayer."""
+        return f"http://{self.host}:{self.port}/tiles/{token}/{{z}}/{{x}}/{{y}}.png"
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -6,35 +6,23 @@ THAW - Tracking Results Viewer
 
 import os
 import re
+import sys
 import glob
-import numpy as np
-import rasterio
 import matplotlib.pyplot as plt
 from PIL import Image, ImageOps, ImageDraw, ImageFont
 from io import BytesIO
 import streamlit as st
 
+# GEE/ holds the shared reporting and rendering helpers
+GEE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "GEE")
+if GEE_DIR not in sys.path:
+    sys.path.insert(0, GEE_DIR)
+
 # ── helpers ────────────────────────────────────────────────────────────────
 
-PANEL_CFG = {
-    "VV_raw":          dict(label="Raw VV (dB)",       cmap=plt.cm.gray,   vmin=-25, vmax=0,  nan_fill=0.5),
-    "VV_corrected":    dict(label="Corrected VV (dB)", cmap=plt.cm.gray,   vmin=-25, vmax=0,  nan_fill=0.5),
-    "lake_likelihood": dict(label="Lake Likelihood",   cmap=plt.cm.viridis, vmin=0,  vmax=1,  nan_fill=0.0),
-}
-
-def _read_masked(path):
-    with rasterio.open(path) as src:
-        data = src.read(1).astype(float)
-        if src.nodata is not None:
-            data[data == src.nodata] = np.nan
-    data[data <= -9999] = np.nan
-    return data
-
-def _render_to_pil(data, cmap, vmin, vmax, nan_fill):
-    norm = np.clip((data - vmin) / (vmax - vmin), 0, 1)
-    norm = np.where(np.isnan(norm), nan_fill, norm)
-    rgb  = (cmap(norm)[:, :, :3] * 255).astype(np.uint8)
-    return Image.fromarray(rgb)
+# Shared panel settings (colormap names) and renderer.
+# Panels are served from the tracking run's frame cache (see rendering.cached_panel).
+from rendering import PANEL_CFG, cached_panel
 
 def _pil_to_bytes(im):
     buf = BytesIO()
@@ -42,6 +30,39 @@ def _pil_to_bytes(im):
     buf.seek(0)
     return buf
 
+@st.cache_data(show_spinner=False)
+def _load_histograms(path, mtime):
+    from reporting import load_likelihood_histograms
+    return load_likelihood_histograms(path)
+
+def _band_from_histograms(tracking_dir, df):
+    """
+    Offer an uncertainty-band threshold slider when the run stored likelihood
+    histograms; returns df with lower/upper areas recomputed at the chosen thresholds.
+    """
+    hist_path = os.path.join(tracking_dir, "likelihood_histograms.npz")
+    if not os.path.isfile(hist_path):
+        return df
+    import pandas as pd
+    from reporting import areas_from_histograms
+
+    hist = _load_histograms(hist_path, os.path.getmtime(hist_path))
+    lo_min = round(float(hist["lower_thresh"]), 2)
+    lower, upper = st.slider(
+        "Uncertainty band (likelihood thresholds)",
+        min_value=lo_min, max_value=1.0, value=(lo_min, max(lo_min, 0.9)), step=0.01,
+        key=f"band_slider_{os.path.basename(tracking_dir)}",
+    )
+    band = areas_from_histograms(hist, lower, upper)
+    band["date"] = pd.to_datetime(band["date"])
+    df = df.drop(columns=["lower_area_km2", "upper_area_km2"])
+    if len(band) == len(df) and (band["date"].values == df["date"].values).all():
+        # Both tables have one row per frame; dates repeat for same-day acquisitions
+        return df.assign(lower_area_km2=band["lower_area_km2"].values,
+                         upper_area_km2=band["upper_area_km2"].values)
+    band = band.drop_duplicates("date")
+    return df.merge(band[["date", "lower_area_km2", "upper_area_km2"]], on="date", how="left")
+
 def _extract_date(filename):
     m = re.search(r'(\d{4}-\d{2}-\d{2})', filename)
     if m:
@@ -138,11 +159,7 @@ def render_tracking_viewer(tracking_dir, title="Tracking Results Viewer"):
     for band in PANEL_CFG:
         cfg = PANEL_CFG[band]
         try:
-            data = _read_masked(frame[band])
-            im   = _render_to_pil(data, cfg["cmap"], cfg["vmin"], cfg["vmax"], cfg["nan_fill"])
-            ratio = panel_w / im.width
-            im = im.resize((panel_w, max(1, int(im.height * ratio))), Image.LANCZOS)
-            panels.append(im)
+            panels.append(cached_panel(tracking_dir, frame[band], band, panel_w))
         except Exception:
             panels.append(Image.new("RGB", (panel_w, panel_w), (80, 80, 80)))
         captions.append(cfg["label"])
@@ -177,6 +194,7 @@ def render_tracking_viewer(tracking_dir, title="Tracking Results Viewer"):
 
             df = pd.read_csv(metrics_csv)
             df["date"] = pd.to_datetime(df["date"])
+            df = _band_from_histograms(tracking_dir, df)
             df = df.sort_values("date").reset_index(drop=True)
 
             dpi   = 100
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+THAW - Animation module
+
+Streaming animation writer used by reporting.build_lake_monitoring_gif.
+
+Frames are encoded and written to disk as they are appended, so memory stays
+flat in the number of frames:
+
+  .webp        — animated WebP; each frame is a still WebP encode wrapped in
+                 an ANMF chunk of a RIFF/VP8X container
+  .png / .apng — animated PNG; frame data is written as fcTL + IDAT/fdAT chunks
+  .gif         — GIF with a local palette per frame (median cut, as PIL's
+                 save_all), so no frame is posterized onto another's colours
+  .mp4         — H.264 via imageio-ffmpeg (optional dependency)
+
+All frames are placed on the canvas size of the first frame.
+"""
+
+import os
+import struct
+import zlib
+from io import BytesIO
+
+from PIL import Image
+
+FORMATS = ("gif", "webp", "apng", "mp4")
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def _format_from_path(path):
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    return {"png": "apng"}.get(ext, ext)
+
+
+def _riff_chunks(data):
+    """Yield (fourcc, payload) of the chunks of a RIFF/WEBP file."""
+    pos = 12
+    while pos + 8 <= len(data):
+        fourcc = data[pos:pos + 4]
+        size = struct.unpack("<I", data[pos + 4:pos + 8])[0]
+        yield fourcc, data[pos + 8:pos + 8 + size]
+        pos += 8 + size + (size & 1)
+
+
+def _riff_chunk(fourcc, payload):
+    return fourcc + struct.pack("<I", len(payload)) + payload + (b"\0" if len(payload) & 1 else b"")
+
+
+def _png_chunks(data):
+    """Yield (type, payload) of the chunks of a PNG file."""
+    pos = len(_PNG_SIGNATURE)
+    while pos + 8 <= len(data):
+        size = struct.unpack(">I", data[pos:pos + 4])[0]
+        yield data[pos + 4:pos + 8], data[pos + 8:pos + 8 + size]
+        pos += 12 + size
+
+
+def _png_chunk(ctype, payload):
+    return (struct.pack(">I", len(payload)) + ctype + payload
+            + struct.pack(">I", zlib.crc32(ctype + payload) & 0xFFFFFFFF))
+
+
+def _gif_local_frame(data):
+    """
+    Extensions and image of a single-frame GIF, with its global colour table
+    moved into the image descriptor as a local colour table.
+    """
+    packed = data[10]
+    gct_size = 3 * 2 ** ((packed & 0x07) + 1) if packed & 0x80 else 0
+    gct = data[13:13 + gct_size]
+    pos = 13 + gct_size
+    while data[pos] == 0x21:             # extension: label, then data sub-blocks
+        pos += 2
+        while data[pos]:
+            pos += data[pos] + 1
+        pos += 1
+    descriptor = bytearray(data[pos:pos + 10])
+    body = data[pos + 10:-1]             # local table (if any) and image data, no trailer
+    if gct and not descriptor[9] & 0x80:
+        descriptor[9] = (descriptor[9] & 0x78) | 0x80 | (packed & 0x07)
+        body = gct + body
+    return data[13 + gct_size:pos] + bytes(descriptor) + body
+
+
+class AnimationWriter:
+    """
+    Write an animation frame by frame.
+
+    Parameters
+    ----------
+    path : str
+        Output file; the format follows the extension unless fmt is given.
+    fmt : str, optional
+        One of FORMATS.
+    duration : int
+        Frame duration in milliseconds.
+    loop : int
+        Number of loops, 0 = forever (ignored for MP4).
+    quality : int
+        Lossy quality for WebP (0–100); MP4 uses the encoder default.
+
+    Use as a context manager, or call close() to finalise the file.
+    """
+
+    def __init__(self, path, fmt=None, duration=600, loop=0, quality=85):
+        self.path = path
+        self.fmt = (fmt or _format_from_path(path)).lower()
+        if self.fmt not in FORMATS:
+            raise ValueError(f"Unsupported animation format '{self.fmt}' (expected one of {FORMATS})")
+        self.duration = int(duration)
+        self.loop = int(loop)
+        self.quality = int(quality)
+        self.size = None
+        self.n_frames = 0
+        self._fp = None
+        self._ffmpeg = None
+        self._seq = 0
+        self._actl_pos = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # ── frame handling ─────────────────────────────────────────────────────
+
+    def append(self, im):
+        """Encode one PIL image and write it to the output."""
+        im = im.convert("RGB")
+        if self.size is None:
+            self.size = im.size
+            if self.fmt == "mp4":
+                # yuv420p needs even dimensions
+                self.size = (im.width + im.width % 2, im.height + im.height % 2)
+            self._open()
+        if im.size != self.size:
+            canvas = Image.new("RGB", self.size)
+            canvas.paste(im, (0, 0))
+            im = canvas
+        getattr(self, f"_append_{self.fmt}")(im)
+        self.n_frames += 1
+
+    def _open(self):
+        if self.fmt == "mp4":
+            try:
+                import imageio_ffmpeg
+            except ImportError as e:
+                raise ImportError("MP4 output requires the imageio-ffmpeg package "
+                                  "(pip install imageio-ffmpeg)") from e
+            self._ffmpeg = imageio_ffmpeg.write_frames(
+                self.path, self.size, fps=1000.0 / self.duration,
+                codec="libx264", pix_fmt_out="yuv420p", macro_block_size=1,
+            )
+            self._ffmpeg.send(None)
+            return
+
+        self._fp = open(self.path, "wb")
+        w, h = self.size
+        if self.fmt == "webp":
+            # RIFF size is patched on close
+            self._fp.write(b"RIFF\0\0\0\0WEBP")
+            self._fp.write(_riff_chunk(b"VP8X", b"\x02\0\0\0"  # animation flag
+                                       + struct.pack("<I", w - 1)[:3] + struct.pack("<I", h - 1)[:3]))
+            self._fp.write(_riff_chunk(b"ANIM", struct.pack("<IH", 0, self.loop)))
+        elif self.fmt == "apng":
+            self._fp.write(_PNG_SIGNATURE)
+            self._fp.write(_png_chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 2, 0, 0, 0)))
+            # acTL frame count is patched on close
+            self._actl_pos = self._fp.tell()
+            self._fp.write(_png_chunk(b"acTL", struct.pack(">II", 0, self.loop)))
+
+    def _append_webp(self, im):
+        buf = BytesIO()
+        im.save(buf, format="WEBP", quality=self.quality, method=4)
+        frame_data = b"".join(_riff_chunk(fourcc, payload)
+                              for fourcc, payload in _riff_chunks(buf.getvalue())
+                              if fourcc in (b"ALPH", b"VP8 ", b"VP8L"))
+        w, h = im.size
+        header = (b"\0\0\0" + b"\0\0\0"  # frame offset x/2, y/2
+                  + struct.pack("<I", w - 1)[:3] + struct.pack("<I", h - 1)[:3]
+                  + struct.pack("<I", min(self.duration, 0xFFFFFF))[:3]
+                  + b"\x02")  # no blending, no disposal
+        self._fp.write(_riff_chunk(b"ANMF", header + frame_data))
+
+    def _append_apng(self, im):
+        buf = BytesIO()
+        im.save(buf, format="PNG", compress_level=6)
+        idat = b"".join(payload for ctype, payload in _png_chunks(buf.getvalue()) if ctype == b"IDAT")
+        w, h = im.size
+        self._fp.write(_png_chunk(b"fcTL", struct.pack(">IIIIIHHBB", self._seq, w, h, 0, 0,
+                                                       self.duration, 1000, 0, 0)))
+        self._seq += 1
+        if self.n_frames == 0:
+            self._fp.write(_png_chunk(b"IDAT", idat))
+        else:
+            self._fp.write(_png_chunk(b"fdAT", struct.pack(">I", self._seq) + idat))
+            self._seq += 1
+
+    def _append_gif(self, im):
+        if self.n_frames == 0:
+            self._fp.write(self._gif_header())
+        frame = im.quantize(colors=256, method=Image.Quantize.MEDIANCUT)
+        buf = BytesIO()
+        frame.save(buf, format="GIF", duration=self.duration, optimize=False)
+        self._fp.write(_gif_local_frame(buf.getvalue()))
+
+    def _gif_header(self):
+        """Logical screen without a global colour table; every frame carries its own."""
+        w, h = self.size
+        return (b"GIF89a" + struct.pack("<HH", w, h) + bytes([0x70, 0, 0])
+                + b"!\xff\x0bNETSCAPE2.0\x03\x01" + struct.pack("<H", self.loop) + b"\0")
+
+    def _append_mp4(self, im):
+        self._ffmpeg.send(im.tobytes())
+
+    # ── finalisation ───────────────────────────────────────────────────────
+
+    def close(self):
+        """Finalise the file; returns the number of frames written."""
+        if self._ffmpeg is not None:
+            self._ffmpeg.close()
+            self._ffmpeg = None
+        if self._fp is None:
+            return self.n_frames
+        if self.fmt == "webp":
+            size = self._fp.tell()
+            self._fp.seek(4)
+            self._fp.write(struct.pack("<I", size - 8))
+        elif self.fmt == "apng":
+            self._fp.write(_png_chunk(b"IEND", b""))
+            self._fp.seek(self._actl_pos)
+            self._fp.write(_png_chunk(b"acTL", struct.pack(">II", self.n_frames, self.loop)))
+        elif self.fmt == "gif":
+            self._fp.write(b";")
+        self._fp.close()
+        self._fp = None
+        return self.n_frames
@@ -0,0 +1,395 @@
+# -*- coding: utf-8 -*-
+"""
+THAW - Historical baseline cache
+
+The lake detection z-score compares the latest Sentinel-1 mosaics with the
+mean and standard deviation of all earlier years around the same day of
+year. That baseline barely changes from week to week, but building the
+historical stack (2016–present, ±window days per year) is the bulk of every
+run's GEE job.
+
+Baselines are therefore cached as Earth Engine assets, keyed by
+
+    (AOI, orbit pass, day-of-year bin, window, year range, excluded year)
+
+The first run for a key computes the baseline live, exactly as before, and
+submits a toAsset export in the background; later runs and scheduled tasks
+load the asset instead. Submitted exports are tracked in
+<output_root>/baseline_index.json so concurrent or repeated runs do not
+submit the same export twice.
+
+Day-of-year is binned (DOY_BIN days) so that weekly runs share baselines;
+the baseline window is centred on the bin, both for cached and live
+baselines, so results do not depend on whether the cache was hit.
+
+A year only enters a baseline once its window around the DOY bin has been
+acquired and ingested (COMPLETE_LAG_DAYS after the window end), so a cached
+baseline never holds a partial year: a re-run of a past date in January does
+not cache the still empty window of the current year under the final key.
+
+Cached baselines store the running statistics count, mean and M2 (sum of
+squared deviations from the mean) next to mean and stdDev. When a new year
+becomes complete, the new baseline is the previous cached one updated with
+only the missing years (Welford/Chan merge) instead of a full reduction over
+the whole archive. The standard deviation is the population one, as computed
+by ee.Reducer.stdDev(). A NumPy implementation of the same updates is tested
+against direct computation in tests/test_baseline.py.
+"""
+
+import os
+import json
+import hashlib
+import datetime
+import tempfile
+
+import numpy as np
+import ee
+from filelock import FileLock
+
+from gee_core import get_historical_collection
+
+DOY_BIN = 6                # days per day-of-year bin (half the S1 repeat cycle)
+FIRST_YEAR = 2016          # start of the Sentinel-1 archive used for baselines
+ASSET_FOLDER = "thaw_baselines"
+CACHE_VERSION = 2          # bump when the meaning of a key changes (v2: complete years only)
+COMPLETE_LAG_DAYS = 7      # days after a window ends until all its scenes are in Earth Engine
+INDEX_FILE = "baseline_index.json"
+BANDS = ["VV_mean", "VV_stdDev"]                        # used for the z-score
+STAT_BANDS = ["VV_count", "VV_mean", "VV_M2", "VV_stdDev"]  # stored in the cache
+
+
+# ============================================================
+# KEYS
+# ============================================================
+
+def aoi_tag(aoi_coords):
+    """Short stable hash of the AOI polygon coordinates (rounded to ~1 m)."""
+    rounded = json.dumps([[round(float(x), 5), round(float(y), 5)] for x, y in aoi_coords[0]])
+    return hashlib.sha1(rounded.encode()).hexdigest()[:10]
+
+
+def doy_bin_center(doy):
+    """Centre day-of-year of the bin that doy falls in."""
+    return (doy - 1) // DOY_BIN * DOY_BIN + DOY_BIN // 2 + 1
+
+
+def window_complete(year, doy, window, now=None):
+    """True once the window of a year around the DOY bin is fully in the archive."""
+    now = now or datetime.datetime.utcnow()
+    window_end = datetime.datetime(year, 1, 1) + datetime.timedelta(days=doy_bin_center(doy) - 1 + window)
+    return window_end + datetime.timedelta(days=COMPLETE_LAG_DAYS) <= now
+
+
+def baseline_years(reference_date, doy, window, now=None):
+    """
+    Archive years that make up a baseline: every year since FIRST_YEAR except
+    the reference year, up to the last year whose window is complete.
+    """
+    now = now or datetime.datetime.utcnow()
+    return [y for y in range(FIRST_YEAR, now.year + 1)
+            if y != reference_date.year and window_complete(y, doy, window, now)]
+
+
+def baseline_family(aoi_coords, orbit_pass, doy, window):
+    """Key prefix shared by all baselines of one AOI, orbit pass, DOY bin and window."""
+    return (f"b{CACHE_VERSION}_{aoi_tag(aoi_coords)}_{orbit_pass[:3].lower()}"
+            f"_d{doy_bin_center(doy):03d}_w{window}")
+
+
+def baseline_key(aoi_coords, orbit_pass, doy, window, reference_date, now=None):
+    """
+    Cache key and centre day-of-year of a baseline.
+
+    The key covers everything the statistics depend on: AOI, orbit pass,
+    DOY bin, window, the range of complete archive years and the excluded
+    reference year. The key changes when a further year becomes complete.
+    """
+    years = baseline_years(reference_date, doy, window, now)
+    last_year = years[-1] if years else FIRST_YEAR - 1
+    key = (f"{baseline_family(aoi_coords, orbit_pass, doy, window)}"
+           f"_y{FIRST_YEAR}-{last_year}_x{reference_date.year}")
+    return key, doy_bin_center(doy)
+
+
+# ============================================================
+# RUNNING STATISTICS — EARTH ENGINE
+# ============================================================
+
+def collection_stats(collection):
+    """
+    Count, mean, M2 and stdDev of VV over a collection, per pixel.
+
+    VV_mean and VV_stdDev equal the mean/stdDev reducer combination used
+    for the z-score; VV_M2 = variance * count.
+    """
+    stats = collection.select("VV").reduce(
+        ee.Reducer.count()
+        .combine(reducer2=ee.Reducer.mean(), sharedInputs=True)
+        .combine(reducer2=ee.Reducer.variance(), sharedInputs=True))
+    count = stats.select("VV_count").toFloat()
+    variance = stats.select("VV_variance")
+    return ee.Image.cat([
+        count,
+        stats.select("VV_mean"),
+        variance.multiply(count).rename("VV_M2"),
+        variance.sqrt().rename("VV_stdDev"),
+    ])
+
+
+def merge_stats(a, b):
+    """
+    Combine the running statistics of two disjoint sets of acquisitions.
+
+    Chan et al.'s pairwise form of Welford's update:
+    n = na + nb, d = mean_b - mean_a, mean = mean_a + d * nb / n,
+    M2 = M2a + M2b + d^2 * na * nb / n. Pixels without observations in one
+    of the inputs take the other input's statistics.
+
+    Only ee.Image methods are used (no ee.Image.cat), so the same formulas
+    can be evaluated on NumPy stand-ins (tests/test_baseline.py).
+    """
+    na = a.select("VV_count").unmask(0)
+    nb = b.select("VV_count").unmask(0)
+    mean_a = a.select("VV_mean").unmask(0)
+    mean_b = b.select("VV_mean").unmask(0)
+    n = na.add(nb)
+    delta = mean_b.subtract(mean_a)
+    mean = mean_a.add(delta.multiply(nb).divide(n))
+    m2 = a.select("VV_M2").unmask(0).add(b.select("VV_M2").unmask(0)) \
+        .add(delta.pow(2).multiply(na).multiply(nb).divide(n))
+    valid = n.gt(0)
+    return n.rename("VV_count") \
+        .addBands(mean.rename("VV_mean")) \
+        .addBands(m2.rename("VV_M2")) \
+        .addBands(m2.divide(n).sqrt().rename("VV_stdDev")) \
+        .updateMask(valid)
+
+
+def compute_baseline(s1, orbit_pass, doy, window, reference_date, years=None):
+    """
+    Historical statistics of VV around a day-of-year (bands STAT_BANDS).
+
+    Parameters
+    ----------
+    years : list of int, optional
+        Years to include; defaults to baseline_years(reference_date, doy, window).
+    """
+    if years is None:
+        years = baseline_years(reference_date, doy, window)
+    hist = get_historical_collection(s1, orbit_pass, doy, window, reference_date, years=years)
+    return collection_stats(hist)
+
+
+# ============================================================
+# RUNNING STATISTICS — NUMPY
+# ============================================================
+
+def welford_init(shape):
+    """Empty running statistics (count, mean, M2) for arrays of a given shape."""
+    return {"count": np.zeros(shape), "mean": np.zeros(shape), "M2": np.zeros(shape)}
+
+
+def welford_update(state, x):
+    """
+    Add one acquisition to the running statistics in place (Welford's update).
+
+    NaN pixels in x are treated as no observation.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    valid = ~np.isnan(x)
+    state["count"] += valid
+    delta = np.where(valid, x - state["mean"], 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        state["mean"] += np.where(valid, delta / np.maximum(state["count"], 1), 0.0)
+    state["M2"] += np.where(valid, delta * (np.where(valid, x, 0.0) - state["mean"]), 0.0)
+    return state
+
+
+def welford_merge(a, b):
+    """Combine two sets of running statistics (same formulas as merge_stats)."""
+    n = a["count"] + b["count"]
+    delta = b["mean"] - a["mean"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(n > 0, a["mean"] + delta * b["count"] / n, 0.0)
+        m2 = a["M2"] + b["M2"] + np.where(n > 0, delta ** 2 * a["count"] * b["count"] / n, 0.0)
+    return {"count": n, "mean": mean, "M2": m2}
+
+
+def welford_finalize(state):
+    """Mean and population standard deviation (NaN where count is 0)."""
+    n = state["count"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(n > 0, state["mean"], np.nan)
+        std = np.where(n > 0, np.sqrt(state["M2"] / n), np.nan)
+    return mean, std
+
+
+# ============================================================
+# ASSET CACHE
+# ============================================================
+
+def _load_index(output_root):
+    try:
+        with open(os.path.join(output_root, INDEX_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_index(output_root, index):
+    path = os.path.join(output_root, INDEX_FILE)
+    fd, tmp = tempfile.mkstemp(dir=output_root, prefix=INDEX_FILE + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=1)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _index_lock(output_root):
+    """
+    Lock held from _load_index to _save_index, so overlapping runs neither
+    drop each other's entries nor submit the same export twice.
+    """
+    return FileLock(os.path.join(output_root, INDEX_FILE) + ".lock")
+
+
+def _asset_exists(asset_id):
+    try:
+        ee.data.getAsset(asset_id)
+        return True
+    except ee.EEException:
+        return False
+
+
+def _ensure_folder(project_id):
+    folder = f"projects/{project_id}/assets/{ASSET_FOLDER}"
+    if not _asset_exists(folder):
+        ee.data.createAsset({"type": "FOLDER"}, folder)
+    return folder
+
+
+def _export_pending(entry):
+    """True while a previously submitted export for this key may still finish."""
+    task_id = entry.get("task_id")
+    if not task_id:
+        return False
+    try:
+        state = ee.data.getTaskStatus(task_id)[0].get("state")
+    except Exception:
+        return False
+    return state in ("UNSUBMITTED", "READY", "RUNNING")
+
+
+def _find_mergeable(index, family, years):
+    """
+    Largest cached baseline of the same family whose years are a subset of years.
+
+    Returns (entry, missing_years) or (None, years).
+    """
+    wanted = set(years)
+    candidates = sorted(
+        (e for e in index.values()
+         if e.get("family") == family and e.get("years") and set(e["years"]) <= wanted),
+        key=lambda e: len(e["years"]), reverse=True)
+    for entry in candidates:
+        if _asset_exists(entry["asset_id"]):
+            return entry, sorted(wanted - set(entry["years"]))
+    return None, years
+
+
+def get_baseline(s1, aoi, aoi_coords, orbit_pass, doy, window, reference_date,
+                 project_id=None, output_root=None):
+    """
+    Baseline statistics for one orbit pass, from the asset cache when possible.
+
+    Parameters
+    ----------
+    s1 : ee.ImageCollection
+        Sentinel-1 collection (VV band) filtered to the AOI.
+    aoi : ee.Geometry
+        Export region of the cached baseline.
+    aoi_coords : list
+        AOI polygon coordinates (GeoJSON ring list), used for the cache key.
+    orbit_pass : str
+        'ASCENDING' or 'DESCENDING'.
+    doy : int
+        Day-of-year of the reference date; binned to DOY_BIN days.
+    window : int
+        Days either side of the DOY bin centre.
+    reference_date : datetime.datetime
+        Reference date; its year is excluded from the baseline.
+    project_id : str, optional
+        Cloud project holding the asset cache. Without it (or without
+        output_root) the baseline is always computed live.
+    output_root : str, optional
+        Folder holding baseline_index.json.
+
+    Returns
+    -------
+    (ee.Image, str)
+        Image with bands VV_mean and VV_stdDev, and its source:
+        'asset', 'live', 'live+export' (live, cache export submitted) or
+        'update+export' (cached baseline of fewer years updated with the
+        missing years, export submitted).
+    """
+    key, center = baseline_key(aoi_coords, orbit_pass, doy, window, reference_date)
+    years = baseline_years(reference_date, doy, window)
+    if not project_id or not output_root or not years:
+        return compute_baseline(s1, orbit_pass, center, window, reference_date, years).select(BANDS), "live"
+
+    asset_id = f"projects/{project_id}/assets/{ASSET_FOLDER}/{key}"
+    if _asset_exists(asset_id):
+        return ee.Image(asset_id).select(BANDS), "asset"
+
+    with _index_lock(output_root):
+        index = _load_index(output_root)
+        if _export_pending(index.get(key, {})):
+            return compute_baseline(s1, orbit_pass, center, window, reference_date, years).select(BANDS), "live"
+
+        family = baseline_family(aoi_coords, orbit_pass, doy, window)
+        base, missing = _find_mergeable(index, family, years)
+        if base is not None:
+            stats = ee.Image(base["asset_id"]).select(STAT_BANDS)
+            if missing:
+                stats = merge_stats(stats, compute_baseline(s1, orbit_pass, center, window,
+                                                            reference_date, missing))
+            source = "update"
+        else:
+            stats = compute_baseline(s1, orbit_pass, center, window, reference_date, years)
+            source = "live"
+
+        try:
+            _ensure_folder(project_id)
+            task = ee.batch.Export.image.toAsset(
+                image=stats.toFloat().set({
+                    "thaw_key": key,
+                    "orbit_pass": orbit_pass,
+                    "doy_center": center,
+                    "window": window,
+                    "excluded_year": reference_date.year,
+                }),
+                description=f"thaw_baseline_{key}"[:100],
+                assetId=asset_id,
+                region=aoi,
+                scale=10,
+                maxPixels=1e12,
+                pyramidingPolicy={band: "mean" for band in STAT_BANDS},
+            )
+            task.start()
+        except Exception as e:
+            print(f"Warning: baseline cache export not submitted ({orbit_pass}): {e}", flush=True)
+            return stats.select(BANDS), source
+
+        index[key] = {
+            "asset_id": asset_id,
+            "task_id": task.id,
+            "family": family,
+            "years": years,
+            "submitted": datetime.datetime.now().isoformat(timespec="seconds"),
+        }
+        _save_index(output_root, index)
+        return stats.select(BANDS), f"{source}+export"
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+THAW - Historical collection benchmark
+
+Compares the single-filter get_historical_collection with the previous
+per-year loop it replaced (historical_collection_loop) on a pipeline config:
+
+    - serialized expression graph size of the collection and of the
+      baseline statistics built from it
+    - number of images selected
+    - wall-clock time of computing the baseline statistics over the AOI
+      (reduceRegion at 100 m), and with --export of a Drive export of the
+      baseline image at 10 m (task start to COMPLETED)
+
+Usage: python benchmark_historical.py <config.json> [--export]
+"""
+
+import os
+import sys
+import json
+import time
+import datetime
+
+import ee
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIR not in sys.path:
+    sys.path.insert(0, SCRIPT_DIR)
+
+from gee_auth import initialize_ee
+from gee_core import get_historical_collection
+
+WINDOW = 12
+
+
+def historical_collection_loop(s1, orbit_pass, doy, window, reference_date, years=None):
+    """
+    Previous per-year implementation of get_historical_collection.
+
+    Builds one filterDate(...).toList(100) per year and flattens the lists
+    back into a collection.
+    """
+    today = datetime.datetime.utcnow()
+    yearList = years if years is not None else \
+        [y for y in range(2016, today.year + 1) if y != reference_date.year]
+    seasonal_list = []
+    for y in yearList:
+        target = datetime.datetime(y, 1, 1) + datetime.timedelta(days=doy - 1)
+        start = target - datetime.timedelta(days=window)
+        end = target + datetime.timedelta(days=window)
+        imgs = s1.filterDate(start, end) \
+            .filter(ee.Filter.eq('orbitProperties_pass', orbit_pass)) \
+            .toList(100)
+        seasonal_list.append(imgs)
+    return ee.ImageCollection(ee.List(seasonal_list).flatten())
+
+
+def _stats(collection):
+    return collection.select("VV").reduce(
+        ee.Reducer.mean().combine(reducer2=ee.Reducer.stdDev(), sharedInputs=True))
+
+
+def _time_export(image, aoi, description):
+    """Seconds from task start to completion of a 10 m Drive export, or None on failure."""
+    task = ee.batch.Export.image.toDrive(
+        image=image.toFloat(), description=description, folder="THAW_benchmark",
+        region=aoi, scale=10, maxPixels=1e12)
+    task.start()
+    while True:
+        status = task.status()
+        if status["state"] in ("COMPLETED", "FAILED", "CANCELLED"):
+            break
+        time.sleep(10)
+    if status["state"] != "COMPLETED":
+        print(f"  export {description}: {status['state']} {status.get('error_message', '')}")
+        return None
+    return (status["update_timestamp_ms"] - status["start_timestamp_ms"]) / 1000
+
+
+def benchmark(cfg, export=False):
+    """Print graph sizes, image counts and timings of both implementations."""
+    with open(cfg["aoi_geojson"]) as f:
+        aoi = ee.Geometry.Polygon(json.load(f)["features"][0]["geometry"]["coordinates"])
+    if cfg.get("run_date", "today") == "today":
+        ref_date = datetime.datetime.now()
+    else:
+        ref_date = datetime.datetime.strptime(cfg["run_date"], "%Y-%m-%d")
+    doy = ref_date.timetuple().tm_yday
+
+    s1 = ee.ImageCollection('COPERNICUS/S1_GRD') \
+        .filterBounds(aoi) \
+        .filter(ee.Filter.listContains('transmitterReceiverPolarisation', 'VV')) \
+        .filter(ee.Filter.eq('instrumentMode', 'IW')) \
+        .select(['VV', 'angle'])
+
+    for name, build in (("loop", historical_collection_loop),
+                        ("filter", get_historical_collection)):
+        for orbit_pass in ("ASCENDING", "DESCENDING"):
+            col = build(s1, orbit_pass, doy, WINDOW, ref_date)
+            stats = _stats(col)
+            graph = len(col.serialize())
+            graph_stats = len(stats.serialize())
+
+            t0 = time.perf_counter()
+            n = col.size().getInfo()
+            t_count = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            stats.reduceRegion(ee.Reducer.mean(), aoi, 100, maxPixels=1e10).getInfo()
+            t_reduce = time.perf_counter() - t0
+
+            line = (f"{name:6s} {orbit_pass[:4]}: {n:4d} images, graph {graph:7d} B "
+                    f"(stats {graph_stats:7d} B), size() {t_count:5.1f} s, "
+                    f"reduceRegion {t_reduce:5.1f} s")
+            if export:
+                t_export = _time_export(stats, aoi, f"thaw_bench_{name}_{orbit_pass[:3].lower()}")
+                if t_export is not None:
+                    line += f", export {t_export:6.1f} s"
+            print(line, flush=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python benchmark_historical.py <config.json> [--export]")
+        sys.exit(1)
+    with open(sys.argv[1], "r") as f:
+        cfg = json.load(f)
+    initialize_ee(cfg["drive_token_path"], cfg.get("project_id"))
+    benchmark(cfg, export="--export" in sys.argv)
@@ -0,0 +1,549 @@
+# -*- coding: utf-8 -*-
+"""
+THAW - Output catalog module
+
+SQLite catalog of the Outputs folders, pipeline runs and their artifacts, so
+the dashboard lists runs and finds layers, cluster files and tracking runs
+with a query instead of globbing and regex-parsing the Outputs tree on every
+page load.
+
+The catalog lives at <output_root>/thaw_catalog.sqlite (WAL mode, so the
+dashboard can read while a pipeline writes). Paths are stored relative to
+output_root, so an Outputs folder stays portable together with its catalog.
+
+    folders    — Outputs_<date>[_<location>] folders: date, location, last update
+    runs       — lake detection runs (the folder itself) and tracking_results[_N] runs
+    artifacts  — files the dashboard uses (COGs, cluster GeoJSON/CSV, candidate
+                 caches, run logs) with kind, mtime and size
+    clusters   — every detected cluster polygon of every run (WGS84 GeoJSON
+                 geometry, area, run date, location), with an R*Tree index
+                 (clusters_rtree) on the polygon bounding boxes
+
+Both pipelines register their folder and artifacts as they write them
+(register_folder, register_tracking_run). Folders written before the catalog
+existed are picked up by a one-time backfill scan (ensure_catalog / backfill).
+
+Cluster polygons are ingested whenever a detected_clusters*.geojson artifact
+is registered, so cluster_history can tell for any polygon when it was first
+flagged, how often, and how its area developed, without reading old GeoJSON.
+Runs that reused the outputs of a previous run (no new Sentinel-1 scenes; see
+FINGERPRINT_FILE) are catalogued, but their clusters are not indexed again:
+they are the same detections, not a new flag.
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import datetime
+from contextlib import closing
+from fnmatch import fnmatch
+
+from shapely.geometry import shape
+
+CATALOG_FILE = "thaw_catalog.sqlite"
+SCHEMA_VERSION = "3"
+
+# Written by the lake detection pipeline into each run folder; a run that
+# reused previous outputs records the source folder under "reused_from"
+FINGERPRINT_FILE = "run_fingerprint.json"
+
+# Artifact kind → filename pattern (matched inside a run folder, not recursively)
+ARTIFACT_PATTERNS = {
+    "cog":             "*_cog.tif",
+    "clusters":        "detected_clusters*.geojson",
+    "cluster_summary": "cluster_summary*.csv",
+    "z_candidates":    "z_candidates*.npz",
+    "pipeline_log":    "pipeline_log_*.txt",
+    "tracking_log":    "tracking_log_*.txt",
+}
+
+_FOLDER_PREFIX = "Outputs_"
+_DATE_RE = re.compile(r"(\d{4}-\d{2}-\d{2})")
+_TRACKING_RE = re.compile(r"tracking_results(?:_(\d+))?")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS folders (
+    path        TEXT PRIMARY KEY,
+    folder_date TEXT NOT NULL,
+    location    TEXT NOT NULL DEFAULT '',
+    updated     REAL NOT NULL,
+    aoi         TEXT
+);
+CREATE INDEX IF NOT EXISTS folders_by_date ON folders (folder_date DESC, location DESC);
+CREATE TABLE IF NOT EXISTS runs (
+    path    TEXT PRIMARY KEY,
+    folder  TEXT NOT NULL,
+    kind    TEXT NOT NULL,
+    number  INTEGER,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_by_folder ON runs (folder, kind);
+CREATE TABLE IF NOT EXISTS artifacts (
+    path   TEXT PRIMARY KEY,
+    folder TEXT NOT NULL,
+    run    TEXT NOT NULL,
+    kind   TEXT NOT NULL,
+    mtime  REAL NOT NULL,
+    size   INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS artifacts_by_run ON artifacts (run, kind, mtime DESC);
+CREATE INDEX IF NOT EXISTS artifacts_by_folder ON artifacts (folder, kind, mtime DESC);
+CREATE TABLE IF NOT EXISTS clusters (
+    id           INTEGER PRIMARY KEY,
+    source       TEXT NOT NULL,
+    source_mtime REAL NOT NULL,
+    folder       TEXT NOT NULL,
+    run_date     TEXT NOT NULL,
+    location     TEXT NOT NULL,
+    cluster_id   INTEGER,
+    pixel_count  INTEGER,
+    area_m2      REAL,
+    geometry     TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS clusters_by_source ON clusters (source);
+CREATE VIRTUAL TABLE IF NOT EXISTS clusters_rtree USING rtree (id, min_lon, max_lon, min_lat, max_lat);
+"""
+
+
+# ============================================================
+# CONNECTION
+# ============================================================
+
+# PRAGMA user_version of a catalog whose tables and migrations are current
+_USER_VERSION = int(SCHEMA_VERSION)
+_initialized = set()   # catalog files initialised by this process
+
+
+def _ensure_schema(path):
+    """
+    Create the tables and apply migrations once per catalog file.
+
+    A catalog already at _USER_VERSION costs a single PRAGMA read the first
+    time a process opens it, and nothing afterwards.
+    """
+    if path in _initialized and os.path.exists(path):
+        return
+    with closing(sqlite3.connect(path, timeout=30)) as conn:
+        if conn.execute("PRAGMA user_version").fetchone()[0] < _USER_VERSION:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            _migrate(conn)
+            conn.execute(f"PRAGMA user_version = {_USER_VERSION}")
+            conn.commit()
+    _initialized.add(path)
+
+
+def connect(output_root):
+    """
+    Open (and create if needed) the catalog of an Outputs root.
+
+    Returns a sqlite3 connection in WAL mode; close it after use. Each call
+    opens its own connection, so callers in different threads or processes
+    never share one. The schema is set up by the first call per catalog
+    (_ensure_schema); later calls only open a connection.
+    """
+    os.makedirs(output_root, exist_ok=True)
+    path = os.path.join(output_root, CATALOG_FILE)
+    _ensure_schema(path)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _migrate(conn):
+    """Add columns introduced after a catalog was first created."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(folders)")}
+    if "aoi" not in columns:
+        conn.execute("ALTER TABLE folders ADD COLUMN aoi TEXT")
+
+
+def _rel(output_root, path):
+    return os.path.relpath(os.path.abspath(path), os.path.abspath(output_root)).replace(os.sep, "/")
+
+
+def _abs(output_root, rel):
+    return os.path.join(output_root, *rel.split("/"))
+
+
+def parse_folder_name(name):
+    """
+    Date and location of an Outputs folder name, or None if it is not one.
+
+    'Outputs_2026-05-01_Khumbu' → (datetime(2026, 5, 1), 'Khumbu')
+    """
+    if not name.startswith(_FOLDER_PREFIX):
+        return None
+    suffix = name[len(_FOLDER_PREFIX):]
+    m = _DATE_RE.search(suffix)
+    if not m:
+        return None
+    try:
+        folder_date = datetime.datetime.strptime(m.group(1), "%Y-%m-%d")
+    except ValueError:
+        return None
+    # Everything after the matched date (and any leading underscore) is the location
+    return folder_date, suffix[m.end():].lstrip("_")
+
+
+# ============================================================
+# REGISTRATION
+# ============================================================
+
+def _upsert_folder(conn, output_root, folder, now, aoi_bbox=None):
+    parsed = parse_folder_name(os.path.basename(os.path.normpath(folder)))
+    if parsed is None:
+        return None
+    folder_date, location = parsed
+    rel = _rel(output_root, folder)
+    conn.execute(
+        "INSERT INTO folders (path, folder_date, location, updated, aoi) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(path) DO UPDATE SET updated = excluded.updated, "
+        "aoi = COALESCE(excluded.aoi, folders.aoi)",
+        (rel, folder_date.strftime("%Y-%m-%d"), location, now,
+         json.dumps([float(v) for v in aoi_bbox]) if aoi_bbox is not None else None),
+    )
+    return rel
+
+
+def _upsert_run(conn, output_root, run_dir, folder_rel, kind, number, now):
+    rel = _rel(output_root, run_dir)
+    conn.execute(
+        "INSERT INTO runs (path, folder, kind, number, updated) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(path) DO UPDATE SET updated = excluded.updated",
+        (rel, folder_rel, kind, number, now),
+    )
+    return rel
+
+
+def _reused_from(folder):
+    """Source folder name of a lake detection run that reused previous outputs, else None."""
+    try:
+        with open(os.path.join(folder, FINGERPRINT_FILE), "r", encoding="utf-8") as f:
+            return json.load(f).get("reused_from")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _scan_artifacts(conn, output_root, run_dir, folder_rel, run_rel, index_clusters=True):
+    """
+    Record the artifacts directly inside run_dir and drop rows of files that are gone.
+
+    Cluster GeoJSON artifacts are ingested into the cluster index unless
+    index_clusters is False, in which case any indexed polygons of them are dropped.
+    """
+    seen = []
+    try:
+        entries = list(os.scandir(run_dir))
+    except OSError:
+        entries = []
+    for entry in entries:
+        kind = next((k for k, pat in ARTIFACT_PATTERNS.items() if fnmatch(entry.name, pat)), None)
+        if kind is None or not entry.is_file():
+            continue
+        st = entry.stat()
+        rel = _rel(output_root, entry.path)
+        seen.append(rel)
+        conn.execute(
+            "INSERT INTO artifacts (path, folder, run, kind, mtime, size) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(path) DO UPDATE SET mtime = excluded.mtime, size = excluded.size, "
+            "kind = excluded.kind",
+            (rel, folder_rel, run_rel, kind, st.st_mtime, st.st_size),
+        )
+        if kind == "clusters":
+            if index_clusters:
+                _ingest_clusters(conn, entry.path, rel, folder_rel, st.st_mtime)
+            else:
+                _drop_clusters(conn, rel)
+    placeholders = ",".join("?" * len(seen))
+    conn.execute(
+        f"DELETE FROM artifacts WHERE run = ? AND path NOT IN ({placeholders})" if seen
+        else "DELETE FROM artifacts WHERE run = ?",
+        (run_rel, *seen),
+    )
+    _prune_clusters(conn)
+
+
+def _register_folder(conn, output_root, folder, now, aoi_bbox=None):
+    folder_rel = _upsert_folder(conn, output_root, folder, now, aoi_bbox)
+    if folder_rel is None:
+        return None
+    run_rel = _upsert_run(conn, output_root, folder, folder_rel, "lakedetection", None, now)
+    _scan_artifacts(conn, output_root, folder, folder_rel, run_rel,
+                    index_clusters=_reused_from(folder) is None)
+    return folder_rel
+
+
+def _register_tracking(conn, output_root, run_dir, folder_rel, now):
+    m = _TRACKING_RE.fullmatch(os.path.basename(os.path.normpath(run_dir)))
+    number = int(m.group(1)) if m and m.group(1) else None
+    run_rel = _upsert_run(conn, output_root, run_dir, folder_rel, "tracking", number, now)
+    _scan_artifacts(conn, output_root, run_dir, folder_rel, run_rel)
+
+
+def register_folder(output_root, folder, aoi_bbox=None):
+    """
+    Record an Outputs folder, its lake detection run and current artifacts.
+
+    Called by the lake detection pipeline when it starts and after each step;
+    cluster polygons of new or rewritten GeoJSON files are ingested into the
+    cluster index. aoi_bbox ([min_lon, min_lat, max_lon, max_lat]) is stored
+    with the folder when given.
+    Catalog errors are reported but never raised: the files on disk remain
+    the source of truth, and a rescan rebuilds the catalog.
+    """
+    try:
+        with closing(connect(output_root)) as conn, conn:
+            _register_folder(conn, output_root, folder, time.time(), aoi_bbox)
+    except (sqlite3.Error, OSError) as e:
+        print(f"Warning: output catalog not updated: {e}", flush=True)
+
+
+def register_tracking_run(output_root, run_dir):
+    """
+    Record a tracking_results[_N] run and its artifacts (see register_folder).
+
+    Called by the tracking pipeline when it starts and when it finishes.
+    """
+    try:
+        with closing(connect(output_root)) as conn, conn:
+            now = time.time()
+            folder_rel = _upsert_folder(conn, output_root, os.path.dirname(os.path.normpath(run_dir)), now)
+            if folder_rel is not None:
+                _register_tracking(conn, output_root, run_dir, folder_rel, now)
+    except (sqlite3.Error, OSError) as e:
+        print(f"Warning: output catalog not updated: {e}", flush=True)
+
+
+def backfill(output_root):
+    """
+    Scan the whole Outputs root and bring the catalog in line with it.
+
+    Folders, runs and artifacts that no longer exist are removed. Folder
+    update times are taken from the folder mtime.
+
+    Returns
+    -------
+    int
+        Number of Outputs folders catalogued.
+    """
+    n = 0
+    with closing(connect(output_root)) as conn, conn:
+        seen_folders, seen_runs = [], []
+        for entry in sorted(os.scandir(output_root), key=lambda e: e.name):
+            if not entry.is_dir() or parse_folder_name(entry.name) is None:
+                continue
+            mtime = entry.stat().st_mtime
+            folder_rel = _register_folder(conn, output_root, entry.path, mtime)
+            seen_folders.append(folder_rel)
+            seen_runs.append(folder_rel)
+            for sub in os.scandir(entry.path):
+                if sub.is_dir() and _TRACKING_RE.fullmatch(sub.name):
+                    _register_tracking(conn, output_root, sub.path, folder_rel, sub.stat().st_mtime)
+                    seen_runs.append(_rel(output_root, sub.path))
+            n += 1
+        conn.execute("CREATE TEMP TABLE keep_folders (path TEXT PRIMARY KEY)")
+        conn.execute("CREATE TEMP TABLE keep_runs (path TEXT PRIMARY KEY)")
+        conn.executemany("INSERT INTO keep_folders VALUES (?)", [(p,) for p in seen_folders])
+        conn.executemany("INSERT INTO keep_runs VALUES (?)", [(p,) for p in seen_runs])
+        conn.execute("DELETE FROM folders WHERE path NOT IN (SELECT path FROM keep_folders)")
+        conn.execute("DELETE FROM runs WHERE path NOT IN (SELECT path FROM keep_runs)")
+        conn.execute("DELETE FROM artifacts WHERE run NOT IN (SELECT path FROM keep_runs)")
+        _prune_clusters(conn)
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)", (SCHEMA_VERSION,))
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('backfilled_at', ?)",
+                     (datetime.datetime.now().isoformat(timespec="seconds"),))
+    return n
+
+
+def ensure_catalog(output_root):
+    """Backfill the catalog once, the first time it is opened for an Outputs root."""
+    with closing(connect(output_root)) as conn:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+    if row is None or row[0] != SCHEMA_VERSION:
+        backfill(output_root)
+
+
+# ============================================================
+# CLUSTER INDEX
+# ============================================================
+
+def _bbox(geometry):
+    """(min_lon, max_lon, min_lat, max_lat) of a GeoJSON geometry, or None if empty."""
+    lons, lats = [], []
+
+    def walk(coords):
+        if coords and isinstance(coords[0], (int, float)):
+            lons.append(coords[0])
+            lats.append(coords[1])
+        else:
+            for c in coords:
+                walk(c)
+
+    walk(geometry.get("coordinates") or [])
+    if not lons:
+        return None
+    return min(lons), max(lons), min(lats), max(lats)
+
+
+def _ingest_clusters(conn, path, rel, folder_rel, mtime):
+    """(Re)load the polygons of one detected_clusters GeoJSON unless they are up to date."""
+    row = conn.execute("SELECT source_mtime FROM clusters WHERE source = ? LIMIT 1", (rel,)).fetchone()
+    if row is not None and row[0] == mtime:
+        return
+    _drop_clusters(conn, rel)
+    run_date, location = conn.execute(
+        "SELECT folder_date, location FROM folders WHERE path = ?", (folder_rel,)).fetchone()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            features = json.load(f).get("features", [])
+    except (OSError, ValueError) as e:
+        print(f"Warning: clusters of {os.path.basename(path)} not indexed: {e}", flush=True)
+        return
+    for feat in features:
+        geometry = feat.get("geometry") or {}
+        bbox = _bbox(geometry)
+        if bbox is None:
+            continue
+        props = feat.get("properties") or {}
+        cur = conn.execute(
+            "INSERT INTO clusters (source, source_mtime, folder, run_date, location, cluster_id, "
+            "pixel_count, area_m2, geometry) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (rel, mtime, folder_rel, run_date, location, props.get("cluster_id"),
+             props.get("pixel_count"), props.get("area_m2"), json.dumps(geometry)),
+        )
+        conn.execute("INSERT INTO clusters_rtree VALUES (?, ?, ?, ?, ?)", (cur.lastrowid, *bbox))
+
+
+def _drop_clusters(conn, rel):
+    """Remove the indexed polygons of one cluster GeoJSON."""
+    conn.execute("DELETE FROM clusters_rtree WHERE id IN (SELECT id FROM clusters WHERE source = ?)", (rel,))
+    conn.execute("DELETE FROM clusters WHERE source = ?", (rel,))
+
+
+def _prune_clusters(conn):
+    """Drop indexed clusters whose GeoJSON is no longer a catalogued artifact."""
+    conn.execute("DELETE FROM clusters WHERE source NOT IN "
+                 "(SELECT path FROM artifacts WHERE kind = 'clusters')")
+    conn.execute("DELETE FROM clusters_rtree WHERE id NOT IN (SELECT id FROM clusters)")
+
+
+def cluster_history(output_root, geometries, until_date=None):
+    """
+    Detection history of polygons across all catalogued runs.
+
+    Candidates come from the R*Tree bounding-box index; only clusters whose
+    polygon actually intersects are counted. Polygons of one DBSCAN cluster
+    share its area, so each cluster counts once per run; several runs on the
+    same date count as one flag, with the largest area. Runs that reused a
+    previous run's outputs are not indexed, so they never add a flag.
+
+    Parameters
+    ----------
+    output_root : str
+        Outputs root holding the catalog.
+    geometries : list[dict]
+        WGS84 GeoJSON geometries, e.g. the features of the displayed run.
+    until_date : str, optional
+        'YYYY-MM-DD'; runs after this date are ignored.
+
+    Returns
+    -------
+    list[dict]
+        One dict per geometry: first_seen, last_seen (date strings or None),
+        times_flagged (number of run dates) and areas ([(date, area_m2), …]).
+    """
+    until_date = until_date or "9999-12-31"
+    results = []
+    with closing(connect(output_root)) as conn:
+        for geometry in geometries:
+            geom = shape(geometry)
+            min_lon, min_lat, max_lon, max_lat = geom.bounds
+            rows = conn.execute(
+                "SELECT c.source, c.run_date, c.cluster_id, c.area_m2, c.geometry "
+                "FROM clusters_rtree r JOIN clusters c ON c.id = r.id "
+                "WHERE r.max_lon >= ? AND r.min_lon <= ? AND r.max_lat >= ? AND r.min_lat <= ? "
+                "AND c.run_date <= ?",
+                (min_lon, max_lon, min_lat, max_lat, until_date),
+            ).fetchall()
+            per_run = {}
+            for source, run_date, cluster_id, area_m2, other in rows:
+                if geom.intersects(shape(json.loads(other))):
+                    per_run.setdefault((run_date, source), {})[cluster_id] = area_m2 or 0.0
+            by_date = {}
+            for (run_date, _), areas in per_run.items():
+                by_date[run_date] = max(by_date.get(run_date, 0.0), sum(areas.values()))
+            dates = sorted(by_date)
+            results.append({
+                "first_seen": dates[0] if dates else None,
+                "last_seen": dates[-1] if dates else None,
+                "times_flagged": len(dates),
+                "areas": [(d, by_date[d]) for d in dates],
+            })
+    return results
+
+
+# ============================================================
+# QUERIES
+# ============================================================
+
+def list_folders(output_root):
+    """
+    Catalogued Outputs folders as (path, date, location), newest date first,
+    then by location (descending), as the Output page lists them.
+    """
+    with closing(connect(output_root)) as conn:
+        rows = conn.execute(
+            "SELECT path, folder_date, location FROM folders ORDER BY folder_date DESC, location DESC"
+        ).fetchall()
+    return [(_abs(output_root, p), datetime.datetime.strptime(d, "%Y-%m-%d"), loc) for p, d, loc in rows]
+
+
+def recent_folders(output_root, limit=4):
+    """Paths of the most recently updated Outputs folders."""
+    with closing(connect(output_root)) as conn:
+        rows = conn.execute("SELECT path FROM folders ORDER BY updated DESC LIMIT ?", (limit,)).fetchall()
+    return [_abs(output_root, p) for (p,) in rows]
+
+
+def artifacts(output_root, run_dir, kind):
+    """
+    Existing artifacts of one kind in a run folder, newest first.
+
+    Rows of files deleted outside the pipelines are dropped on the way.
+    """
+    with closing(connect(output_root)) as conn, conn:
+        rows = conn.execute(
+            "SELECT path FROM artifacts WHERE run = ? AND kind = ? ORDER BY mtime DESC",
+            (_rel(output_root, run_dir), kind),
+        ).fetchall()
+        paths, gone = [], []
+        for (rel,) in rows:
+            path = _abs(output_root, rel)
+            if os.path.isfile(path):
+                paths.append(path)
+            else:
+                gone.append((rel,))
+        if gone:
+            conn.executemany("DELETE FROM artifacts WHERE path = ?", gone)
+            _prune_clusters(conn)
+    return paths
+
+
+def tracking_runs(output_root, folder):
+    """
+    Tracking runs of an Outputs folder as [(label, path), …] in display order:
+    the legacy unnumbered run first ('Tracking'), then Tracking 1, 2, …
+    """
+    with closing(connect(output_root)) as conn:
+        rows = conn.execute(
+            "SELECT path, number FROM runs WHERE folder = ? AND kind = 'tracking' "
+            "ORDER BY number IS NOT NULL, number",
+            (_rel(output_root, folder),),
+        ).fetchall()
+    return [("Tracking" if n is None else f"Tracking {n}", _abs(output_root, p)) for p, n in rows]
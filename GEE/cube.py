@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+"""
+THAW - Pixel time-series cube module
+
+Append-only, chunked float32 cube per AOI holding the z_score and
+potential_water grid of every lake detection run, so the history of one pixel
+is read from one chunk file per variable instead of opening every weekly COG.
+
+Layout of a cube (<output_root>/cubes/<aoi>/):
+
+    grid.json                 — fixed AOI grid: CRS, transform, shape, chunk size, WGS84 bounds
+    times.json                — committed time steps: date, source raster, append time
+    {variable}/r{i}_c{j}.f32  — one spatial chunk (CHUNK × CHUNK), all time steps
+                                appended one after the other (time-major)
+
+The grid is taken from the first run appended; later runs are resampled onto
+it if their grid differs. An append writes the new slice to every chunk file
+and then commits it by rewriting times.json atomically. A crash in between
+leaves chunk files longer than the committed length; they are truncated back
+on the next append, and readers only ever read committed time steps.
+"""
+
+import os
+import re
+import sys
+import glob
+import json
+import datetime
+
+import numpy as np
+import rasterio
+from rasterio.transform import Affine, rowcol
+from rasterio.warp import reproject, transform_bounds, transform as warp_transform, Resampling
+from filelock import FileLock
+
+CUBE_DIR = "cubes"
+CUBE_VARIABLES = ("z_score", "potential_water")
+CHUNK = 256  # pixels per chunk side; one time step of a chunk is 256 KB
+_GRID = "grid.json"
+_TIMES = "times.json"
+_BYTES_PER_SLICE = CHUNK * CHUNK * 4
+
+
+# ============================================================
+# CUBE METADATA
+# ============================================================
+
+def cube_dir_for(output_root, task_name, coord_tag):
+    """Cube folder of an AOI, named after the task and the AOI centre tag."""
+    name = f"{task_name}_{coord_tag}" if task_name else coord_tag
+    return os.path.join(output_root, CUBE_DIR, name)
+
+
+def _write_json(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp, path)
+
+
+def _read_json(path, default):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def load_grid(cube_dir):
+    """Grid definition of a cube, or None if nothing has been appended yet."""
+    return _read_json(os.path.join(cube_dir, _GRID), None)
+
+
+def load_times(cube_dir):
+    """Committed time steps of a cube ([] if empty)."""
+    return _read_json(os.path.join(cube_dir, _TIMES), {"times": []})["times"]
+
+
+def _grid_from_raster(path):
+    with rasterio.open(path) as src:
+        return {
+            "crs": src.crs.to_wkt(),
+            "transform": list(src.transform)[:6],
+            "width": src.width,
+            "height": src.height,
+            "chunk": CHUNK,
+            "bounds_wgs84": list(transform_bounds(src.crs, "EPSG:4326", *src.bounds)),
+        }
+
+
+def _chunk_path(cube_dir, variable, i, j):
+    return os.path.join(cube_dir, variable, f"r{i}_c{j}.f32")
+
+
+def _n_chunks(grid):
+    return -(-grid["height"] // CHUNK), -(-grid["width"] // CHUNK)
+
+
+# ============================================================
+# APPEND
+# ============================================================
+
+def _read_on_grid(path, grid):
+    """Read a single-band raster onto the cube grid as float32 with NaN for no data."""
+    shape = (grid["height"], grid["width"])
+    transform = Affine(*grid["transform"])
+    with rasterio.open(path) as src:
+        nodata = src.nodata
+        if (src.shape == shape and src.transform.almost_equals(transform)
+                and src.crs == rasterio.crs.CRS.from_wkt(grid["crs"])):
+            data = src.read(1).astype(np.float32)
+            if nodata is not None:
+                data[data == nodata] = np.nan
+        else:
+            data = np.full(shape, np.nan, dtype=np.float32)
+            reproject(
+                source=rasterio.band(src, 1), destination=data,
+                src_transform=src.transform, src_crs=src.crs, src_nodata=nodata,
+                dst_transform=transform, dst_crs=grid["crs"], dst_nodata=np.nan,
+                resampling=Resampling.bilinear,
+            )
+    data[data <= -9999] = np.nan
+    return data
+
+
+def _truncate_to(cube_dir, grid, n_committed):
+    """Cut chunk files back to the committed number of time steps (crash recovery)."""
+    size = n_committed * _BYTES_PER_SLICE
+    for variable in CUBE_VARIABLES:
+        for path in glob.glob(os.path.join(cube_dir, variable, "*.f32")):
+            if os.path.getsize(path) > size:
+                with open(path, "r+b") as f:
+                    f.truncate(size)
+
+
+def append_run(cube_dir, date, rasters, source=""):
+    """
+    Append one run's grids to the cube as a new time step.
+
+    Parameters
+    ----------
+    cube_dir : str
+        Cube folder (see cube_dir_for); created on the first append.
+    date : str
+        Run reference date, 'YYYY-MM-DD'.
+    rasters : dict[str, str]
+        {variable: GeoTIFF path} for variables in CUBE_VARIABLES; missing
+        variables are stored as NaN.
+    source : str, optional
+        Identifier of the run (e.g. its run label). A time step with the
+        same date and source is not appended twice.
+
+    Returns
+    -------
+    bool
+        True if a time step was appended, False if it was already present.
+    """
+    os.makedirs(cube_dir, exist_ok=True)
+    with FileLock(os.path.join(cube_dir, ".lock")):
+        times = load_times(cube_dir)
+        if any(t["date"] == date and t["source"] == source for t in times):
+            return False
+
+        grid = load_grid(cube_dir)
+        if grid is None:
+            grid = _grid_from_raster(next(iter(rasters.values())))
+            _write_json(os.path.join(cube_dir, _GRID), grid)
+        _truncate_to(cube_dir, grid, len(times))
+
+        n_rows, n_cols = _n_chunks(grid)
+        offset = len(times) * _BYTES_PER_SLICE
+        for variable in CUBE_VARIABLES:
+            os.makedirs(os.path.join(cube_dir, variable), exist_ok=True)
+            if variable in rasters:
+                data = _read_on_grid(rasters[variable], grid)
+            else:
+                data = np.full((grid["height"], grid["width"]), np.nan, dtype=np.float32)
+            padded = np.full((n_rows * CHUNK, n_cols * CHUNK), np.nan, dtype=np.float32)
+            padded[:data.shape[0], :data.shape[1]] = data
+            for i in range(n_rows):
+                for j in range(n_cols):
+                    path = _chunk_path(cube_dir, variable, i, j)
+                    with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+                        f.seek(offset)
+                        f.write(np.ascontiguousarray(
+                            padded[i * CHUNK:(i + 1) * CHUNK, j * CHUNK:(j + 1) * CHUNK]).tobytes())
+
+        # Commit: the new slice becomes visible to readers only now
+        times.append({
+            "date": date,
+            "source": source,
+            "appended": datetime.datetime.now().isoformat(timespec="seconds"),
+        })
+        _write_json(os.path.join(cube_dir, _TIMES), {"variables": list(CUBE_VARIABLES), "times": times})
+    return True
+
+
+def append_output_folder(output_root, local_dir, date, task_name, coord_tag, run_label):
+    """
+    Append the z_score / potential_water rasters of a lake detection run folder.
+
+    Returns the cube folder, or None when the run has no z_score raster.
+    """
+    rasters = {}
+    for variable in CUBE_VARIABLES:
+        files = [f for f in glob.glob(os.path.join(local_dir, f"{variable}_{run_label}*.tif"))
+                 if not f.endswith("_cog.tif")]
+        if files:
+            rasters[variable] = files[0]
+    if "z_score" not in rasters:
+        return None
+    cube_dir = cube_dir_for(output_root, task_name, coord_tag)
+    append_run(cube_dir, date, rasters, source=run_label)
+    return cube_dir
+
+
+# ============================================================
+# QUERIES
+# ============================================================
+
+def find_cubes(output_root, lon, lat):
+    """Cube folders whose grid covers a WGS84 point."""
+    found = []
+    for grid_path in sorted(glob.glob(os.path.join(output_root, CUBE_DIR, "*", _GRID))):
+        grid = _read_json(grid_path, None)
+        if grid is None:
+            continue
+        west, south, east, north = grid["bounds_wgs84"]
+        if west <= lon <= east and south <= lat <= north:
+            found.append(os.path.dirname(grid_path))
+    return found
+
+
+def point_history(cube_dir, lon, lat, variables=CUBE_VARIABLES):
+    """
+    Full time series of one pixel.
+
+    Reads one chunk file per variable through a memory map, touching only the
+    pages that hold the pixel. Time steps with the same date keep the latest
+    append.
+
+    Parameters
+    ----------
+    cube_dir : str
+        Cube folder.
+    lon, lat : float
+        WGS84 point.
+    variables : tuple of str
+        Variables to return.
+
+    Returns
+    -------
+    dict or None
+        {"dates": [...], variable: np.ndarray, ...} sorted by date, or None if
+        the point lies outside the grid or the cube is empty.
+    """
+    grid = load_grid(cube_dir)
+    times = load_times(cube_dir)
+    if grid is None or not times:
+        return None
+    xs, ys = warp_transform("EPSG:4326", grid["crs"], [lon], [lat])
+    row, col = rowcol(Affine(*grid["transform"]), xs[0], ys[0])
+    if not (0 <= row < grid["height"] and 0 <= col < grid["width"]):
+        return None
+    i, r = divmod(row, CHUNK)
+    j, c = divmod(col, CHUNK)
+
+    n = len(times)
+    series = {}
+    for variable in variables:
+        path = _chunk_path(cube_dir, variable, i, j)
+        values = np.full(n, np.nan, dtype=np.float32)
+        n_avail = min(n, os.path.getsize(path) // _BYTES_PER_SLICE) if os.path.exists(path) else 0
+        if n_avail:
+            mm = np.memmap(path, dtype=np.float32, mode="r", shape=(n_avail, CHUNK, CHUNK))
+            values[:n_avail] = mm[:, r, c]
+            del mm
+        series[variable] = values
+
+    # Latest append wins for repeated dates; output sorted by date
+    latest = {t["date"]: k for k, t in enumerate(times)}
+    order = [latest[d] for d in sorted(latest)]
+    out = {"dates": sorted(latest)}
+    for variable in variables:
+        out[variable] = series[variable][order]
+    return out
+
+
+# ============================================================
+# BACKFILL
+# ============================================================
+
+_RUN_LABEL_RE = re.compile(r"z_score_((\d{4}-\d{2}-\d{2})_(-?\d+_-?\d+)_\d{3})\.tif$")
+
+
+def backfill_cubes(output_root):
+    """
+    Append every lake detection run under output_root that is not in its cube yet.
+
+    Runs are found from their z_score_<date>_<coord_tag>_<id>.tif rasters; the
+    AOI is identified by the folder's task name and the coord tag.
+
+    Returns
+    -------
+    int
+        Number of time steps appended.
+    """
+    appended = 0
+    for folder in sorted(glob.glob(os.path.join(output_root, "Outputs_*"))):
+        task_name = os.path.basename(folder)[len("Outputs_") + 10:].lstrip("_")
+        for z_path in sorted(glob.glob(os.path.join(folder, "z_score_*.tif"))):
+            m = _RUN_LABEL_RE.search(os.path.basename(z_path))
+            if not m:
+                continue
+            run_label, date, coord_tag = m.groups()
+            rasters = {"z_score": z_path}
+            pw = os.path.join(folder, f"potential_water_{run_label}.tif")
+            if os.path.exists(pw):
+                rasters["potential_water"] = pw
+            try:
+                appended += append_run(cube_dir_for(output_root, task_name, coord_tag), date,
+                                       rasters, source=run_label)
+            except Exception as e:
+                print(f"Warning: could not append {os.path.basename(z_path)}: {e}", flush=True)
+    return appended
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python cube.py <output_root>")
+        sys.exit(1)
+    print(f"Appended {backfill_cubes(sys.argv[1])} time step(s).")
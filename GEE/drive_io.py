@@ -15,7 +15,9 @@ import os
 import io
 import sys
 import glob
+import json
 import time
+import contextlib
 import socket
 import datetime
 import ee
@@ -25,6 +27,7 @@ from rio_cogeo.cogeo import cog_translate
 from rio_cogeo.profiles import cog_profiles
 
 from gee_auth import build_drive_service
+from run_files import events_path_for, write_status_file
 
 
 class CancelledError(RuntimeError):
@@ -199,6 +202,9 @@ class Logger:
 
     Used by both headless pipeline scripts to ensure all console output
     is preserved in the run log without losing live terminal feedback.
+    Also maintains the sidecar status file (see write_status_file): 'running'
+    on creation, 'success' / 'failed' when a PIPELINE_SUCCESS / PIPELINE_ERROR
+    marker is written.
 
     Parameters
     ----------
@@ -208,10 +214,26 @@ class Logger:
     def __init__(self, filename):
         self.terminal = sys.stdout
         self.log = open(filename, "a", encoding="utf-8")
+        self.filename = str(filename)
+        self._write_status("running")
+        set_event_log(events_path_for(self.filename))
+
+    def _write_status(self, status, message=""):
+        try:
+            write_status_file(self.filename, status, message, pid=os.getpid())
+        except Exception:
+            pass  # the log itself still carries the markers
 
     def write(self, message):
         self.log.write(message)   # log file first — must not be lost
         self.log.flush()
+        if "PIPELINE_" in message:
+            if "PIPELINE_SUCCESS" in message:
+                self._write_status("success", message.strip())
+                emit("pipeline_end", status="success", message=message.strip())
+            elif "PIPELINE_ERROR" in message:
+                self._write_status("failed", message.strip())
+                emit("pipeline_end", status="failed", message=message.strip())
         try:
             self.terminal.write(message)
             self.terminal.flush()
@@ -226,6 +248,79 @@ class Logger:
             pass
 
 
+# ============================================================
+# PROGRESS EVENTS
+# ============================================================
+#
+# Machine-readable progress of a run, one JSON object per line in
+# <log>_events.jsonl next to the run log, e.g.
+#
+#   {"t": 1767000000.1, "event": "stage_start", "stage": "download", "index": 1, "total": 4}
+#   {"t": 1767000090.4, "event": "file_downloaded", "label": "z_score", "bytes": 5242880, "done": 1, "total": 2}
+#
+# Events: pipeline_start, stage_start, stage_end (status done | skipped |
+# failed, duration_s), downloads_planned, task_submitted, task_state,
+# file_downloaded, retry, error, pipeline_end. The dashboard folds them into
+# progress bars and ETAs (Dashboard/log_tail.py) instead of parsing the log.
+
+_event_path = None
+
+
+def set_event_log(path):
+    """Direct emit() to path (None disables events). Set by Logger."""
+    global _event_path
+    _event_path = path
+
+
+def emit(event, **fields):
+    """
+    Append one progress event to the run's event file.
+
+    Each event is written and flushed as a single line, so readers never see
+    a partial record. Errors are swallowed: progress reporting must never
+    fail the pipeline.
+    """
+    if _event_path is None:
+        return
+    try:
+        line = json.dumps({"t": round(time.time(), 3), "event": event, **fields}, default=str)
+        with open(_event_path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except Exception:
+        pass
+
+
+@contextlib.contextmanager
+def stage(name, index, total):
+    """
+    Emit stage_start / stage_end events (with duration) around a pipeline step.
+
+    An exception leaving the block is recorded as a failed stage and re-raised.
+    """
+    t0 = time.time()
+    emit("stage_start", stage=name, index=index, total=total)
+    try:
+        yield
+    except BaseException as e:
+        emit("stage_end", stage=name, index=index, total=total, status="failed",
+             duration_s=round(time.time() - t0, 1), error=str(e))
+        raise
+    emit("stage_end", stage=name, index=index, total=total, status="done",
+         duration_s=round(time.time() - t0, 1))
+
+
+def skip_stage(name, index, total):
+    """Record a step that is already complete (resumed run)."""
+    emit("stage_end", stage=name, index=index, total=total, status="skipped", duration_s=0.0)
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
 # ============================================================
 # SHARED POLL-DOWNLOAD-DELETE LOOP
 # ============================================================
@@ -283,6 +378,9 @@ def _poll_and_download(task_list, drive_service, token_path):
                 status = {}
 
             pass_states[idx] = state
+            if state != item.get("state"):
+                item["state"] = state
+                emit("task_state", label=item["label"], state=state)
 
             if state == "COMPLETED":
                 try:
@@ -305,6 +403,7 @@ def _poll_and_download(task_list, drive_service, token_path):
                         file_prefix=item["file_prefix"])
                     if not ok or not _is_valid_tif(item["local_path"]):
                         print(f"Warning: downloaded file is corrupt or unreadable, skipping: {os.path.basename(item['local_path'])}", flush=True)
+                        emit("error", label=item["label"], message="downloaded file is corrupt or unreadable")
                         try:
                             os.remove(item["local_path"])
                         except OSError:
@@ -314,6 +413,8 @@ def _poll_and_download(task_list, drive_service, token_path):
                         continue
                     downloaded += 1
                     print(f"Downloaded files: ({downloaded}/{len(task_list)})", flush=True)
+                    emit("file_downloaded", label=item["label"], bytes=_file_size(item["local_path"]),
+                         done=downloaded, total=len(task_list))
                     item["drive_file_ids"] = tile_ids
                     item["done"] = True
                     completed += 1
@@ -322,6 +423,7 @@ def _poll_and_download(task_list, drive_service, token_path):
                     stall_counts[idx] += 1
                     if stall_counts[idx] >= 10:
                         print(f"Warning: file never appeared in Drive for {item['label']}, skipping.", flush=True)
+                        emit("error", label=item["label"], message="file never appeared in Drive")
                         item["done"]   = True
                         item["failed"] = True
                         completed += 1
@@ -331,6 +433,7 @@ def _poll_and_download(task_list, drive_service, token_path):
                     f"Task {state.lower()}: {item['label']} — {status.get('error_message', '')}",
                     flush=True,
                 )
+                emit("error", label=item["label"], message=f"task {state.lower()}: {status.get('error_message', '')}")
                 item["done"]      = True
                 item["failed"]    = True
                 item["cancelled"] = (state == "CANCELLED")
@@ -414,6 +517,8 @@ def export_and_download(images_to_export, reference_date, aoi, token_path,
     if not missing:
         return local_dir
 
+    emit("downloads_planned", total=len(missing), already_local=len(images_to_export) - len(missing))
+
     # Check Drive for files already exported (avoids re-submitting GEE tasks on retry)
     drive_available = []  # (file_prefix, local_path, drive_files_list)
     need_gee = {}         # name → (img, file_prefix, local_path)
@@ -444,6 +549,7 @@ def export_and_download(images_to_export, reference_date, aoi, token_path,
                                                      file_prefix=file_prefix)
             if ok:
                 ids_downloaded.extend(tile_ids)
+                emit("file_downloaded", label=file_prefix, bytes=_file_size(local_path), source="drive")
         if ids_downloaded:
             delete_drive_files(token_path, ids_downloaded)
 
@@ -472,6 +578,7 @@ def export_and_download(images_to_export, reference_date, aoi, token_path,
             "done":           False,
         })
         print(f"Started GEE task: {name}", flush=True)
+        emit("task_submitted", label=name, task_id=getattr(task, "id", None))
 
     ids_to_delete = []
     try:
@@ -524,7 +631,9 @@ def export_images_via_drive(s1_collection, aoi_ee, token_path,
     os.makedirs(output_dir, exist_ok=True)
     drive_service = build_drive_service(token_path)
 
-    count = s1_collection.size().getInfo()
+    # Scene count and acquisition times in one request
+    img_times = s1_collection.aggregate_array('system:time_start').getInfo()
+    count = len(img_times)
     s1_list = s1_collection.toList(count)
 
     import re as _re
@@ -534,8 +643,7 @@ def export_images_via_drive(s1_collection, aoi_ee, token_path,
     for i in range(count):
         img = ee.Image(s1_list.get(i))
         try:
-            img_time = img.get('system:time_start').getInfo()
-            img_date = datetime.datetime.fromtimestamp(img_time / 1000, tz=datetime.timezone.utc).strftime('%Y-%m-%d')
+            img_date = datetime.datetime.fromtimestamp(img_times[i] / 1000, tz=datetime.timezone.utc).strftime('%Y-%m-%d')
         except Exception:
             img_date = f"img{i:03d}"
         for band in bands_to_export:
@@ -557,6 +665,7 @@ def export_images_via_drive(s1_collection, aoi_ee, token_path,
     already_local     = len(expected) - len(missing_locally)
     if already_local:
         print(f"{already_local} file(s) already on disk, skipping.", flush=True)
+    emit("downloads_planned", total=len(missing_locally), already_local=already_local)
 
     # Check Drive for the locally-missing files
     drive_available = []   # (local_path, file_prefix, drive_files_list) — found in Drive
@@ -591,6 +700,8 @@ def export_images_via_drive(s1_collection, aoi_ee, token_path,
                 if ok:
                     dl_count += 1
                     ids_downloaded.extend(tile_ids)
+                    emit("file_downloaded", label=os.path.basename(local_path),
+                         bytes=_file_size(local_path), source="drive")
             print(f"Downloaded {dl_count}/{len(drive_available)} file(s) from Drive.", flush=True)
             if ids_downloaded:
                 delete_drive_files(token_path, ids_downloaded)
@@ -626,8 +737,10 @@ def export_images_via_drive(s1_collection, aoi_ee, token_path,
                 "drive_file_ids": [],
                 "done":           False,
             })
+            emit("task_submitted", label=os.path.basename(local_path), task_id=getattr(task, "id", None))
         except Exception as e:
             print(f"Failed to start task for {file_prefix}: {e}", flush=True)
+            emit("error", label=os.path.basename(local_path), message=f"task not started: {e}")
 
     if not task_list:
         print("No tasks to run (all files already exist or none launched).", flush=True)
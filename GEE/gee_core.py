@@ -13,11 +13,12 @@ Created on Feb 2 2026
 Sections
 --------
 1. Geometry utilities
-2. Radar masking          (lakedetection pipeline)
+2. Radar masking          (both pipelines)
 3. Historical collection  (lakedetection pipeline)
 4. S1 preprocessing       (tracking pipeline)
 5. Temporal smoothing     (tracking pipeline)
 6. Water likelihood       (tracking pipeline + shared)
+7. Batched getInfo        (preflight checks of both pipelines)
 """
 
 import ee
@@ -85,19 +86,23 @@ def get_radar_azimuth(image):
     return ee.Number(radar_azimuth)
 
 
-def annotate_with_mean_angle(aoi, scale=30):
+def annotate_with_mean_angle(aoi, scale=1000):
     """
     Return a mapping function that stores the spatially-averaged incidence
     angle as the 'mean_angle' image property.
 
-    Required before applying any thinning-correction shift.
+    Required before applying any thinning-correction shift. The angle band
+    is a smooth ramp across the swath, so a coarse scale gives the same mean
+    to well below 0.01°. For whole collections prefer
+    annotate_collection_with_mean_angle(), which reduces once per relative
+    orbit instead of once per scene.
 
     Parameters
     ----------
     aoi : ee.Geometry
         Area over which the angle band is averaged.
     scale : int, optional
-        Spatial scale in metres for the reduction (default 30).
+        Spatial scale in metres for the reduction (default 1000).
 
     Returns
     -------
@@ -116,68 +121,218 @@ def annotate_with_mean_angle(aoi, scale=30):
     return annotate
 
 
+def orbit_key(orbit):
+    """
+    Dictionary key of a relative orbit number: the integer as a string.
+
+    The number is cast to an integer first, so 12 and 12.0 give the same
+    key and '%d' never meets a floating-point value.
+    """
+    return ee.Number(orbit).toInt().format('%d')
+
+
+def annotate_collection_with_mean_angle(collection, aoi, scale=1000):
+    """
+    Set 'mean_angle' on every image, reducing the angle band once per relative orbit.
+
+    Scenes of the same relative orbit view the AOI with the same geometry,
+    so the mean incidence angle over the AOI is computed once per orbit and
+    shared by its scenes. It is reduced from the mosaic of all scenes of the
+    orbit, so an orbit whose scenes are slices covering part of the AOI
+    along the track still gets the mean over the whole AOI.
+
+    Parameters
+    ----------
+    collection : ee.ImageCollection
+        Sentinel-1 collection with the 'angle' band and the
+        'relativeOrbitNumber_start' property.
+    aoi : ee.Geometry
+        Area over which the angle band is averaged.
+    scale : int, optional
+        Spatial scale in metres for the reduction (default 1000).
+
+    Returns
+    -------
+    ee.ImageCollection
+    """
+    orbits = collection.aggregate_array('relativeOrbitNumber_start').distinct()
+
+    def orbit_angle(orbit):
+        return collection.filter(ee.Filter.eq('relativeOrbitNumber_start', orbit)) \
+            .select('angle').mosaic() \
+            .reduceRegion(
+                reducer=ee.Reducer.mean(),
+                geometry=aoi,
+                scale=scale,
+                maxPixels=1e9
+            ).get('angle')
+
+    angles = ee.Dictionary.fromLists(orbits.map(orbit_key), orbits.map(orbit_angle))
+    return collection.map(lambda image: image.set(
+        'mean_angle', angles.get(orbit_key(image.get('relativeOrbitNumber_start')))))
 
 
 # ============================================================
-# 2. RADAR MASKING — LAKEDETECTION PIPELINE
+# 2. RADAR MASKING — SHARED TERRAIN GEOMETRY
 # ============================================================
 
-def get_radar_mask(image, dem):
+# Sentinel-1 orbit: sun-synchronous, 175 orbits per 12-day repeat cycle.
+# The aspect of the incidence-angle field (direction towards the right-looking
+# satellite) follows from the ground-track heading, which depends on the
+# latitude: ~257° ascending / ~103° descending at 28° N, ~244° / ~116° at
+# 70° N. S1_GRD carries no heading property, so it is derived per scene from
+# the latitude of the footprint centroid (angle_aspect).
+# offline_core.py implements this section in NumPy; keep both in step.
+S1_INCLINATION_DEG = 98.18
+S1_ROTATION_RATIO = (12 * 1440 / 175) / 1436.07   # orbital period / sidereal day
+
+
+# Angle A between north and the ascending ground track's westward heading,
+# at latitude `lat` (degrees), in radians: the inertial track azimuth
+# asin(cos(inclination) / cos(lat)), its sine clamped to [-1, 1] beyond the
+# inclination, with the Earth's rotation under the satellite added to the
+# westward component, which is never zero. Heading = A - 90°; aspect =
+# 180° + A ascending, 180° - A descending (sign +1 / -1). The expressions
+# use only Number functions and numeric constants; the clamp is done with
+# Number methods.
+_DEG = math.pi / 180
+SIN_PSI_EXPR = f"{math.cos(math.radians(S1_INCLINATION_DEG))!r} / cos(lat * {_DEG!r})"
+ASPECT_EXPR = (f"{math.pi!r} + sign * atan(sqrt(1 - s * s)"
+               f" / ({S1_ROTATION_RATIO!r} * cos(lat * {_DEG!r}) - s))")
+ORBIT_PASS_SIGN = {'ASCENDING': 1, 'DESCENDING': -1}
+
+
+def angle_aspect(latitude, orbit_pass):
     """
-    Compute a valid-data mask based on radar geometry and terrain.
+    Aspect of the S1 incidence-angle field at a latitude, in radians.
 
-    Masks out layover, shadow, and low-backscatter artefacts using the
-    gamma-naught volume correction. Returns a binary mask image.
+    The look direction is perpendicular to the ground-track heading, which
+    turns westward with latitude (ASPECT_EXPR); the aspect points
+    back towards the satellite.
+
+    Parameters
+    ----------
+    latitude : ee.Number
+        Latitude in degrees.
+    orbit_pass : ee.String
+        'ASCENDING' or 'DESCENDING'.
+
+    Returns
+    -------
+    ee.Number
+    """
+    sin_psi = ee.Number.expression(SIN_PSI_EXPR, {'lat': latitude}).max(-1).min(1)
+    sign = ee.Dictionary(ORBIT_PASS_SIGN).get(orbit_pass)
+    return ee.Number.expression(ASPECT_EXPR, {'lat': latitude, 's': sin_psi, 'sign': sign})
+
+
+def build_terrain_stack(dem):
+    """
+    Precompute the scene-independent terrain geometry of a DEM.
+
+    Built once per AOI and shared by all scenes; only the incidence angle and
+    the look direction (angle_aspect) vary per scene.
 
     Parameters
     ----------
-    image : ee.Image
-        Sentinel-1 GRD image with 'VV' and 'angle' bands.
     dem : ee.Image
-        Digital elevation model used for terrain geometry.
+        Digital elevation model.
 
     Returns
     -------
     ee.Image
-        Single-band binary mask named 'valid_mask'.
+        Bands 'slope' and 'aspect' (radians), 'tan_slope', 'sin_aspect',
+        'cos_aspect'.
+    """
+    deg2rad = math.pi / 180
+    slope = ee.Terrain.slope(dem).multiply(deg2rad).rename('slope')
+    aspect = ee.Terrain.aspect(dem).multiply(deg2rad).rename('aspect')
+    return ee.Image.cat([
+        slope,
+        aspect,
+        slope.tan().rename('tan_slope'),
+        aspect.sin().rename('sin_aspect'),
+        aspect.cos().rename('cos_aspect'),
+    ])
+
+
+def radar_geometry(image, terrain, vv_band='VV'):
+    """
+    Gamma-naught volume-corrected backscatter and layover/shadow mask of a scene.
+
+    Parameters
+    ----------
+    image : ee.Image
+        Sentinel-1 GRD image with vv_band and 'angle' bands, the
+        'orbitProperties_pass' property and its footprint, whose centroid
+        latitude sets the look direction.
+    terrain : ee.Image
+        Output of build_terrain_stack().
+    vv_band : str, optional
+        Name of the VV backscatter band (dB).
+
+    Returns
+    -------
+    (ee.Image, ee.Image)
+        gamma0 volume-corrected VV in dB, and the binary mask (no layover,
+        no shadow, gamma0 > -35 dB), smoothed by a 3-pixel focal median.
     """
-    theta_i = image.select('angle')
-    phi_i = ee.Terrain.aspect(theta_i).reduceRegion(
-        reducer=ee.Reducer.mean(),
-        geometry=image.geometry(),
-        scale=1000,
-        maxPixels=1e9
-    ).get('aspect')
-    phi_i = ee.Number(phi_i)
-
-    alpha_s = ee.Terrain.slope(dem).select('slope')
-    phi_s = ee.Terrain.aspect(dem).select('aspect')
-    phi_r = ee.Image.constant(phi_i).subtract(phi_s)
-
-    deg2rad, rad2deg = math.pi / 180, 180 / math.pi
-    theta_i_rad = theta_i.multiply(deg2rad)
-    alpha_s_rad = alpha_s.multiply(deg2rad)
-    phi_r_rad = phi_r.multiply(deg2rad)
-    ninetyRad = ee.Image.constant(math.pi / 2)
-
-    alpha_r_rad = alpha_s_rad.tan().multiply(phi_r_rad.cos()).atan()
-    alpha_az = alpha_s_rad.tan().multiply(phi_r_rad.sin()).atan()
+    deg2rad = math.pi / 180
+    latitude = image.geometry().centroid(1000).coordinates().get(1)
+    phi_i = angle_aspect(latitude, image.get('orbitProperties_pass'))
+    sin_i, cos_i = phi_i.sin(), phi_i.cos()
+
+    # cos/sin of phi_r = phi_i - phi_s, from the precomputed aspect terms
+    cos_phi_r = terrain.select('cos_aspect').multiply(cos_i) \
+        .add(terrain.select('sin_aspect').multiply(sin_i))
+    sin_phi_r = terrain.select('cos_aspect').multiply(sin_i) \
+        .subtract(terrain.select('sin_aspect').multiply(cos_i))
+
+    theta_i_rad = image.select('angle').multiply(deg2rad)
+    tan_slope = terrain.select('tan_slope')
+    ninety_rad = ee.Image.constant(math.pi / 2)
+
+    # Slope steepness in range and azimuth, local incidence angle
+    alpha_r_rad = tan_slope.multiply(cos_phi_r).atan()
+    alpha_az = tan_slope.multiply(sin_phi_r).atan()
     theta_lia_rad = alpha_az.cos().multiply(theta_i_rad.subtract(alpha_r_rad).cos()).acos()
-    theta_lia = theta_lia_rad.multiply(rad2deg)
 
-    sigma0 = ee.Image.constant(10).pow(image.select('VV').divide(10))
+    # Gamma-naught volume correction
+    sigma0 = ee.Image.constant(10).pow(image.select(vv_band).divide(10))
     gamma0 = sigma0.divide(theta_i_rad.cos())
     gamma0_volume = gamma0.divide(
-        ninetyRad.subtract(theta_i_rad).add(alpha_r_rad).tan()
-        .divide(ninetyRad.subtract(theta_i_rad).tan()).abs()
+        ninety_rad.subtract(theta_i_rad).add(alpha_r_rad).tan()
+        .divide(ninety_rad.subtract(theta_i_rad).tan()).abs()
     )
     gamma0_volume_db = ee.Image.constant(10).multiply(gamma0_volume.log10())
 
-    alpha_r = alpha_r_rad.multiply(rad2deg)
-    layover = alpha_r.gt(theta_i)
-    shadow = theta_lia.gt(85)
+    # Layover, shadow, and combined mask
+    layover = alpha_r_rad.gt(theta_i_rad)
+    shadow = theta_lia_rad.gt(85 * deg2rad)
     mask = layover.Not().And(shadow.Not()).And(gamma0_volume_db.gt(-35)).focalMedian(3)
-    return mask.rename('valid_mask')
+    return gamma0_volume_db, mask
+
+
+def get_radar_mask(image, terrain):
+    """
+    Compute a valid-data mask based on radar geometry and terrain.
+
+    Masks out layover, shadow, and low-backscatter artefacts using the
+    gamma-naught volume correction. Returns a binary mask image.
+
+    Parameters
+    ----------
+    image : ee.Image
+        Sentinel-1 GRD image with 'VV' and 'angle' bands.
+    terrain : ee.Image
+        Output of build_terrain_stack().
+
+    Returns
+    -------
+    ee.Image
+        Single-band binary mask named 'valid_mask'.
+    """
+    return radar_geometry(image, terrain)[1].rename('valid_mask')
 
 
 def apply_radar_mask_to_collection(collection, dem, thinning_correction=0.0):
@@ -203,9 +358,10 @@ def apply_radar_mask_to_collection(collection, dem, thinning_correction=0.0):
         Collection with 'VV_masked' and 'valid_mask' bands added.
     """
     thinning_correction = float(thinning_correction)
+    terrain = build_terrain_stack(dem)
 
     def wrap(image):
-        mask = get_radar_mask(image, dem)
+        mask = get_radar_mask(image, terrain)
         maskedVV = image.select('VV').updateMask(mask).rename('VV_masked')
         image = image.addBands(maskedVV).addBands(mask).copyProperties(image, image.propertyNames())
         if thinning_correction != 0.0:
@@ -228,12 +384,39 @@ def apply_radar_mask_to_collection(collection, dem, thinning_correction=0.0):
 # 3. HISTORICAL COLLECTION — LAKEDETECTION PIPELINE
 # ============================================================
 
-def get_historical_collection(s1, orbit_pass, doy, window, yearsBack, reference_date):
+def _year_runs(years):
+    """Split a list of years into contiguous (first, last) runs."""
+    runs = []
+    for y in sorted(set(years)):
+        if runs and y == runs[-1][1] + 1:
+            runs[-1][1] = y
+        else:
+            runs.append([y, y])
+    return runs
+
+
+def _years_filter(years, offset=0):
+    """Filter passing images whose calendar year + offset is in years."""
+    filters = [ee.Filter.calendarRange(first - offset, last - offset, 'year')
+               for first, last in _year_runs(years)]
+    return filters[0] if len(filters) == 1 else ee.Filter.Or(*filters)
+
+
+def get_historical_collection(s1, orbit_pass, doy, window, reference_date, years=None):
     """
     Build a historical Sentinel-1 collection centred on a day-of-year.
 
     For each year in the lookback period, images within ±window days of the
-    target day-of-year are collected and merged into a single collection.
+    target day-of-year are selected. The selection is a single server-side
+    filter (orbit pass, day-of-year range, years), so the expression graph
+    does not grow with the number of years and there is no per-year image
+    cap.
+
+    Windows that cross 1 January belong to the year of the target
+    day-of-year: for a target early in January, late-December images of the
+    previous calendar year are included, and excluded together with their
+    target year. In leap years the wrapped part of the window may be shifted
+    by one day.
 
     Parameters
     ----------
@@ -245,10 +428,11 @@ def get_historical_collection(s1, orbit_pass, doy, window, yearsBack, reference_
         Day-of-year of the reference date.
     window : int
         Number of days either side of the target DOY to include.
-    yearsBack : int
-        Number of years to look back from reference_date.
     reference_date : datetime.datetime
-        Reference date defining the target DOY and the lookback end.
+        Reference date; its year is left out of the default years.
+    years : list of int, optional
+        Explicit years to collect (e.g. only the years missing from a cached
+        baseline). Defaults to the whole archive except the reference year.
 
     Returns
     -------
@@ -257,17 +441,28 @@ def get_historical_collection(s1, orbit_pass, doy, window, yearsBack, reference_
     # Use the full Sentinel-1 archive (from 2016) up to today,
     # excluding only the year of the target date itself.
     today = datetime.datetime.utcnow()
-    yearList = [y for y in range(2016, today.year + 1) if y != reference_date.year]
-    seasonal_list = []
-    for y in yearList:
-        target = datetime.datetime(y, 1, 1) + datetime.timedelta(days=doy - 1)
-        start = target - datetime.timedelta(days=window)
-        end = target + datetime.timedelta(days=window)
-        imgs = s1.filterDate(start, end) \
-            .filter(ee.Filter.eq('orbitProperties_pass', orbit_pass)) \
-            .toList(100)
-        seasonal_list.append(imgs)
-    return ee.ImageCollection(ee.List(seasonal_list).flatten())
+    yearList = years if years is not None else \
+        [y for y in range(2016, today.year + 1) if y != reference_date.year]
+    if not yearList:
+        return ee.ImageCollection([])
+
+    # [doy - window, doy + window) as inclusive day-of-year bounds
+    first, last = doy - window, doy + window - 1
+    parts = [ee.Filter.And(
+        ee.Filter.calendarRange(max(first, 1), last if last < 365 else 366, 'day_of_year'),
+        _years_filter(yearList))]
+    if first < 1:      # window starts in December of the previous year
+        parts.append(ee.Filter.And(
+            ee.Filter.calendarRange(365 + first, 366, 'day_of_year'),
+            _years_filter(yearList, offset=1)))
+    if last > 365:     # window ends in January of the following year
+        parts.append(ee.Filter.And(
+            ee.Filter.calendarRange(1, last - 365, 'day_of_year'),
+            _years_filter(yearList, offset=-1)))
+    season = parts[0] if len(parts) == 1 else ee.Filter.Or(*parts)
+    return s1 \
+        .filter(ee.Filter.eq('orbitProperties_pass', orbit_pass)) \
+        .filter(season)
 
 
 # ============================================================
@@ -298,7 +493,8 @@ def preprocess_s1_collection(
     slope_rad : ee.Image
         Terrain slope in radians (unused directly; kept for signature compatibility).
     dem : ee.Image
-        Digital elevation model.
+        Digital elevation model; its terrain stack (build_terrain_stack) is
+        computed once and shared by all scenes.
     aspect : ee.Image
         Terrain aspect (unused directly; kept for signature compatibility).
     glacier_geom : ee.Geometry
@@ -315,61 +511,18 @@ def preprocess_s1_collection(
     """
     thinning_correction = float(thinning_correction)
 
-    def process_image(image, dem):
-        # Radar geometry
-        theta_i = image.select('angle')
-        phi_i = ee.Terrain.aspect(theta_i) \
-            .reduceRegion(ee.Reducer.mean(), image.geometry(), 1000) \
-            .get('aspect')
-        phi_i = ee.Number(phi_i)
-
-        # Terrain geometry
-        alpha_s = ee.Terrain.slope(dem).select('slope')
-        phi_s = ee.Terrain.aspect(dem).select('aspect')
-
-        phi_r = ee.Image.constant(phi_i).subtract(phi_s)
-
-        # Convert angles to radians
-        deg_to_rad = math.pi / 180
-        theta_i_rad = theta_i.multiply(deg_to_rad)
-        alpha_s_rad = alpha_s.multiply(deg_to_rad)
-        phi_r_rad = phi_r.multiply(deg_to_rad)
-        ninety_rad = ee.Image.constant(90 * deg_to_rad)
-
-        # Slope steepness in range and azimuth
-        alpha_r = (alpha_s_rad.tan().multiply(phi_r_rad.cos())).atan()
-        alpha_az = (alpha_s_rad.tan().multiply(phi_r_rad.sin())).atan()
-
-        # Local incidence angle
-        theta_lia = (alpha_az.cos().multiply((theta_i_rad.subtract(alpha_r)).cos())).acos()
-        theta_lia_deg = theta_lia.multiply(180 / math.pi)
-
-        # Gamma-naught volume correction
-        sigma0 = ee.Image.constant(10).pow(image.select('VV_raw').divide(10))
-        gamma0 = sigma0.divide(theta_i_rad.cos())
-        nominator = (ninety_rad.subtract(theta_i_rad).add(alpha_r)).tan()
-        denominator = (ninety_rad.subtract(theta_i_rad)).tan()
-        vol_model = nominator.divide(denominator).abs()
-        gamma0_volume_db = ee.Image.constant(10).multiply(gamma0.divide(vol_model).log10())
-
-        # Layover, shadow, and combined mask
-        alpha_r_deg = alpha_r.multiply(180 / math.pi)
-        layover = alpha_r_deg.gt(theta_i)
-        shadow = theta_lia_deg.gt(85)
-        combined_mask = (
-            layover.Not().And(shadow.Not())
-            .And(gamma0_volume_db.gt(-35))
-            .focalMedian(3)
-            .And(terrain_mask)
-        )
+    terrain = build_terrain_stack(dem)
 
+    def process_image(image):
+        gamma0_volume_db, mask = radar_geometry(image, terrain, vv_band='VV_raw')
+        combined_mask = mask.And(terrain_mask)
         return image \
             .addBands(gamma0_volume_db.updateMask(combined_mask).rename('VV_corrected')) \
             .addBands(combined_mask.rename('combined_mask'))
 
     def preprocess(image):
         image = image.select(['VV', 'angle']).rename(['VV_raw', 'angle'])
-        image = process_image(image, dem)
+        image = process_image(image)
         if thinning_correction != 0.0:
             pi = ee.Number(math.pi)
             theta_i = ee.Number(image.get('mean_angle')).multiply(pi.divide(180))
@@ -388,11 +541,12 @@ def preprocess_s1_collection(
         .filterDate(start_date, end_date) \
         .filter(ee.Filter.eq('instrumentMode', 'IW')) \
         .filter(ee.Filter.listContains('transmitterReceiverPolarisation', 'VV')) \
-        .filter(ee.Filter.eq('orbitProperties_pass', 'DESCENDING')) \
-        .map(annotate_with_mean_angle(aoi)) \
-        .map(preprocess)
+        .filter(ee.Filter.eq('orbitProperties_pass', 'DESCENDING'))
+    # The incidence angle is only needed for the thinning shift
+    if thinning_correction != 0.0:
+        s1 = annotate_collection_with_mean_angle(s1, aoi)
 
-    return s1
+    return s1.map(preprocess)
 
 
 # ============================================================
@@ -405,13 +559,17 @@ def compute_temporal_spatial_mean(img, collection, spatial_radius=1):
 
     Averages all images in the collection within ±1 day of the input image,
     then applies a focal mean over a square kernel of the given radius.
+    When called from apply_temporal_spatial_smoothing_by_orbit, collection
+    is already the joined neighbour list of img, so the date filter only
+    scans a handful of images.
 
     Parameters
     ----------
     img : ee.Image
         Reference image defining the target acquisition time.
     collection : ee.ImageCollection
-        Collection to draw temporal neighbours from (same orbit pass).
+        Collection to draw temporal neighbours from (same orbit pass),
+        typically the neighbours found by join_temporal_neighbors.
     spatial_radius : int, optional
         Radius in pixels for the spatial focal mean (default 1).
 
@@ -436,20 +594,57 @@ def compute_temporal_spatial_mean(img, collection, spatial_radius=1):
     return mean_spatial_temporal.rename('VV_smoothed')
 
 
+NEIGHBORS_PROPERTY = 'temporal_neighbors'
+
+
+def join_temporal_neighbors(collection, days=1, matches_key=NEIGHBORS_PROPERTY):
+    """
+    Attach to every image the list of images acquired within ±days of it.
+
+    A single ee.Join.saveAll with a maxDifference filter on system:time_start
+    finds all neighbour lists at once, instead of one filterDate scan of the
+    collection per image. Each image is its own neighbour.
+
+    Parameters
+    ----------
+    collection : ee.ImageCollection
+        Collection to join with itself (one orbit pass).
+    days : float, optional
+        Maximum time difference in days (default 1).
+    matches_key : str, optional
+        Image property holding the neighbour list.
+
+    Returns
+    -------
+    ee.ImageCollection
+    """
+    time_filter = ee.Filter.maxDifference(
+        difference=days * 24 * 60 * 60 * 1000,
+        leftField='system:time_start',
+        rightField='system:time_start',
+    )
+    join = ee.Join.saveAll(matchesKey=matches_key, ordering='system:time_start')
+    return ee.ImageCollection(join.apply(collection, collection, time_filter))
+
+
 def apply_temporal_spatial_smoothing_by_orbit(collection, smoothing_fn, smoothed_band_name='VV_smoothed'):
     """
     Apply temporal-spatial smoothing separately per orbit direction.
 
-    Splits the collection into ascending and descending passes, applies the
-    smoothing function within each subset (so orbits do not mix), then merges
-    the results back into a single collection.
+    Splits the collection into ascending and descending passes, joins each
+    subset with itself to find the temporal neighbours of every image (so
+    orbits do not mix), applies the smoothing function to each image and its
+    neighbours, then merges the results back into a single collection. The
+    cost grows with the number of images times the neighbours per image, not
+    with the square of the collection size.
 
     Parameters
     ----------
     collection : ee.ImageCollection
         Preprocessed Sentinel-1 collection.
     smoothing_fn : Callable
-        Function with signature (img, subcollection) → ee.Image.
+        Function with signature (img, neighbours) → ee.Image, where
+        neighbours holds the images within ±1 day of img.
     smoothed_band_name : str, optional
         Name assigned to the smoothed output band (default 'VV_smoothed').
 
@@ -458,17 +653,18 @@ def apply_temporal_spatial_smoothing_by_orbit(collection, smoothing_fn, smoothed
     ee.ImageCollection
         Collection with the smoothed band added to each image.
     """
-    ascending = collection.filter(ee.Filter.eq('orbitProperties_pass', 'ASCENDING'))
-    descending = collection.filter(ee.Filter.eq('orbitProperties_pass', 'DESCENDING'))
+    def smooth(img):
+        img = ee.Image(img)
+        neighbours = ee.ImageCollection.fromImages(img.get(NEIGHBORS_PROPERTY))
+        return img.addBands(smoothing_fn(img, neighbours).rename(smoothed_band_name)) \
+            .set(NEIGHBORS_PROPERTY, None)
 
-    ascending_smoothed = ascending.map(
-        lambda img: img.addBands(smoothing_fn(img, ascending).rename(smoothed_band_name))
-    )
-    descending_smoothed = descending.map(
-        lambda img: img.addBands(smoothing_fn(img, descending).rename(smoothed_band_name))
-    )
+    smoothed = []
+    for orbit_pass in ('ASCENDING', 'DESCENDING'):
+        subset = collection.filter(ee.Filter.eq('orbitProperties_pass', orbit_pass))
+        smoothed.append(join_temporal_neighbors(subset).map(smooth))
 
-    return ascending_smoothed.merge(descending_smoothed)
+    return smoothed[0].merge(smoothed[1])
 
 
 # ============================================================
@@ -520,3 +716,45 @@ def simple_threshold(image, threshold=-14):
     """
     water = image.select('VV_dB').lt(threshold).rename('water_mask')
     return image.addBands(water)
+
+
+# ============================================================
+# 7. BATCHED getInfo
+# ============================================================
+
+class InfoBatch:
+    """
+    Collect lazy Earth Engine values and fetch them in one round trip.
+
+    Every getInfo() is a blocking request of one to several seconds; the
+    preflight checks of the pipelines (collection sizes, geometries, scene
+    dates) are independent of each other and can be resolved together:
+
+        info = InfoBatch()
+        info.add("n_asc", recent_asc.size())
+        info.add("n_desc", recent_desc.size())
+        values = info.resolve()          # one ee.Dictionary(...).getInfo()
+        values["n_asc"], values["n_desc"]
+
+    Values that depend on each other can still be batched when the
+    dependency is expressed server-side (e.g. with ee.Algorithms.If).
+    """
+
+    def __init__(self):
+        self._values = {}
+
+    def add(self, key, value):
+        """Register a lazy value (ee object or plain constant) under key."""
+        self._values[key] = value
+        return key
+
+    def __len__(self):
+        return len(self._values)
+
+    def resolve(self):
+        """Fetch all registered values with a single getInfo and clear the batch."""
+        if not self._values:
+            return {}
+        values = ee.Dictionary(self._values).getInfo()
+        self._values = {}
+        return values
@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+"""
+THAW - Earth Engine expression-graph profiler
+
+Serializes the images a pipeline exports (ee.serializer, Cloud API format)
+and reports how large the expression graph is, without running any
+computation:
+
+    unique nodes    — distinct function invocations after the serializer's
+                      deduplication of identical subgraphs
+    expanded nodes  — invocations if every shared subgraph were inlined; a
+                      rough measure of the work the graph describes
+    by function     — unique invocation count per EE algorithm
+    repeated        — subgraphs referenced from several places (the same
+                      focal_mean / terrain computation built more than once)
+    mapped bodies   — size of every function mapped over a collection; this
+                      work is repeated per image
+
+The graphs are built exactly as in the pipelines (build_lake_images,
+preprocess_s1_collection + build_scored_collection) but with probe=False,
+so nothing is requested from Earth Engine apart from authentication. With
+--offline no credentials are needed either: earthengine-api is initialised
+from the algorithm signatures it ships with (see initialize_offline).
+
+A node budget per pipeline is kept in graph_budget.json next to this file;
+--check exits with status 1 when a graph grows beyond it, --update-budget
+records the current sizes plus BUDGET_HEADROOM.
+
+Usage:
+    python graph_profile.py <config.json> [--check | --update-budget] [--json] [--offline]
+
+The config is a lakedetection (aoi_geojson) or tracking (aoi_bbox) pipeline
+config as written by the dashboard. The committed budget is recorded from the
+configs in tests/data, which tests/test_graph_profile.py checks:
+
+    python graph_profile.py tests/data/graph_lakedetection.json --offline --update-budget
+    python graph_profile.py tests/data/graph_tracking.json --offline --update-budget
+"""
+
+import os
+import sys
+import json
+import math
+import datetime
+from collections import Counter
+
+import ee
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIR not in sys.path:
+    sys.path.insert(0, SCRIPT_DIR)
+
+BUDGET_FILE = os.path.join(SCRIPT_DIR, "graph_budget.json")
+BUDGET_HEADROOM = 1.10     # budget = current size * headroom
+BUDGET_METRICS = ("unique_nodes", "expanded_nodes")
+MIN_REPEAT_SIZE = 5        # smallest subgraph (expanded nodes) reported as repeated
+
+
+# ============================================================
+# SETUP
+# ============================================================
+
+def _offline_request(*args, **kwargs):
+    raise RuntimeError("Earth Engine is initialised offline: graphs can be built "
+                       "and serialized, but nothing can be computed")
+
+
+def initialize_offline():
+    """
+    Initialise earthengine-api without credentials or network access.
+
+    Algorithm signatures come from the copy bundled with earthengine-api
+    (ee/tests/algorithms.json); any request that would compute a value or
+    read an asset raises RuntimeError. Call ee.Reset() to undo.
+    """
+    from ee import apitestcase
+    ee.Reset()
+    ee.data._install_cloud_api_resource = lambda: None
+    ee.data.getAlgorithms = apitestcase.GetAlgorithms
+    ee.data.computeValue = _offline_request
+    ee.data.getAsset = _offline_request
+    ee.Initialize(None, "", project="offline")
+
+
+def load_config(path):
+    """Pipeline config; a relative aoi_geojson is resolved against the config folder."""
+    with open(path, "r") as f:
+        cfg = json.load(f)
+    if "aoi_geojson" in cfg and not os.path.isabs(cfg["aoi_geojson"]):
+        cfg["aoi_geojson"] = os.path.join(os.path.dirname(os.path.abspath(path)), cfg["aoi_geojson"])
+    return cfg
+
+
+# ============================================================
+# GRAPH ANALYSIS
+# ============================================================
+
+def _references(node):
+    """Value references made directly by one serialized node (with repeats)."""
+    refs = []
+    stack = [node]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            for key, value in item.items():
+                if key == "valueReference" and isinstance(value, str):
+                    refs.append(value)
+                elif key == "body" and isinstance(value, str):
+                    refs.append(value)
+                else:
+                    stack.append(value)
+        elif isinstance(item, list):
+            stack.extend(item)
+    return refs
+
+
+def _mapped_bodies(node):
+    """Bodies (value names) of the function definitions inside one serialized node."""
+    bodies = []
+    stack = [node]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            definition = item.get("functionDefinitionValue")
+            if isinstance(definition, dict) and isinstance(definition.get("body"), str):
+                bodies.append(definition["body"])
+            stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(item)
+    return bodies
+
+
+def _function_name(node):
+    invocation = node.get("functionInvocationValue") if isinstance(node, dict) else None
+    if invocation:
+        return invocation.get("functionName") or "<function call>"
+    if isinstance(node, dict) and "functionDefinitionValue" in node:
+        return "<mapped function>"
+    return None
+
+
+def profile_graph(obj, min_repeat_size=MIN_REPEAT_SIZE):
+    """
+    Node statistics of the expression graph of an Earth Engine object.
+
+    Parameters
+    ----------
+    obj : ee.ComputedObject
+        Image, collection, dictionary... to serialize.
+    min_repeat_size : int, optional
+        Smallest expanded size of a shared subgraph to list as repeated.
+
+    Returns
+    -------
+    dict
+        unique_nodes, expanded_nodes, serialized_bytes, by_function,
+        repeated (list of {function, references, size}) and mapped_bodies
+        (list of {size, functions}).
+    """
+    encoded = ee.serializer.encode(obj, for_cloud_api=True)
+    values = encoded["values"]
+    children = {name: _references(node) for name, node in values.items()}
+
+    ref_counts = Counter(ref for refs in children.values() for ref in refs)
+
+    # Expanded size of every value, children first (graph is acyclic)
+    order, seen = [], set()
+    for root in values:
+        if root in seen:
+            continue
+        stack = [(root, False)]
+        while stack:
+            name, expanded = stack.pop()
+            if expanded:
+                order.append(name)
+                continue
+            if name in seen:
+                continue
+            seen.add(name)
+            stack.append((name, True))
+            stack.extend((c, False) for c in children[name] if c not in seen)
+    size = {}
+    for name in order:
+        own = 1 if _function_name(values[name]) else 0
+        size[name] = own + sum(size[c] for c in children[name])
+
+    by_function = Counter(f for f in map(_function_name, values.values())
+                          if f and f != "<mapped function>")
+
+    repeated = sorted(
+        ({"function": _function_name(values[name]) or "<value>",
+          "references": n, "size": size[name]}
+         for name, n in ref_counts.items()
+         if n > 1 and size[name] >= min_repeat_size),
+        key=lambda r: (r["references"] - 1) * r["size"], reverse=True)
+
+    mapped = []
+    for body in {b for node in values.values() for b in _mapped_bodies(node)}:
+        if body not in size:
+            continue
+        body_functions = Counter()
+        stack, visited = [body], set()
+        while stack:
+            n = stack.pop()
+            if n in visited:
+                continue
+            visited.add(n)
+            f = _function_name(values[n])
+            if f and f != "<mapped function>":
+                body_functions[f] += 1
+            stack.extend(children[n])
+        mapped.append({"size": size[body], "functions": dict(body_functions.most_common(5))})
+    mapped.sort(key=lambda m: m["size"], reverse=True)
+
+    return {
+        "unique_nodes": sum(by_function.values()),
+        "expanded_nodes": size[encoded["result"]],
+        "serialized_bytes": len(json.dumps(encoded)),
+        "by_function": dict(by_function.most_common()),
+        "repeated": repeated,
+        "mapped_bodies": mapped,
+    }
+
+
+# ============================================================
+# PIPELINE GRAPHS
+# ============================================================
+
+def _ref_date(cfg):
+    if cfg.get("run_date", "today") == "today":
+        return datetime.datetime.now()
+    return datetime.datetime.strptime(cfg["run_date"], "%Y-%m-%d")
+
+
+def pipeline_graphs(cfg):
+    """
+    (pipeline name, {export name: ee object}) for a pipeline config.
+
+    Lake detection profiles each exported image; tracking profiles the
+    scored collection, whose images are exported one by one.
+    """
+    if "aoi_geojson" in cfg:
+        from lakedetection_headless import build_lake_images
+        with open(cfg["aoi_geojson"]) as f:
+            coords = json.load(f)["features"][0]["geometry"]["coordinates"]
+        images = build_lake_images(ee.Geometry.Polygon(coords), coords, _ref_date(cfg), probe=False)
+        return "lakedetection", images
+
+    from gee_core import preprocess_s1_collection
+    from thinning import load_aoi, load_dem
+    from tracking_headless import build_scored_collection
+    aoi = load_aoi(cfg["aoi_bbox"])
+    dem, slope_rad, aspect, terrain_mask = load_dem(aoi)
+    # Glacier outlines and the thinning correction need server requests;
+    # the AOI and a non-zero correction give the largest graph.
+    s1 = preprocess_s1_collection(aoi, cfg["start_date"], cfg["end_date"],
+                                  slope_rad, dem, aspect, aoi, terrain_mask,
+                                  thinning_correction=1.0)
+    return "tracking", {"scored_collection": build_scored_collection(s1)}
+
+
+def profile_pipeline(cfg):
+    """Profile of every export of a pipeline plus the combined graph ('all')."""
+    name, graphs = pipeline_graphs(cfg)
+    profiles = {key: profile_graph(obj) for key, obj in graphs.items()}
+    if len(graphs) > 1:
+        profiles["all"] = profile_graph(ee.Dictionary(graphs))
+    return name, profiles
+
+
+# ============================================================
+# BUDGET
+# ============================================================
+
+def load_budget(path=BUDGET_FILE):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def check_budget(pipeline, profiles, budget):
+    """
+    Budget violations of a pipeline profile.
+
+    Returns a list of messages; empty when every graph is within budget.
+    Graphs without a recorded budget are reported as violations too.
+    """
+    limits = budget.get(pipeline)
+    if not limits:
+        return [f"no budget recorded for '{pipeline}' (run with --update-budget)"]
+    problems = []
+    for graph, prof in profiles.items():
+        for metric in BUDGET_METRICS:
+            limit = limits.get(graph, {}).get(metric)
+            if limit is None:
+                problems.append(f"{pipeline}/{graph}: no {metric} budget")
+            elif prof[metric] > limit:
+                problems.append(f"{pipeline}/{graph}: {metric} {prof[metric]} > budget {limit}")
+    return problems
+
+
+def update_budget(pipeline, profiles, path=BUDGET_FILE):
+    """Record current sizes plus headroom as the budget of a pipeline."""
+    budget = load_budget(path)
+    budget[pipeline] = {
+        graph: {metric: math.ceil(prof[metric] * BUDGET_HEADROOM) for metric in BUDGET_METRICS}
+        for graph, prof in profiles.items()
+    }
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(budget, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+    return budget[pipeline]
+
+
+# ============================================================
+# REPORT
+# ============================================================
+
+def print_report(pipeline, profiles, top=15):
+    for graph, prof in profiles.items():
+        print(f"== {pipeline} / {graph}: {prof['unique_nodes']} unique nodes, "
+              f"{prof['expanded_nodes']} expanded, {prof['serialized_bytes'] / 1024:.1f} KB serialized")
+        print("   by function:")
+        for function, n in list(prof["by_function"].items())[:top]:
+            print(f"     {n:5d}  {function}")
+        if prof["repeated"]:
+            print("   repeated subgraphs (references x expanded size):")
+            for r in prof["repeated"][:top]:
+                print(f"     {r['references']:3d} x {r['size']:5d}  {r['function']}")
+        if prof["mapped_bodies"]:
+            print("   mapped functions (nodes per element):")
+            for m in prof["mapped_bodies"][:top]:
+                functions = ", ".join(f"{f} {n}" for f, n in m["functions"].items())
+                print(f"     {m['size']:5d}  {functions}")
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if not args:
+        print("Usage: python graph_profile.py <config.json> "
+              "[--check | --update-budget] [--json] [--offline]")
+        sys.exit(1)
+    cfg = load_config(args[0])
+
+    if "--offline" in sys.argv:
+        initialize_offline()
+    else:
+        from gee_auth import initialize_ee
+        initialize_ee(cfg["drive_token_path"], cfg.get("project_id"))
+
+    pipeline, profiles = profile_pipeline(cfg)
+    if "--json" in sys.argv:
+        print(json.dumps({pipeline: profiles}, indent=2))
+    else:
+        print_report(pipeline, profiles)
+
+    if "--update-budget" in sys.argv:
+        print(f"Budget updated: {update_budget(pipeline, profiles)}")
+    elif "--check" in sys.argv:
+        problems = check_budget(pipeline, profiles, load_budget())
+        for p in problems:
+            print(f"BUDGET EXCEEDED: {p}")
+        if problems:
+            sys.exit(1)
+        print("Graph sizes within budget.")
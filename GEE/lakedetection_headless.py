@@ -17,6 +17,7 @@ import datetime
 import time
 import json
 import glob
+import shutil
 
 # Path resolution for local imports
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -24,9 +25,16 @@ if SCRIPT_DIR not in sys.path:
     sys.path.insert(0, SCRIPT_DIR)
 # Local imports
 from gee_auth import initialize_ee
-from drive_io import Logger, export_and_download, convert_to_cog, CancelledError
-from gee_core import apply_radar_mask_to_collection, get_historical_collection
+from drive_io import (Logger, export_and_download, convert_to_cog, CancelledError,
+                      emit, stage, skip_stage)
+from gee_core import apply_radar_mask_to_collection, InfoBatch
+from baseline import get_baseline, doy_bin_center, aoi_tag
+from scene_index import (refresh as refresh_scene_index, scene_ids as indexed_scene_ids,
+                         covered_range as indexed_range)
 from reporting import cluster_processing
+from tiles import build_output_tiles
+from catalog import register_folder, FINGERPRINT_FILE
+from cube import append_output_folder
 
 
 # ============================================================
@@ -54,6 +62,7 @@ def retry(fn, label, max_attempts=5, base_wait=30):
                 raise
             wait = base_wait * (2 ** (attempt - 1))
             print(f"{label} failed (attempt {attempt}/{max_attempts}): {e}", flush=True)
+            emit("retry", label=label, attempt=attempt, max_attempts=max_attempts, wait_s=wait, error=str(e))
             print(f"Retrying in {wait}s...", flush=True)
             time.sleep(wait)
 
@@ -83,95 +92,186 @@ def clear_checkpoint(local_dir):
         os.remove(path)
 
 
-
-
 # ============================================================
-# MAIN PROCESSING PIPELINE
+# RUN FINGERPRINT
 # ============================================================
-def run_pipeline(config_path):
-    with open(config_path, "r") as f:
-        cfg = json.load(f)
 
-    initialize_ee(cfg["drive_token_path"], cfg.get("project_id"))
+MOSAIC_WINDOWS = {"recent": (13, 0), "earlier": (25, 13)}  # days before the reference date
+MOSAIC_SPAN_DAYS = max(start for start, _ in MOSAIC_WINDOWS.values())
+ORBIT_LABELS = {"ASCENDING": "ASC", "DESCENDING": "DESC"}
 
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M")
-    
-    if cfg["run_date"] == "today":
-        ref_date = datetime.datetime.now()
-    else:
-        ref_date = datetime.datetime.strptime(cfg["run_date"], "%Y-%m-%d")
-    doy = ref_date.timetuple().tm_yday
-    
-    date_str = ref_date.strftime("%Y-%m-%d")
-    task_name = cfg.get("task_name", "")
-    name_suffix = f"_{task_name}" if task_name else ""
-    local_dir = os.path.join(cfg["output_root"], f'Outputs_{date_str}{name_suffix}')
-    os.makedirs(local_dir, exist_ok=True)
+def scene_fingerprint(output_root, aoi_coords, ref_date, source=None):
+    """
+    Identify the inputs of a run: the IDs of the scenes in the recent
+    (0–13 days) and earlier (13–25 days) mosaic windows per orbit pass, and
+    the day-of-year bin of the historical baseline.
+
+    Scene IDs come from the local scene index, which is first extended to
+    cover both windows: one request for the scenes acquired since its last
+    refresh, and one for the windows' start if it lies before the covered
+    range (source: scene source passed to scene_index.refresh, default Earth
+    Engine).
+    """
+    aoi_key = aoi_tag(aoi_coords)
+    refresh_scene_index(output_root, aoi_key, aoi_coords, source=source,
+                        start=ref_date - datetime.timedelta(days=MOSAIC_SPAN_DAYS), until=ref_date)
+    fingerprint = {}
+    for orbit_pass, label in ORBIT_LABELS.items():
+        for name, (days_start, days_end) in MOSAIC_WINDOWS.items():
+            fingerprint[f"{label.lower()}_{name}"] = indexed_scene_ids(
+                output_root, aoi_key,
+                ref_date - datetime.timedelta(days=days_start),
+                ref_date - datetime.timedelta(days=days_end),
+                orbit_pass)
+    fingerprint["doy_bin"] = doy_bin_center(ref_date.timetuple().tm_yday)
+    return fingerprint
+
+def window_sizes_from_fingerprint(output_root, aoi_coords, ref_date, fingerprint):
+    """
+    Scene counts of the mosaic windows, keyed as in build_lake_images.
 
-    # Compute AOI center for filename uniqueness (no EE call needed — just parse GeoJSON)
-    with open(cfg["aoi_geojson"]) as _f:
-        _aoi_for_coords = json.load(_f)
-    _ring = _aoi_for_coords["features"][0]["geometry"]["coordinates"][0]
-    _lons = [p[0] for p in _ring]
-    _lats = [p[1] for p in _ring]
-    _center_lat = (min(_lats) + max(_lats)) / 2
-    _center_lon = (min(_lons) + max(_lons)) / 2
-    coord_tag = f"{int(round(_center_lat * 1000))}_{int(round(_center_lon * 1000))}"
+    Returns None unless the scene index covers both windows, so that
+    build_lake_images probes the sizes on Earth Engine instead of taking
+    a missing range for an empty window.
+    """
+    covered = indexed_range(output_root, aoi_tag(aoi_coords))
+    if covered is None or not (covered[0] <= ref_date - datetime.timedelta(days=MOSAIC_SPAN_DAYS)
+                               and ref_date <= covered[1]):
+        return None
+    return {f"{label} {name}": len(fingerprint[f"{label.lower()}_{name}"])
+            for label in ORBIT_LABELS.values() for name in MOSAIC_WINDOWS}
 
-    # logging of console outputs
-    log_file = os.path.join(local_dir, f"pipeline_log_{timestamp}.txt")
-    sys.stdout = Logger(log_file)
-    sys.stderr = sys.stdout
+def write_fingerprint(local_dir, **kwargs):
+    """Write or update run_fingerprint.json in local_dir (atomic)."""
+    path = os.path.join(local_dir, FINGERPRINT_FILE)
+    existing = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            existing = json.load(f)
+    existing.update(kwargs)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(existing, f, indent=2)
+    os.replace(tmp, path)
 
-    # Write PID so dashboard can detect if this process dies
-    pid_file = os.path.join(local_dir, "pipeline.pid")
-    with open(pid_file, "w") as _pf:
-        _pf.write(str(os.getpid()))
+def find_previous_run(output_root, task_name, coord_tag):
+    """
+    Latest completed run of the same task and AOI with a fingerprint.
 
-    # Read checkpoint early — used for both resume detection and run_label restore
-    ckpt = read_checkpoint(local_dir)
+    Returns (run folder, fingerprint record) or (None, None).
+    """
+    latest, latest_dir = None, None
+    for path in glob.glob(os.path.join(output_root, "Outputs_*", FINGERPRINT_FILE)):
+        try:
+            with open(path) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if (not record.get("complete") or record.get("task_name") != task_name
+                or record.get("coord_tag") != coord_tag):
+            continue
+        if latest is None or record.get("created", "") > latest.get("created", ""):
+            latest, latest_dir = record, os.path.dirname(path)
+    return latest_dir, latest
+
+def reusable_run(output_root, task_name, coord_tag, fingerprint):
+    """
+    Previous run whose outputs can stand in for a new run with this fingerprint.
 
-    # Determine run_label: restore from checkpoint only when the saved label uses the
-    # current coord_tag (guards against stale checkpoints from old naming conventions).
-    # Only count files ≥ 100 KB as valid — partial downloads don't increment run_id.
-    if ckpt and "run_label" in ckpt and coord_tag in ckpt["run_label"]:
-        run_label = ckpt["run_label"]
-    else:
-        existing = [f for f in glob.glob(os.path.join(local_dir, f"z_score_{date_str}_{coord_tag}_*.tif"))
-                    if not f.endswith("_cog.tif") and os.path.getsize(f) > 100_000]
-        run_id    = len(existing) + 1
-        run_label = f"{date_str}_{coord_tag}_{run_id:03d}"
+    Returns (run folder, fingerprint record) when the latest completed run of
+    the task and AOI had the same input scenes and its z-score raster is
+    still on disk, else (None, None).
+    """
+    prev_dir, prev = find_previous_run(output_root, task_name, coord_tag)
+    if (prev and prev.get("fingerprint") == fingerprint
+            and os.path.exists(os.path.join(prev_dir, f"z_score_{prev['run_label']}.tif"))):
+        return prev_dir, prev
+    return None, None
 
-    # ── Resume detection ────────────────────────────────────────────────────
-    if ckpt and "download" in ckpt.get("steps_complete", []):
-        print(f"Resuming incomplete pipeline from checkpoint in {local_dir}", flush=True)
-        done = ckpt.get("steps_complete", [])
-        local_path = local_dir
+def reuse_previous_outputs(prev_dir, prev_label, local_dir, run_label):
+    """
+    Link the files of a previous run into local_dir under the new run label.
 
-        if "cog" not in done:
-            print("Step 2/3: Converting to COG...", flush=True)
-            retry(lambda: convert_to_cog(local_path), label="COG conversion", max_attempts=3, base_wait=10)
-            done.append("cog")
-            write_checkpoint(local_dir, steps_complete=done)
+    Hard links cost no disk space; falls back to copying across file
+    systems. Returns the number of files linked or copied.
+    """
+    n = 0
+    for src in glob.glob(os.path.join(prev_dir, f"*{prev_label}*")):
+        if not os.path.isfile(src):
+            continue
+        dst = os.path.join(local_dir, os.path.basename(src).replace(prev_label, run_label))
+        if os.path.exists(dst):
+            continue
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+        n += 1
+    return n
 
-        if "cluster" not in done:
-            print("Step 3/3: Running cluster analysis...", flush=True)
-            z_score_files = glob.glob(os.path.join(local_path, "z_score_*.tif"))
-            z_score_files = [f for f in z_score_files if not f.endswith("_cog.tif")]
-            if z_score_files:
-                retry(lambda: cluster_processing(z_score_files[0], run_label), label="Clustering", max_attempts=3, base_wait=10)
-            done.append("cluster")
-            write_checkpoint(local_dir, steps_complete=done)
+def render_map_tiles(local_path):
+    """
+    Pre-render Web-Mercator tile pyramids of the output COGs for the dashboard.
+    Unchanged layers are skipped. A failure only means the dashboard renders
+    tiles on demand, so it is reported but never fails the pipeline.
+    """
+    try:
+        status = build_output_tiles(local_path)
+    except Exception as e:
+        print(f"Warning: map tiles not written: {e}", flush=True)
+        return
+    for layer, state in status.items():
+        print(f"  {layer}: {state}", flush=True)
+
+def update_pixel_cube(output_root, local_path, date_str, task_name, coord_tag, run_label):
+    """
+    Append this run's z_score / potential_water grids to the AOI's pixel
+    time-series cube (GEE/cube.py). Like the map tiles, this only serves the
+    dashboard, so a failure is reported but never fails the pipeline.
+    """
+    try:
+        cube_dir = append_output_folder(output_root, local_path, date_str, task_name, coord_tag, run_label)
+    except Exception as e:
+        print(f"Warning: pixel cube not updated: {e}", flush=True)
+        return
+    if cube_dir:
+        print(f"Pixel cube updated: {cube_dir}", flush=True)
 
-        clear_checkpoint(local_dir)
-        return "Processing complete (resumed)."
-    # ────────────────────────────────────────────────────────────────────────
 
-    # Setup AOI and Terrain
-    with open(cfg["aoi_geojson"]) as f:
-        aoi_data = json.load(f)
-    aoi = ee.Geometry.Polygon(aoi_data["features"][0]["geometry"]["coordinates"])
 
+
+# ============================================================
+# EXPRESSION GRAPH
+# ============================================================
+def build_lake_images(aoi, aoi_coords, ref_date, project_id=None, output_root=None, probe=True,
+                      window_sizes=None):
+    """
+    Build the Earth Engine images exported by the lake detection pipeline.
+
+    Parameters
+    ----------
+    aoi : ee.Geometry
+        Area of interest.
+    aoi_coords : list
+        AOI polygon coordinates (GeoJSON), used for the baseline cache key.
+    ref_date : datetime.datetime
+        Reference date of the run.
+    project_id, output_root : str, optional
+        Enable the historical baseline asset cache (see baseline.get_baseline).
+    probe : bool, optional
+        If False, no requests are sent to Earth Engine while building: the
+        recent-window fallback for sparse coverage is skipped. Used by
+        graph_profile.py.
+    window_sizes : dict, optional
+        Scene counts of the mosaic windows ("ASC recent", "DESC earlier",
+        ...), e.g. from the local scene index; queried from Earth Engine
+        (one request) when not given.
+
+    Returns
+    -------
+    dict[str, ee.Image]
+        {"potential_water": ..., "z_score": ...}
+    """
     srtm = ee.Image("USGS/SRTMGL1_003")
     elev = srtm.select('elevation')
     slope = ee.Terrain.slope(elev.focal_median(4))
@@ -209,32 +309,44 @@ def run_pipeline(config_path):
     earlier_desc = s1_desc.filterDate(ref_date-datetime.timedelta(days=25), ref_date-datetime.timedelta(days=13))
 
     # Mosaic per orbit direction — fall back to most recent available image
-    # if the fixed date window returns nothing (sparse coverage AOIs)
-    def safe_mosaic(recent_col, full_col, label):
-        n = recent_col.size().getInfo()
-        if n == 0:
+    # if the fixed date window returns nothing (sparse coverage AOIs).
+    # The four window sizes are fetched in a single request.
+    windows = {
+        "ASC recent": recent_asc,
+        "DESC recent": recent_desc,
+        "ASC earlier": earlier_asc,
+        "DESC earlier": earlier_desc,
+    }
+    if window_sizes is not None:
+        sizes = window_sizes
+    elif probe:
+        info = InfoBatch()
+        for label, col in windows.items():
+            info.add(label, col.size())
+        sizes = info.resolve()
+    else:
+        sizes = {}
+
+    def safe_mosaic(label, full_col):
+        if sizes.get(label, 1) == 0:
             print(f"Warning: no {label} images in recent window, using most recent available.", flush=True)
             return full_col.sort('system:time_start', False).limit(1).mosaic()
-        return recent_col.mosaic()
-
-    latest_asc  = safe_mosaic(recent_asc,  s1_asc,  "ASC recent")
-    latest_desc = safe_mosaic(recent_desc, s1_desc, "DESC recent")
-    prev_asc    = safe_mosaic(earlier_asc,  s1_asc.sort('system:time_start', False).limit(4).sort('system:time_start', True).limit(1),  "ASC earlier")
-    prev_desc   = safe_mosaic(earlier_desc, s1_desc.sort('system:time_start', False).limit(4).sort('system:time_start', True).limit(1), "DESC earlier")
-
-    # Get images from the years before within a timewindow around the doy
-    hist_asc = get_historical_collection(s1, 'ASCENDING', doy, windowSize, 10, ref_date)
-    hist_desc = get_historical_collection(s1, 'DESCENDING', doy, windowSize, 10, ref_date)
-
-    # get mean and stdv from historical ASC and DESC images
-    hist_asc_stats = hist_asc.reduce(
-        ee.Reducer.mean().combine(
-        reducer2 = ee.Reducer.stdDev(), \
-        sharedInputs = True))
-    hist_desc_stats = hist_desc.reduce(
-        ee.Reducer.mean().combine(
-            reducer2 = ee.Reducer.stdDev(), \
-        sharedInputs = True))
+        return windows[label].mosaic()
+
+    latest_asc  = safe_mosaic("ASC recent",  s1_asc)
+    latest_desc = safe_mosaic("DESC recent", s1_desc)
+    prev_asc    = safe_mosaic("ASC earlier",  s1_asc.sort('system:time_start', False).limit(4).sort('system:time_start', True).limit(1))
+    prev_desc   = safe_mosaic("DESC earlier", s1_desc.sort('system:time_start', False).limit(4).sort('system:time_start', True).limit(1))
+
+    # Mean and stdv of historical ASC and DESC images within a timewindow around
+    # the doy — cached as EE assets after the first run for this AOI and doy bin
+    hist_asc_stats, asc_source = get_baseline(
+        s1, aoi, aoi_coords, 'ASCENDING', doy, windowSize, ref_date,
+        project_id, output_root)
+    hist_desc_stats, desc_source = get_baseline(
+        s1, aoi, aoi_coords, 'DESCENDING', doy, windowSize, ref_date,
+        project_id, output_root)
+    print(f"Historical baseline: ASC {asc_source}, DESC {desc_source}", flush=True)
 
     #hist_mean = hist_asc_stats.select('VV_mean').add(hist_desc_stats.select('VV_mean')).divide(2)
 
@@ -271,16 +383,172 @@ def run_pipeline(config_path):
         .rename('asc_zscore')
     zscore_mean = zscore_asc.add(zscore_desc).divide(2).focal_mean(3).updateMask(focal_mean)
 
+    return {
+        "potential_water": potential_water,
+        "z_score": zscore_mean,
+    }
+
+
+# ============================================================
+# MAIN PROCESSING PIPELINE
+# ============================================================
+def run_pipeline(config_path):
+    with open(config_path, "r") as f:
+        cfg = json.load(f)
+
+    initialize_ee(cfg["drive_token_path"], cfg.get("project_id"))
+
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M")
     
+    if cfg["run_date"] == "today":
+        ref_date = datetime.datetime.now()
+    else:
+        ref_date = datetime.datetime.strptime(cfg["run_date"], "%Y-%m-%d")
+    
+    date_str = ref_date.strftime("%Y-%m-%d")
+    task_name = cfg.get("task_name", "")
+    name_suffix = f"_{task_name}" if task_name else ""
+    local_dir = os.path.join(cfg["output_root"], f'Outputs_{date_str}{name_suffix}')
+    os.makedirs(local_dir, exist_ok=True)
+
+    # Compute AOI center for filename uniqueness (no EE call needed — just parse GeoJSON)
+    with open(cfg["aoi_geojson"]) as _f:
+        _aoi_for_coords = json.load(_f)
+    _ring = _aoi_for_coords["features"][0]["geometry"]["coordinates"][0]
+    _lons = [p[0] for p in _ring]
+    _lats = [p[1] for p in _ring]
+    _center_lat = (min(_lats) + max(_lats)) / 2
+    _center_lon = (min(_lons) + max(_lons)) / 2
+    coord_tag = f"{int(round(_center_lat * 1000))}_{int(round(_center_lon * 1000))}"
+
+    # logging of console outputs
+    log_file = os.path.join(local_dir, f"pipeline_log_{timestamp}.txt")
+    sys.stdout = Logger(log_file)
+    sys.stderr = sys.stdout
+
+    # Write PID so dashboard can detect if this process dies
+    pid_file = os.path.join(local_dir, "pipeline.pid")
+    with open(pid_file, "w") as _pf:
+        _pf.write(str(os.getpid()))
+    emit("pipeline_start", pipeline="lakedetection", stages=4, task_name=task_name, ref_date=date_str)
+    register_folder(cfg["output_root"], local_dir,
+                    aoi_bbox=[min(_lons), min(_lats), max(_lons), max(_lats)])
+
+    # Read checkpoint early — used for both resume detection and run_label restore
+    ckpt = read_checkpoint(local_dir)
+
+    # Determine run_label: restore from checkpoint only when the saved label uses the
+    # current coord_tag (guards against stale checkpoints from old naming conventions).
+    # Only count files ≥ 100 KB as valid — partial downloads don't increment run_id.
+    if ckpt and "run_label" in ckpt and coord_tag in ckpt["run_label"]:
+        run_label = ckpt["run_label"]
+    else:
+        existing = [f for f in glob.glob(os.path.join(local_dir, f"z_score_{date_str}_{coord_tag}_*.tif"))
+                    if not f.endswith("_cog.tif") and os.path.getsize(f) > 100_000]
+        run_id    = len(existing) + 1
+        run_label = f"{date_str}_{coord_tag}_{run_id:03d}"
+
+    # ── Resume detection ────────────────────────────────────────────────────
+    if ckpt and "download" in ckpt.get("steps_complete", []):
+        print(f"Resuming incomplete pipeline from checkpoint in {local_dir}", flush=True)
+        done = ckpt.get("steps_complete", [])
+        local_path = local_dir
+        skip_stage("download", 1, 4)
+
+        if "cog" not in done:
+            print("Step 2/4: Converting to COG...", flush=True)
+            with stage("cog", 2, 4):
+                retry(lambda: convert_to_cog(local_path), label="COG conversion", max_attempts=3, base_wait=10)
+            done.append("cog")
+            write_checkpoint(local_dir, steps_complete=done)
+        else:
+            skip_stage("cog", 2, 4)
+
+        if "cluster" not in done:
+            print("Step 3/4: Running cluster analysis...", flush=True)
+            with stage("cluster", 3, 4):
+                z_score_files = glob.glob(os.path.join(local_path, "z_score_*.tif"))
+                z_score_files = [f for f in z_score_files if not f.endswith("_cog.tif")]
+                if z_score_files:
+                    retry(lambda: cluster_processing(z_score_files[0], run_label), label="Clustering", max_attempts=3, base_wait=10)
+            done.append("cluster")
+            write_checkpoint(local_dir, steps_complete=done)
+        else:
+            skip_stage("cluster", 3, 4)
+
+        if "tiles" not in done:
+            print("Step 4/4: Pre-rendering map tiles and updating pixel cube...", flush=True)
+            with stage("tiles", 4, 4):
+                render_map_tiles(local_path)
+                update_pixel_cube(cfg["output_root"], local_path, date_str, task_name, coord_tag, run_label)
+            done.append("tiles")
+            write_checkpoint(local_dir, steps_complete=done)
+        else:
+            skip_stage("tiles", 4, 4)
+
+        register_folder(cfg["output_root"], local_dir)
+        if os.path.exists(os.path.join(local_dir, FINGERPRINT_FILE)):
+            write_fingerprint(local_dir, complete=True)
+        clear_checkpoint(local_dir)
+        return "Processing complete (resumed)."
+    # ────────────────────────────────────────────────────────────────────────
+
+    # Setup AOI and Terrain
+    with open(cfg["aoi_geojson"]) as f:
+        aoi_data = json.load(f)
+    aoi_coords = aoi_data["features"][0]["geometry"]["coordinates"]
+    aoi = ee.Geometry.Polygon(aoi_coords)
+
+    # Skip-if-unchanged: a scheduled "today" run whose input scenes are the
+    # same as those of the previous run of this AOI reuses its outputs.
+    # Historical and forced runs always rebuild, so no fingerprint is taken.
+    fingerprint = None
+    if cfg["run_date"] == "today" and not cfg.get("force_run"):
+        try:
+            fingerprint = scene_fingerprint(cfg["output_root"], aoi_coords, ref_date)
+        except Exception as e:
+            print(f"Warning: scene fingerprint not computed: {e}", flush=True)
+    if fingerprint is not None:
+        prev_dir, prev = reusable_run(cfg["output_root"], task_name, coord_tag, fingerprint)
+        if prev:
+            print(f"No new Sentinel-1 acquisitions since run {prev['run_label']} — reusing its outputs.", flush=True)
+            emit("run_reused", source=prev_dir, run_label=prev["run_label"])
+            skip_stage("download", 1, 4)
+            skip_stage("cog", 2, 4)
+            skip_stage("cluster", 3, 4)
+            if os.path.abspath(prev_dir) != os.path.abspath(local_dir):
+                n_linked = reuse_previous_outputs(prev_dir, prev["run_label"], local_dir, run_label)
+                print(f"Linked {n_linked} file(s) from {prev_dir}", flush=True)
+                print("Step 4/4: Pre-rendering map tiles...", flush=True)
+                with stage("tiles", 4, 4):
+                    render_map_tiles(local_dir)
+                write_fingerprint(local_dir, fingerprint=fingerprint, run_label=run_label,
+                                  task_name=task_name, coord_tag=coord_tag, complete=True,
+                                  reused_from=os.path.basename(prev_dir),
+                                  created=datetime.datetime.now().isoformat(timespec="seconds"))
+            else:
+                skip_stage("tiles", 4, 4)
+            register_folder(cfg["output_root"], local_dir)
+            try:
+                if os.path.exists(pid_file): os.remove(pid_file)
+            except Exception:
+                pass
+            return "No new Sentinel-1 acquisitions — previous outputs reused."
+        write_fingerprint(local_dir, fingerprint=fingerprint, run_label=run_label,
+                          task_name=task_name, coord_tag=coord_tag, complete=False,
+                          created=datetime.datetime.now().isoformat(timespec="seconds"))
+
+    exports = build_lake_images(
+        aoi, aoi_coords, ref_date, cfg.get("project_id"), cfg["output_root"],
+        window_sizes=window_sizes_from_fingerprint(cfg["output_root"], aoi_coords, ref_date, fingerprint)
+        if fingerprint else None)
+
+
 # ============================================================
 # EXPORT AND DOWNLOAD
 # ============================================================
     token_path   = cfg["drive_token_path"]
-    export_names = ["potential_water", "z_score"]
-    exports = {
-        "potential_water": potential_water,
-        "z_score": zscore_mean,
-    }
+    export_names = list(exports)
 
     # Write initial checkpoint so dashboard can detect this run
     write_checkpoint(local_dir,
@@ -295,18 +563,21 @@ def run_pipeline(config_path):
     done = []
 
     if "download" not in done:
-        print("Step 1/3: Launching tasks on Google Earth Engine...", flush=True)
-        local_path = retry(
-            lambda: export_and_download(
-                exports, ref_date, aoi, token_path,
-                cfg["output_root"], run_label, task_name,
-            ),
-            label="Download",
-        )
+        print("Step 1/4: Launching tasks on Google Earth Engine...", flush=True)
+        with stage("download", 1, 4):
+            local_path = retry(
+                lambda: export_and_download(
+                    exports, ref_date, aoi, token_path,
+                    cfg["output_root"], run_label, task_name,
+                ),
+                label="Download",
+            )
         write_checkpoint(local_dir, steps_complete=["download"])
         done.append("download")
+        register_folder(cfg["output_root"], local_path)
     else:
-        print("Step 1/3: Download already complete, skipping.", flush=True)
+        print("Step 1/4: Download already complete, skipping.", flush=True)
+        skip_stage("download", 1, 4)
         local_path = local_dir
 
 
@@ -314,39 +585,62 @@ def run_pipeline(config_path):
 # COG CONVERSION
 # ============================================================
     if "cog" not in done:
-        print("Step 2/3: Converting to COG...", flush=True)
-        retry(
-            lambda: convert_to_cog(local_path),
-            label="COG conversion",
-            max_attempts=3,
-            base_wait=10,
-        )
+        print("Step 2/4: Converting to COG...", flush=True)
+        with stage("cog", 2, 4):
+            retry(
+                lambda: convert_to_cog(local_path),
+                label="COG conversion",
+                max_attempts=3,
+                base_wait=10,
+            )
         done.append("cog")
         write_checkpoint(local_dir, steps_complete=done)
+        register_folder(cfg["output_root"], local_path)
     else:
-        print("Step 2/3: COG conversion already complete, skipping.", flush=True)
+        print("Step 2/4: COG conversion already complete, skipping.", flush=True)
+        skip_stage("cog", 2, 4)
 
 
 # ============================================================
 # CLUSTERING
 # ============================================================
     if "cluster" not in done:
-        print("Step 3/3: Running cluster analysis...", flush=True)
-        z_score_files = glob.glob(os.path.join(local_path, "z_score_*.tif"))
-        z_score_files = [f for f in z_score_files if not f.endswith("_cog.tif")]
-        if z_score_files:
-            z_score_tif = z_score_files[0]
-            retry(
-                lambda: cluster_processing(z_score_tif, run_label),
-                label="Clustering",
-                max_attempts=3,
-                base_wait=10,
-            )
+        print("Step 3/4: Running cluster analysis...", flush=True)
+        with stage("cluster", 3, 4):
+            z_score_files = glob.glob(os.path.join(local_path, "z_score_*.tif"))
+            z_score_files = [f for f in z_score_files if not f.endswith("_cog.tif")]
+            if z_score_files:
+                z_score_tif = z_score_files[0]
+                retry(
+                    lambda: cluster_processing(z_score_tif, run_label),
+                    label="Clustering",
+                    max_attempts=3,
+                    base_wait=10,
+                )
         done.append("cluster")
         write_checkpoint(local_dir, steps_complete=done)
+        register_folder(cfg["output_root"], local_path)
+    else:
+        print("Step 3/4: Clustering already complete, skipping.", flush=True)
+        skip_stage("cluster", 3, 4)
+
+
+# ============================================================
+# MAP TILES
+# ============================================================
+    if "tiles" not in done:
+        print("Step 4/4: Pre-rendering map tiles and updating pixel cube...", flush=True)
+        with stage("tiles", 4, 4):
+            render_map_tiles(local_path)
+            update_pixel_cube(cfg["output_root"], local_path, date_str, task_name, coord_tag, run_label)
+        done.append("tiles")
+        write_checkpoint(local_dir, steps_complete=done)
     else:
-        print("Step 3/3: Clustering already complete, skipping.", flush=True)
+        print("Step 4/4: Map tiles already complete, skipping.", flush=True)
+        skip_stage("tiles", 4, 4)
 
+    if fingerprint is not None:
+        write_fingerprint(local_dir, complete=True)
     clear_checkpoint(local_dir)
     try:
         if os.path.exists(pid_file): os.remove(pid_file)
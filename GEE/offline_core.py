@@ -0,0 +1,522 @@
+# -*- coding: utf-8 -*-
+"""
+THAW - Offline radar geometry engine
+
+NumPy/rasterio implementation of the radar masking of gee_core (section 2)
+and of the preprocessing of preprocess_s1_collection, for local GeoTIFFs:
+
+    terrain_stack      — slope and aspect of a DEM (ee.Terrain.slope/aspect)
+    radar_geometry     — gamma-naught volume-corrected VV, layover, shadow and
+                         local incidence angle, 3-pixel focal median mask
+    terrain_mask       — flat-terrain mask of thinning.load_dem
+    process_scene      — one scene (VV dB, incidence angle, DEM rasters),
+                         processed block by block with a halo so results do
+                         not depend on the block size
+    compare            — pixel-wise agreement with a raster exported from GEE
+
+The formulas and constants are those of gee_core; keep both in step. Edge
+handling follows Earth Engine: pixels whose 4-connected neighbours are
+missing have no slope, and focal operations ignore missing pixels. The angle
+and DEM rasters are resampled onto the VV grid with nearest neighbour (the
+GEE default) when their grids differ, and terrain is computed on that grid,
+as GEE does for an export at the VV scale.
+
+Nothing here needs Earth Engine, so the radar math can be run, checked and
+timed locally (python offline_core.py run; tests in tests/test_offline_core.py).
+
+Usage:
+    python offline_core.py run <vv.tif> <angle.tif> <dem.tif> <out_dir>
+                               --pass ASCENDING|DESCENDING [--lat <deg>]
+                               [--tracking] [--thinning <m>] [--block <px>]
+    python offline_core.py compare <offline.tif> <gee.tif> [--tol <value>] [--nodata <value>]
+"""
+
+import os
+import sys
+import math
+import time
+import warnings
+from contextlib import contextmanager, ExitStack
+
+import numpy as np
+import rasterio
+from rasterio.transform import Affine
+from rasterio.vrt import WarpedVRT
+from rasterio.windows import Window
+from rasterio.warp import Resampling, transform as warp_transform
+
+# Same values as gee_core (angle_aspect) / get_radar_azimuth
+S1_INCLINATION_DEG = 98.18
+S1_ROTATION_RATIO = (12 * 1440 / 175) / 1436.07   # orbital period / sidereal day
+ORBIT_PASSES = ('ASCENDING', 'DESCENDING')
+RADAR_AZIMUTH_RAD = {'ASCENDING': math.pi / 2, 'DESCENDING': math.pi * 1.5}
+
+SHADOW_LIA_DEG = 85          # local incidence angle above which a pixel is in shadow
+MIN_GAMMA0_DB = -35          # low-backscatter artefacts
+FOCAL_RADIUS = 3             # focalMedian(3) of the radar mask
+# thinning.load_dem: slope(dem.focal_median(4)).focal_min(8).lt(6)
+TERRAIN_SMOOTH_RADIUS = 4
+TERRAIN_MIN_RADIUS = 8
+TERRAIN_MAX_SLOPE_DEG = 6
+
+RADAR_HALO = 1 + FOCAL_RADIUS
+TRACKING_HALO = max(RADAR_HALO, TERRAIN_SMOOTH_RADIUS + 1 + TERRAIN_MIN_RADIUS)
+BLOCK = 512                  # pixels per block side (multiple of the 256 px GeoTIFF tiles)
+DEG_M = math.pi * 6378137.0 / 180   # metres per degree of latitude (WGS84 equator)
+
+LAKEDETECTION_BANDS = ("gamma0_db", "valid_mask", "VV_masked")
+TRACKING_BANDS = ("gamma0_db", "valid_mask", "terrain_mask", "combined_mask", "VV_corrected")
+
+DEFAULT_TOLERANCE = 0.1      # dB
+MATCH_FRACTION = 0.99        # share of common pixels within tolerance for compare() to pass
+
+
+# ============================================================
+# FOCAL OPERATIONS
+# ============================================================
+
+def disc_offsets(radius):
+    """(dy, dx) offsets of a circular kernel of the given radius in pixels (ee.Kernel.circle)."""
+    r = int(radius)
+    return [(dy, dx) for dy in range(-r, r + 1) for dx in range(-r, r + 1)
+            if dy * dy + dx * dx <= radius * radius]
+
+
+def _shifted(padded, pad, dy, dx, shape):
+    return padded[pad + dy:pad + dy + shape[0], pad + dx:pad + dx + shape[1]]
+
+
+def focal_median(array, radius):
+    """
+    Median over a circular neighbourhood, ignoring NaN (missing) pixels.
+
+    Binary arrays (values 0/1/NaN, such as masks) take a counting shortcut;
+    as for any median, ties give 0.5.
+    """
+    pad = int(radius)
+    padded = np.pad(array, pad, constant_values=np.nan)
+    offsets = disc_offsets(radius)
+    finite = array[np.isfinite(array)]
+    if np.all((finite == 0) | (finite == 1)):
+        ones = np.zeros(array.shape)
+        valid = np.zeros(array.shape)
+        for dy, dx in offsets:
+            window = _shifted(padded, pad, dy, dx, array.shape)
+            ones += window == 1
+            valid += np.isfinite(window)
+        out = np.where(2 * ones > valid, 1.0, np.where(2 * ones < valid, 0.0, 0.5))
+        out[valid == 0] = np.nan
+        return out
+    stack = np.stack([_shifted(padded, pad, dy, dx, array.shape) for dy, dx in offsets])
+    complete = np.isfinite(stack).all(axis=0)
+    if complete.all():
+        return np.median(stack, axis=0)
+    out = np.full(array.shape, np.nan)
+    out[complete] = np.median(stack[:, complete], axis=0)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)   # all-NaN neighbourhoods
+        out[~complete] = np.nanmedian(stack[:, ~complete], axis=0)
+    return out
+
+
+def focal_min(array, radius):
+    """Minimum over a circular neighbourhood, ignoring NaN (missing) pixels."""
+    pad = int(radius)
+    padded = np.pad(array, pad, constant_values=np.nan)
+    out = np.full(array.shape, np.nan)
+    for dy, dx in disc_offsets(radius):
+        out = np.fmin(out, _shifted(padded, pad, dy, dx, array.shape))
+    return out
+
+
+# ============================================================
+# RADAR GEOMETRY
+# ============================================================
+
+def pixel_size_m(transform, crs, row_off, n_rows):
+    """
+    Pixel width and height in metres of n_rows rows starting at row_off.
+
+    Scalars for projected grids; per-row (n_rows, 1) arrays for geographic
+    grids, where the width shrinks with latitude.
+    """
+    xres, yres = abs(transform.a), abs(transform.e)
+    if crs is None or not crs.is_geographic:
+        return xres, yres
+    lat = transform.f + (row_off + np.arange(n_rows)[:, None] + 0.5) * transform.e
+    return xres * DEG_M * np.cos(np.radians(lat)), yres * DEG_M
+
+
+def terrain_stack(dem, xres, yres):
+    """
+    Scene-independent terrain geometry of a DEM (gee_core.build_terrain_stack).
+
+    Gradients are central differences of the 4-connected neighbours, like
+    ee.Terrain; the outermost pixels of the array have no slope (NaN).
+    Aspect is the downslope direction clockwise from north.
+
+    Parameters
+    ----------
+    dem : np.ndarray
+        Elevation in metres, NaN where missing; row 0 is the northern edge.
+    xres, yres : float or np.ndarray
+        Pixel width and height in metres (see pixel_size_m).
+
+    Returns
+    -------
+    dict
+        'slope' and 'aspect' (radians), 'tan_slope', 'sin_aspect', 'cos_aspect'.
+    """
+    padded = np.pad(dem, 1, constant_values=np.nan)
+    dz_east = (padded[1:-1, 2:] - padded[1:-1, :-2]) / (2 * xres)
+    dz_north = (padded[:-2, 1:-1] - padded[2:, 1:-1]) / (2 * yres)
+    slope = np.arctan(np.hypot(dz_east, dz_north))
+    aspect = np.mod(np.arctan2(-dz_east, -dz_north), 2 * np.pi)
+    return {
+        'slope': slope,
+        'aspect': aspect,
+        'tan_slope': np.tan(slope),
+        'sin_aspect': np.sin(aspect),
+        'cos_aspect': np.cos(aspect),
+    }
+
+
+def angle_aspect(latitude, orbit_pass):
+    """
+    Aspect of the S1 incidence-angle field at a latitude in degrees, in radians
+    (gee_core.angle_aspect): 180° + A ascending, 180° - A descending, where A
+    is the angle between north and the westward ground-track heading of an
+    ascending pass, corrected for the Earth's rotation.
+    """
+    cos_lat = math.cos(math.radians(latitude))
+    sin_psi = max(-1.0, min(1.0, math.cos(math.radians(S1_INCLINATION_DEG)) / cos_lat))
+    track_angle = math.atan(math.sqrt(1 - sin_psi * sin_psi) / (S1_ROTATION_RATIO * cos_lat - sin_psi))
+    if orbit_pass == 'ASCENDING':
+        return math.pi + track_angle
+    return math.pi - track_angle
+
+
+def scene_latitude(src):
+    """Latitude of the centre of an open raster, in degrees."""
+    x, y = src.transform * (src.width / 2, src.height / 2)
+    if src.crs is None or src.crs.is_geographic:
+        return y
+    return warp_transform(src.crs, "EPSG:4326", [x], [y])[1][0]
+
+
+def radar_geometry(vv_db, angle_deg, terrain, orbit_pass, latitude, details=False):
+    """
+    Gamma-naught volume-corrected backscatter and layover/shadow mask of a scene.
+
+    Same computation as gee_core.radar_geometry. A pixel is missing (NaN) in
+    both outputs where any input is missing; the mask is then smoothed by a
+    FOCAL_RADIUS focal median, which ignores missing pixels.
+
+    Parameters
+    ----------
+    vv_db : np.ndarray
+        VV backscatter in dB.
+    angle_deg : np.ndarray
+        Incidence angle in degrees.
+    terrain : dict
+        Output of terrain_stack() on the same grid.
+    orbit_pass : str
+        'ASCENDING' or 'DESCENDING'.
+    latitude : float
+        Scene latitude in degrees; sets the look direction (angle_aspect).
+    details : bool, optional
+        Also return the intermediate angles and masks.
+
+    Returns
+    -------
+    (np.ndarray, np.ndarray) or (np.ndarray, np.ndarray, dict)
+        gamma0 volume-corrected VV in dB and the smoothed mask (0, 0.5 or 1);
+        with details, also 'alpha_r', 'alpha_az', 'theta_lia' (radians),
+        'layover', 'shadow' and the unsmoothed mask 'raw_mask'.
+    """
+    phi_i = angle_aspect(latitude, orbit_pass)
+    sin_i, cos_i = math.sin(phi_i), math.cos(phi_i)
+    cos_phi_r = terrain['cos_aspect'] * cos_i + terrain['sin_aspect'] * sin_i
+    sin_phi_r = terrain['cos_aspect'] * sin_i - terrain['sin_aspect'] * cos_i
+
+    theta_i = np.radians(angle_deg)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        alpha_r = np.arctan(terrain['tan_slope'] * cos_phi_r)
+        alpha_az = np.arctan(terrain['tan_slope'] * sin_phi_r)
+        theta_lia = np.arccos(np.cos(alpha_az) * np.cos(theta_i - alpha_r))
+
+        sigma0 = 10.0 ** (vv_db / 10)
+        gamma0 = sigma0 / np.cos(theta_i)
+        gamma0_volume = gamma0 / np.abs(
+            np.tan(np.pi / 2 - theta_i + alpha_r) / np.tan(np.pi / 2 - theta_i))
+        gamma0_db = 10 * np.log10(gamma0_volume)
+
+    missing = np.isnan(vv_db) | np.isnan(theta_i) | np.isnan(alpha_r)
+    layover = alpha_r > theta_i
+    shadow = theta_lia > math.radians(SHADOW_LIA_DEG)
+    raw_mask = (~layover & ~shadow & (gamma0_db > MIN_GAMMA0_DB)).astype(np.float64)
+    raw_mask[missing] = np.nan
+    gamma0_db[missing] = np.nan
+    mask = focal_median(raw_mask, FOCAL_RADIUS)
+    if not details:
+        return gamma0_db, mask
+    return gamma0_db, mask, {
+        'alpha_r': alpha_r, 'alpha_az': alpha_az, 'theta_lia': theta_lia,
+        'layover': layover, 'shadow': shadow, 'raw_mask': raw_mask,
+    }
+
+
+def terrain_mask(dem, xres, yres):
+    """
+    Flat-terrain mask of thinning.load_dem: 1 where the slope of the
+    median-smoothed DEM stays below TERRAIN_MAX_SLOPE_DEG within
+    TERRAIN_MIN_RADIUS pixels, 0 elsewhere, NaN where unknown.
+    """
+    slope = terrain_stack(focal_median(dem, TERRAIN_SMOOTH_RADIUS), xres, yres)['slope']
+    min_slope = focal_min(np.degrees(slope), TERRAIN_MIN_RADIUS)
+    out = (min_slope < TERRAIN_MAX_SLOPE_DEG).astype(np.float64)
+    out[np.isnan(min_slope)] = np.nan
+    return out
+
+
+def process_block(vv_db, angle_deg, dem, xres, yres, orbit_pass, latitude, tracking=False):
+    """
+    All output bands of one block (arrays of the same shape, halo included).
+
+    Lake detection (apply_radar_mask_to_collection): gamma0_db, valid_mask
+    and VV_masked (VV where the mask is non-zero; GEE keeps 0.5 pixels with
+    half weight). Tracking (preprocess_s1_collection) adds terrain_mask,
+    combined_mask and VV_corrected (gamma0 where combined_mask is 1).
+    """
+    gamma0_db, mask = radar_geometry(vv_db, angle_deg, terrain_stack(dem, xres, yres), orbit_pass, latitude)
+    out = {'gamma0_db': gamma0_db, 'valid_mask': mask}
+    if not tracking:
+        out['VV_masked'] = np.where(mask > 0, vv_db, np.nan)
+        return out
+    flat = terrain_mask(dem, xres, yres)
+    combined = ((mask != 0) & (flat != 0)).astype(np.float64)
+    combined[np.isnan(mask) | np.isnan(flat)] = np.nan
+    out['terrain_mask'] = flat
+    out['combined_mask'] = combined
+    out['VV_corrected'] = np.where(combined == 1, gamma0_db, np.nan)
+    return out
+
+
+def shifted_transform(transform, crs, mean_angle, thinning_correction, orbit_pass):
+    """
+    Geotransform of VV_corrected after the thinning shift of
+    preprocess_s1_collection (tan(mean angle) * thinning along the radar
+    azimuth). The shift is applied to the georeferencing, not resampled.
+    """
+    offset = math.tan(math.radians(mean_angle)) * float(thinning_correction)
+    azimuth = RADAR_AZIMUTH_RAD[orbit_pass]
+    dx, dy = offset * math.cos(azimuth), offset * math.sin(azimuth)
+    if crs is not None and crs.is_geographic:
+        lat = transform.f + transform.e * 0.5   # northern edge is close enough for metres
+        dx /= DEG_M * math.cos(math.radians(lat))
+        dy /= DEG_M
+    return Affine.translation(dx, dy) * transform
+
+
+# ============================================================
+# CHUNKED RASTER PROCESSING
+# ============================================================
+
+def iter_windows(height, width, block, halo):
+    """(window, outer) pairs: block-sized output windows and the halo-expanded read window."""
+    for row in range(0, height, block):
+        for col in range(0, width, block):
+            window = Window(col, row, min(block, width - col), min(block, height - row))
+            r0, c0 = max(row - halo, 0), max(col - halo, 0)
+            r1 = min(row + window.height + halo, height)
+            c1 = min(col + window.width + halo, width)
+            yield window, Window(c0, r0, c1 - c0, r1 - r0)
+
+
+@contextmanager
+def _aligned(path, grid):
+    """Open a raster, warped onto the grid of another open raster if needed (nearest)."""
+    with rasterio.open(path) as src:
+        if src.crs == grid.crs and src.shape == grid.shape and src.transform.almost_equals(grid.transform):
+            yield src
+            return
+        with WarpedVRT(src, crs=grid.crs, transform=grid.transform, width=grid.width,
+                       height=grid.height, resampling=Resampling.nearest) as vrt:
+            yield vrt
+
+
+def _read(src, window=None, out_shape=None):
+    data = src.read(1, window=window, out_shape=out_shape, masked=True)
+    return data.astype(np.float64).filled(np.nan)
+
+
+def _mean_angle(angle_src):
+    """Mean incidence angle of a scene, from a ~1 km overview (annotate_with_mean_angle)."""
+    factor = max(1, int(1000 / max(abs(angle_src.transform.a), 1e-9)))
+    if angle_src.crs is not None and angle_src.crs.is_geographic:
+        factor = max(1, int(1000 / (abs(angle_src.transform.a) * DEG_M)))
+    shape = (max(1, angle_src.height // factor), max(1, angle_src.width // factor))
+    return float(np.nanmean(_read(angle_src, out_shape=shape)))
+
+
+def process_scene(vv_path, angle_path, dem_path, out_dir, orbit_pass, tracking=False,
+                  thinning_correction=0.0, mean_angle=None, block=BLOCK, latitude=None):
+    """
+    Process one scene block by block and write one GeoTIFF per output band.
+
+    Parameters
+    ----------
+    vv_path : str
+        VV backscatter in dB; defines the output grid.
+    angle_path : str
+        Incidence angle in degrees.
+    dem_path : str
+        Digital elevation model in metres.
+    out_dir : str
+        Folder receiving <band>.tif for every band of process_block().
+    orbit_pass : str
+        'ASCENDING' or 'DESCENDING'.
+    tracking : bool, optional
+        Tracking preprocessing (terrain mask, VV_corrected) instead of the
+        lake detection radar mask.
+    thinning_correction : float, optional
+        Surface lowering in metres; shifts VV_corrected (tracking only).
+    mean_angle : float, optional
+        Incidence angle for the shift (default: mean of the angle raster).
+    block : int, optional
+        Block side in pixels.
+    latitude : float, optional
+        Scene latitude in degrees for the look direction. GEE uses the
+        centroid of the scene footprint; default: centre of the VV raster.
+
+    Returns
+    -------
+    dict
+        'paths' per band, 'pixels', 'blocks', 'seconds', 'mean_angle' and 'latitude'.
+    """
+    orbit_pass = orbit_pass.upper()
+    if orbit_pass not in ORBIT_PASSES:
+        raise ValueError(f"orbit_pass must be ASCENDING or DESCENDING, got {orbit_pass!r}")
+    os.makedirs(out_dir, exist_ok=True)
+    halo = TRACKING_HALO if tracking else RADAR_HALO
+    bands = TRACKING_BANDS if tracking else LAKEDETECTION_BANDS
+    paths = {b: os.path.join(out_dir, f"{b}.tif") for b in bands}
+
+    t0 = time.perf_counter()
+    n_blocks = 0
+    with ExitStack() as stack:
+        vv_src = stack.enter_context(rasterio.open(vv_path))
+        angle_src = stack.enter_context(_aligned(angle_path, vv_src))
+        dem_src = stack.enter_context(_aligned(dem_path, vv_src))
+        if latitude is None:
+            latitude = scene_latitude(vv_src)
+
+        profile = {
+            "driver": "GTiff", "count": 1, "dtype": "float32", "nodata": np.nan,
+            "width": vv_src.width, "height": vv_src.height, "crs": vv_src.crs,
+            "transform": vv_src.transform, "tiled": True, "blockxsize": 256,
+            "blockysize": 256, "compress": "deflate",
+        }
+        transforms = {b: vv_src.transform for b in bands}
+        if tracking and thinning_correction:
+            if mean_angle is None:
+                mean_angle = _mean_angle(angle_src)
+            transforms["VV_corrected"] = shifted_transform(
+                vv_src.transform, vv_src.crs, mean_angle, thinning_correction, orbit_pass)
+        dst = {b: stack.enter_context(rasterio.open(paths[b], "w", **dict(profile, transform=transforms[b])))
+               for b in bands}
+
+        for window, outer in iter_windows(vv_src.height, vv_src.width, block, halo):
+            xres, yres = pixel_size_m(vv_src.transform, vv_src.crs, outer.row_off, outer.height)
+            result = process_block(_read(vv_src, outer), _read(angle_src, outer), _read(dem_src, outer),
+                                   xres, yres, orbit_pass, latitude, tracking=tracking)
+            inner = (slice(window.row_off - outer.row_off, window.row_off - outer.row_off + window.height),
+                     slice(window.col_off - outer.col_off, window.col_off - outer.col_off + window.width))
+            for b in bands:
+                dst[b].write(result[b][inner].astype(np.float32), 1, window=window)
+            n_blocks += 1
+        pixels = vv_src.width * vv_src.height
+
+    return {"paths": paths, "pixels": pixels, "blocks": n_blocks,
+            "seconds": time.perf_counter() - t0, "mean_angle": mean_angle, "latitude": latitude}
+
+
+# ============================================================
+# COMPARISON WITH EARTH ENGINE
+# ============================================================
+
+def compare(offline_path, gee_path, tolerance=DEFAULT_TOLERANCE, gee_nodata=None):
+    """
+    Pixel-wise agreement of an offline band with the same band exported from GEE.
+
+    The GEE raster is read onto the offline grid (nearest neighbour). Drive
+    exports often write masked pixels as 0 without a nodata tag; pass
+    gee_nodata to treat such a value as missing.
+
+    Returns
+    -------
+    dict
+        n_common, n_offline_only, n_gee_only, max/mean/p99 absolute
+        difference over common pixels, within_tolerance (share of common
+        pixels with |difference| <= tolerance) and passed.
+    """
+    with rasterio.open(offline_path) as src, _aligned(gee_path, src) as gee:
+        offline = _read(src)
+        reference = _read(gee)
+    if gee_nodata is not None:
+        reference[reference == gee_nodata] = np.nan
+    has_offline, has_gee = np.isfinite(offline), np.isfinite(reference)
+    common = has_offline & has_gee
+    diff = np.abs(offline[common] - reference[common])
+    n = int(common.sum())
+    within = float((diff <= tolerance).mean()) if n else 0.0
+    return {
+        "n_common": n,
+        "n_offline_only": int((has_offline & ~has_gee).sum()),
+        "n_gee_only": int((has_gee & ~has_offline).sum()),
+        "max_abs_diff": float(diff.max()) if n else None,
+        "mean_abs_diff": float(diff.mean()) if n else None,
+        "p99_abs_diff": float(np.percentile(diff, 99)) if n else None,
+        "within_tolerance": within,
+        "passed": n > 0 and within >= MATCH_FRACTION,
+    }
+
+
+def _option(name, default=None):
+    if name in sys.argv:
+        i = sys.argv.index(name)
+        if i + 1 < len(sys.argv):
+            return sys.argv[i + 1]
+    return default
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    values = {"--pass", "--lat", "--thinning", "--block", "--tol", "--nodata"}
+    args = [a for i, a in enumerate(sys.argv[2:], start=2)
+            if not a.startswith("--") and sys.argv[i - 1] not in values]
+
+    if command == "run" and len(args) == 4 and _option("--pass"):
+        result = process_scene(*args, orbit_pass=_option("--pass"),
+                               tracking="--tracking" in sys.argv,
+                               thinning_correction=float(_option("--thinning", 0)),
+                               block=int(_option("--block", BLOCK)),
+                               latitude=float(_option("--lat")) if _option("--lat") else None)
+        mpx = result["pixels"] / 1e6
+        print(f"{mpx:.2f} Mpx in {result['blocks']} blocks, {result['seconds']:.2f} s "
+              f"({mpx / result['seconds']:.2f} Mpx/s)")
+        print(f"Look direction at latitude {result['latitude']:.3f}°")
+        if result["mean_angle"] is not None:
+            print(f"Thinning shift at mean incidence angle {result['mean_angle']:.2f}°")
+        for band, path in result["paths"].items():
+            print(f"  {band}: {path}")
+    elif command == "compare" and len(args) == 2:
+        nodata = _option("--nodata")
+        result = compare(*args, tolerance=float(_option("--tol", DEFAULT_TOLERANCE)),
+                         gee_nodata=float(nodata) if nodata is not None else None)
+        for key, value in result.items():
+            print(f"{key}: {value}")
+        sys.exit(0 if result["passed"] else 1)
+    else:
+        print(__doc__.split("Usage:")[1].rstrip())
+        sys.exit(1)
@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+THAW - Rendering module
+
+Lookup-table colourisation of single-band rasters, shared by the tracking GIF
+(reporting), the dashboard tracking viewer, the HTML tracking report and the
+Output page map layers.
+
+Values are quantised into the 256 colours of a matplotlib colormap through a
+precomputed uint8 table; NaN maps to one extra table entry, so a frame is
+rendered with a single float32 pass and one table lookup instead of a float64
+RGBA array per pixel. Quantisation matches matplotlib's own (floor(norm × 256),
+clipped to 255), so output is identical to cmap(norm) up to float32 rounding.
+
+Rendered tracking panels are kept in an on-disk cache (frame_cache/ inside the
+tracking run) so the pipeline GIF, the viewer and the HTML report render each
+frame once; see cached_panel and build_frame_cache.
+"""
+
+import os
+import glob
+import json
+import hashlib
+import tempfile
+from functools import lru_cache
+
+import numpy as np
+import matplotlib
+import rasterio
+from PIL import Image
+from filelock import FileLock
+
+LUT_SIZE = 256
+NAN_INDEX = LUT_SIZE  # extra table entry used for NaN pixels
+
+# Panel layout of tracking frames: Raw VV | Corrected VV | Lake Likelihood
+PANEL_CFG = {
+    "VV_raw":          dict(label="Raw VV (dB)",       cmap="gray",    vmin=-25, vmax=0, nan_fill=0.5),
+    "VV_corrected":    dict(label="Corrected VV (dB)", cmap="gray",    vmin=-25, vmax=0, nan_fill=0.5),
+    "lake_likelihood": dict(label="Lake Likelihood",   cmap="viridis", vmin=0,   vmax=1, nan_fill=0.0),
+}
+
+
+# Map layers of a lake detection run: Output page overlays and tile pyramids
+VIS_BY_LAYER = {
+    "z_score":         {"min": -2, "max": 2, "palette": "RdYlGn"},
+    "potential_water": {"min": 0,  "max": 1, "palette": "Blues", "mask_below_zero": True},
+    "mean_diff":       {"min": -5, "max": 5, "palette": "RdBu"},
+}
+
+
+def read_masked(path):
+    """Read a single-band raster as float32, replacing nodata and -9999 fill with nan."""
+    with rasterio.open(path) as src:
+        data = src.read(1).astype(np.float32)
+        nodata = src.nodata
+    if nodata is not None:
+        data[data == nodata] = np.nan
+    data[data <= -9999] = np.nan
+    return data
+
+
+@lru_cache(maxsize=None)
+def colormap_lut(cmap_name, nan_fill=None, alpha=False):
+    """
+    Build the (LUT_SIZE + 1, 3|4) uint8 colour table of a matplotlib colormap.
+
+    Parameters
+    ----------
+    cmap_name : str
+        Matplotlib colormap name (e.g. "viridis", "RdYlGn").
+    nan_fill : float, optional
+        Normalised value whose colour is used for NaN pixels. If None, NaN
+        pixels are black, and fully transparent when alpha is True.
+    alpha : bool
+        Return RGBA entries instead of RGB.
+
+    Returns
+    -------
+    np.ndarray
+        Read-only uint8 table; row NAN_INDEX holds the NaN colour.
+    """
+    cmap = matplotlib.colormaps[cmap_name]
+    if cmap.N != LUT_SIZE:
+        cmap = cmap.resampled(LUT_SIZE)
+    lut = np.zeros((LUT_SIZE + 1, 4), dtype=np.uint8)
+    lut[:LUT_SIZE] = (cmap(np.arange(LUT_SIZE)) * 255).astype(np.uint8)
+    if nan_fill is not None:
+        lut[NAN_INDEX] = lut[_quantise(np.float32(nan_fill))]
+    if not alpha:
+        lut = lut[:, :3].copy()
+    lut.flags.writeable = False
+    return lut
+
+
+def _quantise(norm):
+    """Map normalised values to table indices the way matplotlib does."""
+    return np.clip(np.floor(norm * LUT_SIZE), 0, LUT_SIZE - 1).astype(np.uint16)
+
+
+def colorize(data, cmap_name, vmin, vmax, nan_fill=None, alpha=False):
+    """
+    Colourise a band array through the colormap lookup table.
+
+    Parameters
+    ----------
+    data : np.ndarray
+        2-D band array; converted to float32 if needed, NaN marks no data.
+    cmap_name : str
+        Matplotlib colormap name.
+    vmin, vmax : float
+        Value range mapped onto the colormap; values outside are clipped.
+    nan_fill : float, optional
+        Normalised value used to colour NaN pixels (see colormap_lut).
+    alpha : bool
+        Return RGBA with transparent NaN pixels (unless nan_fill is given).
+
+    Returns
+    -------
+    np.ndarray
+        uint8 array of shape (H, W, 3) or (H, W, 4).
+    """
+    lut = colormap_lut(cmap_name, nan_fill, alpha)
+    idx = np.asarray(data, dtype=np.float32) - np.float32(vmin)
+    idx *= np.float32(LUT_SIZE / (vmax - vmin))
+    nan_mask = np.isnan(idx)
+    np.clip(idx, 0, LUT_SIZE - 1, out=idx)
+    idx[nan_mask] = NAN_INDEX
+    return np.take(lut, idx.astype(np.uint16), axis=0)
+
+
+def render_image(data, cmap_name, vmin, vmax, nan_fill=None, alpha=False):
+    """Colourise a band array (see colorize) into a PIL Image."""
+    return Image.fromarray(colorize(data, cmap_name, vmin, vmax, nan_fill, alpha))
+
+
+# ============================================================
+# FRAME CACHE
+# ============================================================
+
+FRAME_CACHE_DIR = "frame_cache"
+FRAME_CACHE_WIDTHS = (300, 400, 600)  # tracking viewer, HTML report, GIF panel widths
+_MANIFEST = "manifest.json"
+
+
+def panel_config_hash():
+    """Short hash of everything that affects rendered panels; a change invalidates the cache."""
+    payload = json.dumps({"panels": PANEL_CFG, "lut_size": LUT_SIZE, "format": "webp-lossless"},
+                         sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()[:12]
+
+
+def _load_manifest(cache_dir):
+    config_hash = panel_config_hash()
+    try:
+        with open(os.path.join(cache_dir, _MANIFEST), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    if manifest.get("config_hash") != config_hash:
+        manifest = {"config_hash": config_hash, "panels": {}}
+    return manifest
+
+
+def _replace_atomically(path, write):
+    """
+    Call write(tmp_path) on a unique temporary file next to path, then move it
+    into place. Streamlit sessions share one PID, so the temporary name comes
+    from mkstemp rather than the process ID.
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".",
+                               suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _update_manifest(cache_dir, panels):
+    """
+    Record newly rendered panels in the manifest.
+
+    The manifest is re-read and rewritten under a file lock, so panels
+    recorded concurrently by other sessions or the pipeline are kept.
+    """
+    if not panels:
+        return
+    path = os.path.join(cache_dir, _MANIFEST)
+
+    def write(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1)
+
+    with FileLock(path + ".lock"):
+        manifest = _load_manifest(cache_dir)
+        manifest["panels"].update(panels)
+        _replace_atomically(path, write)
+
+
+def _panel_key(source_path, width):
+    return f"{os.path.basename(source_path)}@{width}"
+
+
+def _cached(cache_dir, manifest, source_path, width):
+    """Return the cached panel path if it is fresh, else None."""
+    entry = manifest["panels"].get(_panel_key(source_path, width))
+    if not entry or entry.get("mtime") != os.path.getmtime(source_path):
+        return None
+    path = os.path.join(cache_dir, entry["file"])
+    return path if os.path.isfile(path) else None
+
+
+def _render_widths(cache_dir, rendered, source_path, band, widths):
+    """
+    Read and colourise a source TIF once, write one WebP panel per width.
+
+    Manifest entries of the written panels are added to rendered; record
+    them with _update_manifest.
+    """
+    cfg = PANEL_CFG[band]
+    mtime = os.path.getmtime(source_path)
+    im = render_image(read_masked(source_path), cfg["cmap"], cfg["vmin"], cfg["vmax"], cfg["nan_fill"])
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    panels = {}
+    for width in widths:
+        panel = im.resize((width, max(1, int(im.height * width / im.width))), Image.LANCZOS)
+        name = f"{stem}_{width}.webp"
+        _replace_atomically(  # fast lossless encode
+            os.path.join(cache_dir, name),
+            lambda tmp: panel.save(tmp, format="WEBP", lossless=True, quality=20, method=1))
+        rendered[_panel_key(source_path, width)] = {"file": name, "mtime": mtime}
+        panels[width] = panel
+    return panels
+
+
+def cached_panel(tracking_dir, source_path, band, width):
+    """
+    Rendered panel of one tracking frame band at a fixed width, from the frame cache.
+
+    The cache lives in tracking_dir/frame_cache and is keyed on the source TIF
+    mtime and the panel configuration hash; stale or missing panels are
+    rendered, written and recorded in the manifest. Files are replaced
+    atomically through unique temporary files and the manifest is updated
+    under a file lock, so concurrent sessions never see partial panels or
+    drop each other's entries.
+
+    Parameters
+    ----------
+    tracking_dir : str
+        Tracking results directory holding the frame_cache folder.
+    source_path : str
+        Band GeoTIFF of the frame.
+    band : str
+        PANEL_CFG key of the band.
+    width : int
+        Panel width in pixels; height keeps the raster aspect ratio.
+
+    Returns
+    -------
+    PIL.Image.Image
+        RGB panel image.
+    """
+    cache_dir = os.path.join(tracking_dir, FRAME_CACHE_DIR)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        manifest = _load_manifest(cache_dir)
+        path = _cached(cache_dir, manifest, source_path, width)
+        if path:
+            with Image.open(path) as im:
+                return im.convert("RGB")
+        rendered = {}
+        panel = _render_widths(cache_dir, rendered, source_path, band, [width])[width]
+        _update_manifest(cache_dir, rendered)
+        return panel
+    except OSError:
+        # Read-only or unavailable cache: render without caching
+        cfg = PANEL_CFG[band]
+        im = render_image(read_masked(source_path), cfg["cmap"], cfg["vmin"], cfg["vmax"], cfg["nan_fill"])
+        return im.resize((width, max(1, int(im.height * width / im.width))), Image.LANCZOS)
+
+
+def build_frame_cache(tracking_dir, widths=FRAME_CACHE_WIDTHS):
+    """
+    Pre-render every tracking frame band at all cache widths.
+
+    Each source TIF is read and colourised at most once; only panels that are
+    missing or stale are rendered.
+
+    Parameters
+    ----------
+    tracking_dir : str
+        Tracking results directory containing the *{band}*.tif frames.
+    widths : tuple of int
+        Panel widths to cache.
+
+    Returns
+    -------
+    int
+        Number of source TIFs rendered.
+    """
+    cache_dir = os.path.join(tracking_dir, FRAME_CACHE_DIR)
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest = _load_manifest(cache_dir)
+    panels = {}
+    rendered = 0
+    for band in PANEL_CFG:
+        for source_path in sorted(glob.glob(os.path.join(tracking_dir, f"*{band}*.tif"))):
+            missing = [w for w in widths if not _cached(cache_dir, manifest, source_path, w)]
+            if not missing:
+                continue
+            try:
+                _render_widths(cache_dir, panels, source_path, band, missing)
+                rendered += 1
+            except Exception as e:
+                print(f"Warning: could not cache {os.path.basename(source_path)}: {e}", flush=True)
+    _update_manifest(cache_dir, panels)
+    return rendered
@@ -5,8 +5,13 @@ THAW - Reporting module
 Post-processing and output generation for both pipelines:
 
   Lakedetection: cluster_processing — DBSCAN on z_score raster, saves GeoJSON + CSV
+                 recluster_from_candidates — same, from the sparse z_candidates cache
   Tracking:      extract_cluster_area_timeseries — DBSCAN on likelihood TIFs per
                  frame, computes area at three likelihood levels
+                 extract_lake_area_timeseries — same, per persistent lake ID
+                 (LakeRegistry, seeded from the lakedetection clusters)
+                 compute_likelihood_histograms — per-frame cumulative histograms,
+                 area at any threshold via areas_from_histograms
                  generate_lake_metrics_report — orchestrates metrics, plot, GIF
 
 Replaces water_detection.py (reporting portions) and analysis.py entirely.
@@ -24,19 +29,89 @@ import matplotlib.pyplot as plt
 import rasterio
 from rasterio.features import shapes
 from rasterio.warp import transform_geom
+import shapely
+from shapely import STRtree
+from shapely.geometry import shape, mapping
 from sklearn.cluster import DBSCAN
 from PIL import Image, ImageDraw, ImageFont, ImageOps
 from datetime import datetime
 
+from rendering import PANEL_CFG, build_frame_cache, cached_panel
+from animation import AnimationWriter
+
 
 # ============================================================
 # LAKEDETECTION — CLUSTER PROCESSING
 # ============================================================
 
+def _cluster_features(rows, cols, labels, transform, src_crs):
+    """
+    Polygonise DBSCAN labels of candidate pixels into WGS84 GeoJSON features.
+
+    Only the bounding window of the labelled pixels is rasterised, so the cost
+    scales with the cluster extent rather than the full scene.
+
+    Returns
+    -------
+    (features, summary_rows) — summary_rows are
+        (Cluster_ID, Pixel_Count, Area_m2, Centroid_Lon, Centroid_Lat) tuples
+    """
+    keep = labels >= 0
+    if not keep.any():
+        return [], []
+    rows, cols, labels = rows[keep], cols[keep], labels[keep].astype(int)
+
+    r0, c0 = int(rows.min()), int(cols.min())
+    labels_raster = np.full((int(rows.max()) - r0 + 1, int(cols.max()) - c0 + 1), -1, dtype=np.int32)
+    labels_raster[rows - r0, cols - c0] = labels
+    window_transform = transform * transform.translation(c0, r0)
+    pix_counts = np.bincount(labels)
+    res_x, res_y = abs(transform.a), abs(transform.e)
+
+    features, summary_rows = [], []
+    for geom, val in shapes(labels_raster, mask=(labels_raster != -1), transform=window_transform):
+        lbl = int(val)
+
+        # Reproject from raster native CRS (e.g. UTM) to WGS84 so Folium renders correctly
+        geom_wgs84 = transform_geom(src_crs, "EPSG:4326", geom)
+
+        coords_list = geom_wgs84['coordinates'][0]
+        lons = [p[0] for p in coords_list]
+        lats = [p[1] for p in coords_list]
+        center_lon = sum(lons) / len(lons)
+        center_lat = sum(lats) / len(lats)
+
+        pix_count = int(pix_counts[lbl])
+
+        # Use native projected pixel size (metres) if CRS is projected, else degree approximation
+        if src_crs.is_projected:
+            pixel_area_m2 = res_x * res_y
+        else:
+            m_per_deg_lat = 111320
+            m_per_deg_lon = 111320 * math.cos(math.radians(center_lat))
+            pixel_area_m2 = (res_x * m_per_deg_lon) * (res_y * m_per_deg_lat)
+        total_area_m2 = pix_count * pixel_area_m2
+
+        features.append({
+            "type": "Feature",
+            "properties": {
+                "cluster_id": lbl,
+                "pixel_count": pix_count,
+                "area_m2": round(total_area_m2, 0)
+            },
+            "geometry": geom_wgs84
+        })
+        summary_rows.append((lbl, pix_count, round(total_area_m2, 0), center_lon, center_lat))
+
+    return features, summary_rows
+
+
 def cluster_processing(tif_path, timestamp, z_thres=-2, min_size_cluster=20, pix=6):
     """
     DBSCAN clustering on a z_score raster. Candidate pixels are those <= z_thres
-    (anomalously low backscatter). Saves a GeoJSON polygon file and a CSV summary.
+    (anomalously low backscatter). Saves a GeoJSON polygon file and a CSV summary,
+    plus a sparse candidate cache (z_candidates_{timestamp}.npz) that allows
+    re-clustering with other parameters (see recluster_from_candidates).
 
     Parameters
     ----------
@@ -55,11 +130,19 @@ def cluster_processing(tif_path, timestamp, z_thres=-2, min_size_cluster=20, pix
     with rasterio.open(tif_path) as src:
         data = src.read(1).astype(float)
         transform = src.transform
-        res_x, res_y = src.res
         src_crs = src.crs
 
     # Mask positive values and find candidates
     data = np.where(data <= 0, data, np.nan)
+
+    output_dir = os.path.dirname(tif_path)
+    try:
+        save_z_candidates(data, transform, src_crs,
+                          os.path.join(output_dir, f"z_candidates_{timestamp}.npz"),
+                          z_thres=z_thres, min_size_cluster=min_size_cluster, pix=pix)
+    except Exception as e:
+        print(f"Warning: could not write candidate cache: {e}", flush=True)
+
     candidate = data <= z_thres
     ys, xs = np.nonzero(candidate)
 
@@ -69,51 +152,13 @@ def cluster_processing(tif_path, timestamp, z_thres=-2, min_size_cluster=20, pix
 
     coords = np.column_stack([ys, xs])
     db = DBSCAN(eps=pix, min_samples=min_size_cluster).fit(coords)
-    labels = db.labels_
-
-    labels_raster = np.full(candidate.shape, -1, dtype=int)
-    labels_raster[ys, xs] = labels.astype(int)
+    features, summary_rows = _cluster_features(ys, xs, db.labels_, transform, src_crs)
 
-    features = []
     summary_data = "Cluster_ID,Pixel_Count,Area_m2,Centroid_Lon,Centroid_Lat\n"
-
-    for geom, val in shapes(labels_raster, mask=(labels_raster != -1), transform=transform):
-        lbl = int(val)
-
-        # Reproject from raster native CRS (e.g. UTM) to WGS84 so Folium renders correctly
-        geom_wgs84 = transform_geom(src_crs, "EPSG:4326", geom)
-
-        coords_list = geom_wgs84['coordinates'][0]
-        lons = [p[0] for p in coords_list]
-        lats = [p[1] for p in coords_list]
-        center_lon = sum(lons) / len(lons)
-        center_lat = sum(lats) / len(lats)
-
-        pix_count = int((labels_raster == lbl).sum())
-
-        # Use native projected pixel size (metres) if CRS is projected, else degree approximation
-        if src_crs.is_projected:
-            pixel_area_m2 = abs(res_x) * abs(res_y)
-        else:
-            m_per_deg_lat = 111320
-            m_per_deg_lon = 111320 * math.cos(math.radians(center_lat))
-            pixel_area_m2 = abs(res_x * m_per_deg_lon) * abs(res_y * m_per_deg_lat)
-        total_area_m2 = pix_count * pixel_area_m2
-
-        feature = {
-            "type": "Feature",
-            "properties": {
-                "cluster_id": lbl,
-                "pixel_count": pix_count,
-                "area_m2": round(total_area_m2, 0)
-            },
-            "geometry": geom_wgs84
-        }
-        features.append(feature)
-        summary_data += f"{lbl},{pix_count},{round(total_area_m2, 0)},{center_lon:.6f},{center_lat:.6f}\n"
+    for lbl, pix_count, area_m2, center_lon, center_lat in summary_rows:
+        summary_data += f"{lbl},{pix_count},{area_m2},{center_lon:.6f},{center_lat:.6f}\n"
 
     # Define paths with the shared timestamp
-    output_dir = os.path.dirname(tif_path)
     poly_path = os.path.join(output_dir, f"detected_clusters_{timestamp}.geojson")
     summary_path = os.path.join(output_dir, f"cluster_summary_{timestamp}.csv")
 
@@ -127,52 +172,277 @@ def cluster_processing(tif_path, timestamp, z_thres=-2, min_size_cluster=20, pix
     return poly_path, summary_path
 
 
+# ============================================================
+# CLUSTERING — SPARSE CANDIDATE CACHE
+# ============================================================
+
+def save_z_candidates(data, transform, crs, path, z_thres=-2, min_size_cluster=20, pix=6):
+    """
+    Write the sparse candidate cache of a z_score raster: row/col/z of every
+    pixel with z <= 0, the raster grid, and the parameters used by the pipeline.
+
+    Parameters
+    ----------
+    data      : np.ndarray — z_score array (positive values may already be NaN)
+    transform : Affine     — raster transform
+    crs       : CRS        — raster CRS
+    path      : str        — output .npz path
+    z_thres, min_size_cluster, pix — pipeline clustering parameters, stored as defaults
+    """
+    rows, cols = np.nonzero(data <= 0)
+    np.savez_compressed(
+        path,
+        rows=rows.astype(np.int32),
+        cols=cols.astype(np.int32),
+        z=data[rows, cols].astype(np.float32),
+        shape=np.array(data.shape, dtype=np.int64),
+        transform=np.array(tuple(transform)[:6], dtype=float),
+        crs=np.array(crs.to_wkt()),
+        z_thres=np.array(float(z_thres)),
+        min_size_cluster=np.array(int(min_size_cluster)),
+        pix=np.array(float(pix)),
+    )
+
+
+def load_z_candidates(path):
+    """Load a candidate cache written by save_z_candidates."""
+    with np.load(path) as npz:
+        return {k: npz[k] for k in npz.files}
+
+
+def recluster_from_candidates(cache, z_thres=-2, min_size_cluster=20, pix=6):
+    """
+    Re-run cluster detection from a sparse candidate cache without the z_score raster.
+
+    Parameters
+    ----------
+    cache            : dict  — candidate cache (load_z_candidates)
+    z_thres          : float — z_score threshold, must be <= 0
+    min_size_cluster : int   — DBSCAN min_samples
+    pix              : float — DBSCAN eps (pixels)
+
+    Returns
+    -------
+    (geojson, summary_rows) — a FeatureCollection dict as written by
+    cluster_processing, and summary rows as dicts keyed like cluster_summary_*.csv
+    """
+    from affine import Affine
+    from rasterio.crs import CRS
+
+    sel = cache["z"] <= z_thres
+    rows, cols = cache["rows"][sel], cache["cols"][sel]
+    if len(rows) == 0:
+        return {"type": "FeatureCollection", "features": []}, []
+
+    labels = DBSCAN(eps=pix, min_samples=min_size_cluster).fit(np.column_stack([rows, cols])).labels_
+    features, summary_rows = _cluster_features(
+        rows, cols, labels, Affine(*cache["transform"]), CRS.from_wkt(str(cache["crs"])),
+    )
+    keys = ("Cluster_ID", "Pixel_Count", "Area_m2", "Centroid_Lon", "Centroid_Lat")
+    return ({"type": "FeatureCollection", "features": features},
+            [dict(zip(keys, r)) for r in summary_rows])
+
+
+# ============================================================
+# TRACKING — PERSISTENT LAKE IDS
+# ============================================================
+
+def load_lake_seeds(search_dir):
+    """
+    Load lake seed footprints from the most recent detected_clusters_*.geojson.
+
+    Features sharing a cluster_id (multi-part clusters) are merged, so each
+    lake ID maps to exactly one geometry.
+
+    Parameters
+    ----------
+    search_dir : str — directory containing detected_clusters_*.geojson
+
+    Returns
+    -------
+    dict {lake_id (int): shapely geometry in EPSG:4326}, empty if no file found
+    """
+    files = glob.glob(os.path.join(search_dir, "detected_clusters_*.geojson"))
+    if not files:
+        return {}
+    files.sort(key=os.path.getmtime, reverse=True)
+
+    with open(files[0], "r", encoding="utf-8") as f:
+        gj = json.load(f)
+
+    parts = {}
+    for feat in gj.get("features", []):
+        props = feat.get("properties") or {}
+        geom = feat.get("geometry")
+        if geom is None or props.get("cluster_id") is None:
+            continue
+        parts.setdefault(int(props["cluster_id"]), []).append(shape(geom))
+
+    return {lake_id: shapely.union_all(geoms) for lake_id, geoms in parts.items()}
+
+
+class LakeRegistry:
+    """
+    Assigns DBSCAN clusters of successive tracking frames to persistent lake IDs.
+
+    The registry starts from the lakedetection seed footprints and grows by
+    one entry for every cluster that matches no known lake. Footprints and
+    their centroids are held in two STRtrees (rebuilt only when the registry
+    grows or the frame CRS changes). A cluster is matched to the lake whose
+    footprint overlaps the cluster footprint (convex hull of its pixels) the
+    most; clusters without overlap fall back to the nearest lake centroid
+    within max_dist. Unmatched clusters are registered with their hull, not
+    their bounding box, so that new lakes do not swallow their neighbours.
+
+    Parameters
+    ----------
+    seeds : dict — {lake_id: shapely geometry in EPSG:4326}, see load_lake_seeds
+    """
+
+    def __init__(self, seeds=None):
+        seeds = seeds or {}
+        self._ids = [int(k) for k in seeds]
+        self._geoms_wgs84 = list(seeds.values())
+        self._next_id = max(self._ids, default=-1) + 1
+        self._crs = None
+        self._geoms = None
+        self._tree = None
+        self._centroid_tree = None
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _index(self, crs):
+        """Project all footprints to crs and (re)build both spatial indexes."""
+        if self._crs != crs or self._geoms is None:
+            self._crs = crs
+            self._geoms = np.array(
+                [shape(transform_geom("EPSG:4326", crs, mapping(g))) for g in self._geoms_wgs84],
+                dtype=object,
+            )
+            self._tree = None
+        if self._tree is None and len(self._geoms):
+            self._tree = STRtree(self._geoms)
+            self._centroid_tree = STRtree(shapely.centroid(self._geoms))
+
+    def _add(self, geom):
+        """Register a new lake footprint (in the current frame CRS); return its index."""
+        self._ids.append(self._next_id)
+        self._next_id += 1
+        self._geoms_wgs84.append(shape(transform_geom(self._crs, "EPSG:4326", mapping(geom))))
+        self._geoms = np.append(self._geoms, np.array([geom], dtype=object))
+        self._tree = None
+        return len(self._ids) - 1
+
+    def match(self, footprints, centroids, crs, max_dist):
+        """
+        Return one lake ID per cluster.
+
+        Parameters
+        ----------
+        footprints : np.ndarray of shapely Polygons — cluster hulls (frame CRS)
+        centroids  : np.ndarray of shapely Points   — cluster centroids (frame CRS)
+        crs        : rasterio CRS of the frame
+        max_dist   : float — nearest-centroid search radius in CRS units
+
+        Returns
+        -------
+        np.ndarray of int lake IDs, aligned with footprints
+        """
+        self._index(crs)
+        lake_idx = np.full(len(footprints), -1, dtype=np.int64)
+
+        if self._tree is not None:
+            # Overlap: keep the lake with the largest intersection per cluster
+            c_idx, g_idx = self._tree.query(footprints, predicate="intersects")
+            if c_idx.size:
+                overlap = shapely.area(shapely.intersection(footprints[c_idx], self._geoms[g_idx]))
+                order = np.lexsort((-overlap, c_idx))
+                c_sorted = c_idx[order]
+                first = np.r_[True, c_sorted[1:] != c_sorted[:-1]]
+                lake_idx[c_sorted[first]] = g_idx[order][first]
+
+            # No overlap: nearest lake centroid within max_dist
+            todo = np.flatnonzero(lake_idx < 0)
+            if todo.size:
+                c_near, g_near = self._centroid_tree.query_nearest(
+                    centroids[todo], max_distance=max_dist, all_matches=False
+                )
+                lake_idx[todo[c_near]] = g_near
+
+        for i in np.flatnonzero(lake_idx < 0):
+            lake_idx[i] = self._add(footprints[i])
+
+        return np.asarray(self._ids, dtype=np.int64)[lake_idx]
+
+
 # ============================================================
 # TRACKING — CLUSTER-BASED AREA TIME SERIES
 # ============================================================
 
-def extract_cluster_area_timeseries(out_dir, thresholds=(0.1, 0.5, 0.9),
-                                     min_size_cluster=20, pix=6):
+def _frame_date(basename):
+    """Extract the frame date — supports YYYY-MM-DD and legacy YYYYMMDDThhmmss names."""
+    match = re.search(r'(\d{4}-\d{2}-\d{2})', basename)
+    if match:
+        return match.group(1)
+    match2 = re.search(r'(\d{4})(\d{2})(\d{2})T\d{6}', basename)
+    return f"{match2.group(1)}-{match2.group(2)}-{match2.group(3)}" if match2 else basename
+
+
+HIST_BINS = 100  # likelihood bins of width 0.01; an extra top bin holds likelihood == 1
+HIST_FILENAME = "likelihood_histograms.npz"
+
+
+def compute_likelihood_histograms(out_dir, lower_thresh=0.1, min_size_cluster=20, pix=6,
+                                  seeds=None, match_dist_px=None, n_bins=HIST_BINS):
     """
-    Compute lake area time series from locally downloaded lake_likelihood TIFs.
+    Reduce every lake_likelihood frame once into per-lake cumulative histograms.
 
-    For each frame, DBSCAN is run at the mid threshold to identify lake clusters.
-    Area is then computed at three likelihood levels:
-      lower_area_km2 — pixels within clusters where likelihood >= lower threshold
-      mean_area_km2  — likelihood-weighted area within clusters (sum × pixel area)
-      upper_area_km2 — pixels within clusters where likelihood >= upper threshold
+    For each frame, DBSCAN is run on pixels with likelihood >= lower_thresh and
+    the clusters are matched to persistent lake IDs (see LakeRegistry). The
+    in-cluster likelihoods of each (frame, lake) are binned on the fixed edges
+    0, 1/n_bins, ..., 1 and stored as reversed cumulative counts, so that
+    cum_counts[row, k] is the number of pixels with likelihood >= edges[k].
+    Area at any threshold >= lower_thresh then follows without re-reading
+    rasters or re-clustering (see area_at_threshold / areas_from_histograms).
 
     Parameters
     ----------
     out_dir          : str   — directory containing *lake_likelihood*.tif files
-    thresholds       : tuple — (lower, mid, upper) likelihood thresholds
+    lower_thresh     : float — candidate threshold used for clustering
     min_size_cluster : int   — DBSCAN min_samples
     pix              : int   — DBSCAN eps (pixels)
+    seeds            : dict  — lake seeds, see load_lake_seeds (default: none)
+    match_dist_px    : float — nearest-centroid search radius in pixels (default 2 × pix)
+    n_bins           : int   — number of likelihood bins over [0, 1)
 
     Returns
     -------
-    pd.DataFrame with columns: date, mean_area_km2, lower_area_km2, upper_area_km2
+    dict of np.ndarray:
+        frame_dates    — every processed frame, including frames without clusters
+        frame          — index into frame_dates of each (frame, lake) row
+        date, lake_id  — one entry per (frame, lake) row
+        pixel_area_km2 — pixel area of the row's frame
+        weighted_sum   — sum of in-cluster likelihoods (likelihood-weighted pixel count)
+        edges          — (n_bins + 1,) lower bin edges, last edge is 1.0
+        cum_counts     — (rows, n_bins + 1) reversed cumulative pixel counts
+        lower_thresh   — clustering threshold (0-d)
     """
-    lower_thresh, mid_thresh, upper_thresh = thresholds
+    if match_dist_px is None:
+        match_dist_px = 2 * pix
 
     tif_files = sorted(glob.glob(os.path.join(out_dir, "*lake_likelihood*.tif")))
     if not tif_files:
         raise ValueError(f"No lake_likelihood TIF files found in {out_dir}")
 
-    dates = []
-    areas_mean = []
-    areas_lower = []
-    areas_upper = []
+    edges = np.arange(n_bins + 1) / n_bins
+    registry = LakeRegistry(seeds)
+    frame_dates = []
+    rows_frame, rows_date, rows_lake, rows_area, rows_wsum, rows_cum = [], [], [], [], [], []
 
     for tif_path in tif_files:
-        # Extract date from filename — supports both YYYY-MM-DD and legacy YYYYMMDDThhmmss formats
         basename = os.path.basename(tif_path)
-        match = re.search(r'(\d{4}-\d{2}-\d{2})', basename)
-        if not match:
-            match2 = re.search(r'(\d{4})(\d{2})(\d{2})T\d{6}', basename)
-            date_str = f"{match2.group(1)}-{match2.group(2)}-{match2.group(3)}" if match2 else basename
-        else:
-            date_str = match.group(1)
+        date_str = _frame_date(basename)
 
         print(f"Processing frame: {basename}", flush=True)
 
@@ -187,6 +457,8 @@ def extract_cluster_area_timeseries(out_dir, thresholds=(0.1, 0.5, 0.9),
             print(f"Warning: skipping {basename} — cannot read file: {e}", flush=True)
             continue
 
+        frame_dates.append(date_str)
+
         # Mask nodata
         if nodata is not None:
             data[data == nodata] = np.nan
@@ -203,17 +475,13 @@ def extract_cluster_area_timeseries(out_dir, thresholds=(0.1, 0.5, 0.9),
             m_per_deg_lon = 111320 * math.cos(math.radians(center_lat))
             pix_area_km2 = (abs(res_x) * m_per_deg_lon) * (abs(res_y) * m_per_deg_lat) / 1e6
 
-        # Find candidate pixels at mid threshold for DBSCAN
+        # Find candidate pixels for DBSCAN
         valid = np.isfinite(data)
         candidate = valid & (data >= lower_thresh)
         ys, xs = np.nonzero(candidate)
 
         if len(ys) == 0:
             print(f"  No clusters found above {lower_thresh}.", flush=True)
-            dates.append(date_str)
-            areas_mean.append(0.0)
-            areas_lower.append(0.0)
-            areas_upper.append(0.0)
             continue
 
         # DBSCAN clustering
@@ -225,36 +493,197 @@ def extract_cluster_area_timeseries(out_dir, thresholds=(0.1, 0.5, 0.9),
         cluster_mask = labels >= 0
         if not cluster_mask.any():
             print(f"  No valid clusters after DBSCAN.", flush=True)
-            dates.append(date_str)
-            areas_mean.append(0.0)
-            areas_lower.append(0.0)
-            areas_upper.append(0.0)
             continue
 
         cluster_ys = ys[cluster_mask]
         cluster_xs = xs[cluster_mask]
         cluster_vals = data[cluster_ys, cluster_xs]
+        _, cl_inv = np.unique(labels[cluster_mask], return_inverse=True)
+        n_clusters = int(cl_inv.max()) + 1
+
+        # Per-cluster footprints (convex hull of the pixels) and centroids
+        n_pix = np.bincount(cl_inv, minlength=n_clusters)
+        row_c = np.bincount(cl_inv, weights=cluster_ys, minlength=n_clusters) / n_pix + 0.5
+        col_c = np.bincount(cl_inv, weights=cluster_xs, minlength=n_clusters) / n_pix + 0.5
+
+        order = np.argsort(cl_inv, kind="stable")
+        px, py = transform * (cluster_xs[order] + 0.5, cluster_ys[order] + 0.5)
+        hulls = shapely.convex_hull(
+            shapely.multipoints(np.column_stack([px, py]), indices=cl_inv[order]))
+        footprints = shapely.buffer(hulls, 0.5 * max(abs(res_x), abs(res_y)),
+                                    cap_style="square", join_style="mitre")
+        cx, cy = transform * (col_c, row_c)
+        centroids = shapely.points(cx, cy)
+
+        max_dist = match_dist_px * max(abs(res_x), abs(res_y))
+        cluster_lake = registry.match(footprints, centroids, src_crs, max_dist)
+
+        # One histogram pass for all lakes of the frame (clusters of one lake are merged)
+        lake_ids, lake_inv = np.unique(cluster_lake[cl_inv], return_inverse=True)
+        n_lakes = len(lake_ids)
+        bin_idx = np.searchsorted(edges, cluster_vals, side="right") - 1
+        counts = np.bincount(lake_inv * (n_bins + 1) + bin_idx,
+                             minlength=n_lakes * (n_bins + 1)).reshape(n_lakes, n_bins + 1)
+        cum = counts[:, ::-1].cumsum(axis=1)[:, ::-1]
+        wsum = np.bincount(lake_inv, weights=cluster_vals, minlength=n_lakes)
+
+        print(f"  {n_clusters} cluster(s) in {n_lakes} lake(s) - "
+              f"{int(cum[:, 0].sum())} px, mid: {wsum.sum() * pix_area_km2:.4f} km2", flush=True)
+
+        rows_frame.extend([len(frame_dates) - 1] * n_lakes)
+        rows_date.extend([date_str] * n_lakes)
+        rows_lake.append(lake_ids)
+        rows_area.extend([pix_area_km2] * n_lakes)
+        rows_wsum.append(wsum)
+        rows_cum.append(cum)
+
+    return {
+        "frame_dates":    np.array(frame_dates, dtype=str),
+        "frame":          np.array(rows_frame, dtype=np.int64),
+        "date":           np.array(rows_date, dtype=str),
+        "lake_id":        np.concatenate(rows_lake) if rows_lake else np.zeros(0, dtype=np.int64),
+        "pixel_area_km2": np.array(rows_area, dtype=float),
+        "weighted_sum":   np.concatenate(rows_wsum) if rows_wsum else np.zeros(0),
+        "edges":          edges,
+        "cum_counts":     np.vstack(rows_cum) if rows_cum else np.zeros((0, n_bins + 1), dtype=np.int64),
+        "lower_thresh":   np.array(float(lower_thresh)),
+    }
+
+
+def save_likelihood_histograms(hist, path):
+    """Write a histogram store from compute_likelihood_histograms to a compressed .npz."""
+    np.savez_compressed(path, **hist)
+
+
+def load_likelihood_histograms(path):
+    """Load a histogram store written by save_likelihood_histograms."""
+    with np.load(path) as npz:
+        return {k: npz[k] for k in npz.files}
+
+
+def area_at_threshold(hist, thresh):
+    """
+    Area (km2) with likelihood >= thresh for every (frame, lake) row of a histogram store.
+
+    Thresholds on the bin grid are exact; other thresholds are interpolated
+    linearly between the neighbouring bin edges. Thresholds below the
+    clustering threshold saturate at the full cluster area.
+    """
+    edges = hist["edges"]
+    cum = hist["cum_counts"]
+    if thresh > edges[-1]:
+        counts = np.zeros(len(cum))
+    else:
+        k = int(np.searchsorted(edges, thresh, side="left"))
+        if k == 0 or edges[k] == thresh:
+            counts = cum[:, k].astype(float)
+        else:
+            frac = (thresh - edges[k - 1]) / (edges[k] - edges[k - 1])
+            counts = (1 - frac) * cum[:, k - 1] + frac * cum[:, k]
+    return counts * hist["pixel_area_km2"]
+
 
-        # Area at three levels, summed across all clusters
-        lower_area = float((cluster_vals >= lower_thresh).sum()) * pix_area_km2
-        mean_area  = float(cluster_vals.sum()) * pix_area_km2  # likelihood-weighted
-        upper_area = float((cluster_vals >= upper_thresh).sum()) * pix_area_km2
-
-        n_clusters = len(set(labels[cluster_mask]))
-        print(f"  {n_clusters} cluster(s) - lower: {lower_area:.4f} km2, "
-              f"mid: {mean_area:.4f} km2, upper: {upper_area:.4f} km2", flush=True)
-
-        dates.append(date_str)
-        areas_mean.append(mean_area)
-        areas_lower.append(lower_area)
-        areas_upper.append(upper_area)
-
-    return pd.DataFrame({
-        "date": dates,
-        "mean_area_km2": areas_mean,
-        "lower_area_km2": areas_lower,
-        "upper_area_km2": areas_upper,
+def areas_from_histograms(hist, lower=0.1, upper=0.9, per_lake=False):
+    """
+    Derive lake area metrics at arbitrary likelihood thresholds from a histogram store.
+
+    Parameters
+    ----------
+    hist     : dict  — histogram store (compute_likelihood_histograms / load_likelihood_histograms)
+    lower    : float — likelihood threshold of lower_area_km2
+    upper    : float — likelihood threshold of upper_area_km2
+    per_lake : bool  — long per-lake table instead of one AOI-wide row per frame
+
+    Returns
+    -------
+    pd.DataFrame with columns date, [lake_id,] mean_area_km2, lower_area_km2, upper_area_km2.
+    The AOI-wide table has a row for every frame (zero area for frames without clusters);
+    frames acquired on the same day are separate rows with the same date.
+    """
+    long_df = pd.DataFrame({
+        "date":           hist["date"],
+        "lake_id":        hist["lake_id"].astype(np.int64),
+        "lower_area_km2": area_at_threshold(hist, lower),
+        "mean_area_km2":  hist["weighted_sum"] * hist["pixel_area_km2"],  # likelihood-weighted
+        "upper_area_km2": area_at_threshold(hist, upper),
     })
+    if per_lake:
+        return long_df
+
+    cols = ["mean_area_km2", "lower_area_km2", "upper_area_km2"]
+    frame_dates = list(hist["frame_dates"])
+    if "frame" in hist:
+        # One row per frame: two acquisitions on the same day stay two rows
+        totals = long_df[cols].groupby(hist["frame"]).sum()
+        totals = totals.reindex(range(len(frame_dates)), fill_value=0.0)
+        totals.insert(0, "date", frame_dates)
+        return totals.reset_index(drop=True)
+    # Stores written before rows carried their frame index: one row per date
+    totals = long_df.groupby("date", sort=False)[cols].sum()
+    totals = totals.reindex(list(dict.fromkeys(frame_dates)), fill_value=0.0)
+    return totals.rename_axis("date").reset_index()
+
+
+def extract_lake_area_timeseries(out_dir, seed_dir=None, thresholds=(0.1, 0.5, 0.9),
+                                 min_size_cluster=20, pix=6):
+    """
+    Compute per-lake area time series from locally downloaded lake_likelihood TIFs.
+
+    Clusters of every frame are matched to persistent lake IDs seeded from the
+    lakedetection detected_clusters_*.geojson (see LakeRegistry); clusters that
+    match no seed become new lakes. Areas are computed as in
+    extract_cluster_area_timeseries, but reduced per lake.
+
+    Parameters
+    ----------
+    out_dir          : str   — directory containing *lake_likelihood*.tif files
+    seed_dir         : str   — directory searched for detected_clusters_*.geojson
+                               (default: parent of out_dir, i.e. the Outputs folder)
+    thresholds       : tuple — (lower, mid, upper) likelihood thresholds
+    min_size_cluster : int   — DBSCAN min_samples
+    pix              : int   — DBSCAN eps (pixels)
+
+    Returns
+    -------
+    pd.DataFrame (long format) with columns:
+        date, lake_id, mean_area_km2, lower_area_km2, upper_area_km2
+    """
+    lower_thresh, _, upper_thresh = thresholds
+    if seed_dir is None:
+        seed_dir = os.path.dirname(os.path.abspath(out_dir))
+    hist = compute_likelihood_histograms(out_dir, lower_thresh, min_size_cluster, pix,
+                                         seeds=load_lake_seeds(seed_dir))
+    return areas_from_histograms(hist, lower_thresh, upper_thresh, per_lake=True)
+
+
+def extract_cluster_area_timeseries(out_dir, thresholds=(0.1, 0.5, 0.9),
+                                     min_size_cluster=20, pix=6):
+    """
+    Compute lake area time series from locally downloaded lake_likelihood TIFs.
+
+    For each frame, DBSCAN is run at the lower threshold to identify lake clusters.
+    Area is then computed at three likelihood levels:
+      lower_area_km2 — pixels within clusters where likelihood >= lower threshold
+      mean_area_km2  — likelihood-weighted area within clusters (sum × pixel area)
+      upper_area_km2 — pixels within clusters where likelihood >= upper threshold
+
+    This is the AOI-wide sum over all lakes; see extract_lake_area_timeseries
+    for the per-lake table and compute_likelihood_histograms for other thresholds.
+
+    Parameters
+    ----------
+    out_dir          : str   — directory containing *lake_likelihood*.tif files
+    thresholds       : tuple — (lower, mid, upper) likelihood thresholds
+    min_size_cluster : int   — DBSCAN min_samples
+    pix              : int   — DBSCAN eps (pixels)
+
+    Returns
+    -------
+    pd.DataFrame with columns: date, mean_area_km2, lower_area_km2, upper_area_km2
+    """
+    lower_thresh, _, upper_thresh = thresholds
+    hist = compute_likelihood_histograms(out_dir, lower_thresh, min_size_cluster, pix)
+    return areas_from_histograms(hist, lower_thresh, upper_thresh)
 
 
 
@@ -297,6 +726,7 @@ def generate_lake_metrics_report(
     csv_filename=None,
     png_filename=None,
     thresholds=(0.1, 0.5, 0.9),
+    seed_dir=None,
 ):
     """
     Compute cluster-based lake area metrics from downloaded likelihood TIFs,
@@ -305,10 +735,13 @@ def generate_lake_metrics_report(
     Parameters
     ----------
     output_dir      : str   — directory containing downloaded *lake_likelihood*.tif files
-    gif_output_path : str   — path for the GIF (default: output_dir/lake_monitoring.gif)
+    gif_output_path : str   — path for the animation (default: output_dir/lake_monitoring.gif);
+                              a .webp, .png or .mp4 extension selects that format
     csv_filename    : str   — output CSV path (default: output_dir/lake_metrics.csv)
     png_filename    : str   — output plot path (default: output_dir/lake_metrics_plot.png)
     thresholds      : tuple — (lower, mid, upper) likelihood thresholds
+    seed_dir        : str   — directory with detected_clusters_*.geojson used to seed
+                              lake IDs (default: parent of output_dir)
     """
     os.makedirs(output_dir, exist_ok=True)
     if csv_filename is None:
@@ -317,11 +750,22 @@ def generate_lake_metrics_report(
         png_filename = os.path.join(output_dir, "lake_metrics_plot.png")
     if gif_output_path is None:
         gif_output_path = os.path.join(output_dir, "lake_monitoring.gif")
+    if seed_dir is None:
+        seed_dir = os.path.dirname(os.path.abspath(output_dir))
 
-    # 1. Compute cluster-based area time series from local TIFs
+    # 1. Reduce local TIFs once into per-lake likelihood histograms, derive areas
     print("Computing cluster-based lake metrics...", flush=True)
-    metrics_df = extract_cluster_area_timeseries(output_dir, thresholds=thresholds)
-
+    lower_thresh, _, upper_thresh = thresholds
+    seeds = load_lake_seeds(seed_dir)
+    print(f"Seeded {len(seeds)} lake ID(s) from lake detection clusters.", flush=True)
+    hist = compute_likelihood_histograms(output_dir, lower_thresh, seeds=seeds)
+    save_likelihood_histograms(hist, os.path.join(output_dir, HIST_FILENAME))
+    metrics_df = areas_from_histograms(hist, lower_thresh, upper_thresh)
+    lakes_df = areas_from_histograms(hist, lower_thresh, upper_thresh, per_lake=True)
+
+    per_lake_csv = os.path.join(os.path.dirname(csv_filename), "lake_metrics_per_lake.csv")
+    lakes_df.to_csv(per_lake_csv, index=False)
+    print(f"Saved per-lake metrics to {per_lake_csv}", flush=True)
 
     # 2. Save CSV and plot
     save_lake_metrics_plot_and_csv(
@@ -330,6 +774,13 @@ def generate_lake_metrics_report(
         output_png=png_filename,
     )
 
+    # 3. Pre-render the frame cache shared with the dashboard viewer and HTML report
+    try:
+        n_rendered = build_frame_cache(output_dir)
+        print(f"Frame cache updated ({n_rendered} band image(s) rendered).", flush=True)
+    except Exception as e:
+        print(f"Warning: frame cache not written: {e}", flush=True)
+
     # 4. Build animated GIF
     build_lake_monitoring_gif(
         out_dir=output_dir,
@@ -343,30 +794,7 @@ def generate_lake_metrics_report(
 # GIF BUILDER
 # ============================================================
 
-PANEL_LABELS = {
-    'VV_raw':          'Raw VV (dB)',
-    'VV_corrected':    'Corrected VV (dB)',
-    'lake_likelihood': 'Lake Likelihood',
-}
-
-
-def _read_masked(path):
-    """Read a single-band raster, replacing nodata and -9999 fill with nan."""
-    with rasterio.open(path) as src:
-        data = src.read(1).astype(float)
-        nodata = src.nodata
-    if nodata is not None:
-        data[data == nodata] = np.nan
-    data[data <= -9999] = np.nan
-    return data
-
-
-def _render_band(data, cmap, vmin, vmax, nan_fill):
-    """Normalise and colourise a band array into a PIL Image."""
-    norm = np.clip((data - vmin) / (vmax - vmin), 0, 1)
-    norm = np.where(np.isnan(norm), nan_fill, norm)
-    rgb = (cmap(norm)[:, :, :3] * 255).astype(np.uint8)
-    return Image.fromarray(rgb)
+PANEL_LABELS = {band: cfg["label"] for band, cfg in PANEL_CFG.items()}
 
 
 def _fit_height(im, target_h):
@@ -380,10 +808,15 @@ def build_lake_monitoring_gif(out_dir, dates, areas_km2,
                                target_size=(1800, 600),
                                gif_filename=None,
                                duration=600,
-                               font_path=None):
+                               font_path=None,
+                               fmt=None):
     """
     Build a lake monitoring GIF from exported TIF files.
     Panels: Raw VV | Corrected VV | Lake Likelihood, with date and area overlay.
+
+    Frames are streamed to disk as they are composed (see animation.AnimationWriter),
+    so memory does not grow with the number of dates. The output format follows
+    the gif_filename extension (.gif, .webp, .png/.apng, .mp4) unless fmt is given.
     """
     if gif_filename is None:
         gif_filename = os.path.join(out_dir, "lake_monitoring.gif")
@@ -405,8 +838,9 @@ def build_lake_monitoring_gif(out_dir, dates, areas_km2,
         font       = ImageFont.load_default()
         font_small = font
 
-    frames = []
+    writer = AnimationWriter(gif_filename, fmt=fmt, duration=duration, loop=0)
     count = len(dates)
+    panel_width = target_size[0] // 3
 
     for i, date in enumerate(dates):
         band_paths = date_band_files.get(date, {})
@@ -415,18 +849,15 @@ def build_lake_monitoring_gif(out_dir, dates, areas_km2,
             print(f"Missing {missing} for date {date}, skipping frame.", flush=True)
             continue
 
+        # Panels come from the shared frame cache (rendered once, reused by the dashboard)
         try:
-            vv_raw  = _read_masked(band_paths['VV_raw'])
-            vv_corr = _read_masked(band_paths['VV_corrected'])
-            lkl     = _read_masked(band_paths['lake_likelihood'])
+            im_raw  = cached_panel(out_dir, band_paths['VV_raw'],          'VV_raw',          panel_width)
+            im_corr = cached_panel(out_dir, band_paths['VV_corrected'],    'VV_corrected',    panel_width)
+            im_lkl  = cached_panel(out_dir, band_paths['lake_likelihood'], 'lake_likelihood', panel_width)
         except Exception as e:
             print(f"Warning: skipping frame {date} — cannot read file: {e}", flush=True)
             continue
 
-        im_raw  = _render_band(vv_raw,  plt.cm.gray,   vmin=-25, vmax=0, nan_fill=0.5)
-        im_corr = _render_band(vv_corr, plt.cm.gray,   vmin=-25, vmax=0, nan_fill=0.5)
-        im_lkl  = _render_band(lkl,    plt.cm.viridis, vmin=0,   vmax=1, nan_fill=0.0)
-
         target_h = max(im_raw.height, im_corr.height, im_lkl.height)
         im_raw   = _fit_height(im_raw,  target_h)
         im_corr  = _fit_height(im_corr, target_h)
@@ -460,18 +891,10 @@ def build_lake_monitoring_gif(out_dir, dates, areas_km2,
         draw.text((10, y), area_text, font=font, fill='white',
                   stroke_width=2, stroke_fill='black')
 
-        frames.append(combined)
+        writer.append(combined)
         print(f"  Frame {i+1}/{count}: {date}", flush=True)
 
-    if frames:
-        frames[0].save(
-            gif_filename,
-            save_all=True,
-            append_images=frames[1:],
-            duration=duration,
-            loop=0,
-            optimize=True,
-        )
-        print(f"GIF saved to: {gif_filename}", flush=True)
+    if writer.close():
+        print(f"Animation saved to: {gif_filename}", flush=True)
     else:
         print("No frames generated. Check TIF files and dates.", flush=True)
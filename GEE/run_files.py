@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+THAW - Run log sidecar files
+
+Naming and writing of the small files that sit next to a pipeline run log,
+shared by the pipeline Logger (drive_io.py) and the dashboard
+(Dashboard/log_tail.py). Standard library only, so the dashboard can import
+it without Earth Engine or Drive dependencies.
+
+    pipeline_log_X.txt  →  pipeline_log_X_status.json   (status_path_for)
+                        →  pipeline_log_X_events.jsonl  (events_path_for)
+"""
+
+import os
+import json
+import datetime
+
+
+def status_path_for(log_path):
+    """Sidecar status file of a run log: pipeline_log_X.txt → pipeline_log_X_status.json."""
+    return os.path.splitext(log_path)[0] + "_status.json"
+
+
+def write_status_file(log_path, status, message="", pid=None):
+    """
+    Write the sidecar status of a run log atomically.
+
+    The dashboard reads this small file instead of scanning the whole log for
+    the PIPELINE_SUCCESS / PIPELINE_ERROR markers.
+
+    Parameters
+    ----------
+    log_path : str
+        Path of the run log the status belongs to.
+    status : str
+        'running', 'success' or 'failed'.
+    message : str
+        Final marker line or short note.
+    pid : int or None
+        Process id of the running pipeline; None when written by another
+        process, e.g. the dashboard cancelling a run.
+    """
+    path = status_path_for(log_path)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({
+            "status": status,
+            "message": message,
+            "pid": pid,
+            "updated": datetime.datetime.now().isoformat(timespec="seconds"),
+        }, f)
+    os.replace(tmp, path)
+
+
+def events_path_for(log_path):
+    """Event file of a run log: pipeline_log_X.txt → pipeline_log_X_events.jsonl."""
+    return os.path.splitext(log_path)[0] + "_events.jsonl"
@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+"""
+THAW - Local Sentinel-1 scene index
+
+SQLite index of the COPERNICUS/S1_GRD scenes (IW mode, VV polarisation)
+over each AOI, so scene counts, dates, orbit passes and footprints are
+answered locally instead of with a GEE query on every run.
+
+The index lives at <output_root>/scene_index.sqlite (WAL mode):
+
+    aois    — one row per AOI key: polygon, covered time range, last refresh
+    scenes  — system:index, acquisition time, orbit pass, relative orbit,
+              platform, footprint (GeoJSON) and incidence angle min/mean/max
+              over the AOI, per AOI key
+
+refresh() extends the covered range of an AOI: only scenes after the last
+refresh (minus LAG_DAYS, since scenes are ingested into Earth Engine a few
+days after acquisition) or before the first covered date are fetched.
+
+Scene metadata comes from a source object with a fetch(aoi_coords, start,
+end) method: EarthEngineSceneSource queries Earth Engine (one request per
+FETCH_DAYS chunk); StaticSceneSource serves a fixed list of scenes and is
+the offline stand-in used for testing without Earth Engine.
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import datetime
+from contextlib import closing
+
+from shapely.geometry import shape
+
+SCENE_INDEX_FILE = "scene_index.sqlite"
+LAG_DAYS = 7             # re-fetch this many days before the last refresh (late ingestion)
+DEFAULT_HISTORY_DAYS = 120
+FETCH_DAYS = 180         # days per Earth Engine request (stays well below 5000 scenes)
+ANGLE_SCALE = 1000       # m; the angle band is a smooth ramp
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS aois (
+    aoi          TEXT PRIMARY KEY,
+    coordinates  TEXT NOT NULL,
+    covered_from TEXT NOT NULL,
+    covered_to   TEXT NOT NULL,
+    refreshed    TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scenes (
+    aoi            TEXT NOT NULL,
+    id             TEXT NOT NULL,
+    time_ms        INTEGER NOT NULL,
+    date           TEXT NOT NULL,
+    orbit_pass     TEXT NOT NULL,
+    relative_orbit INTEGER,
+    platform       TEXT,
+    footprint      TEXT,
+    angle_min      REAL,
+    angle_mean     REAL,
+    angle_max      REAL,
+    PRIMARY KEY (aoi, id)
+);
+CREATE INDEX IF NOT EXISTS scenes_by_time ON scenes (aoi, orbit_pass, time_ms);
+"""
+
+
+# ============================================================
+# SCENE SOURCES
+# ============================================================
+
+def _ms(when):
+    return int(when.replace(tzinfo=datetime.timezone.utc).timestamp() * 1000)
+
+
+class EarthEngineSceneSource:
+    """Scene metadata from COPERNICUS/S1_GRD; Earth Engine must be initialised."""
+
+    def fetch(self, aoi_coords, start, end):
+        """
+        Scenes acquired in [start, end) that intersect the AOI polygon.
+
+        Returns a list of scene dicts (see StaticSceneSource), one request
+        per FETCH_DAYS of the range.
+        """
+        import ee
+
+        aoi = ee.Geometry.Polygon(aoi_coords)
+        s1 = ee.ImageCollection('COPERNICUS/S1_GRD') \
+            .filterBounds(aoi) \
+            .filter(ee.Filter.listContains('transmitterReceiverPolarisation', 'VV')) \
+            .filter(ee.Filter.eq('instrumentMode', 'IW'))
+
+        def describe(image):
+            angle = image.select('angle').reduceRegion(
+                reducer=ee.Reducer.minMax().combine(ee.Reducer.mean(), sharedInputs=True),
+                geometry=aoi,
+                scale=ANGLE_SCALE,
+                maxPixels=1e9,
+            )
+            return ee.Feature(image.geometry(), {
+                'id': image.get('system:index'),
+                'time_ms': image.get('system:time_start'),
+                'orbit_pass': image.get('orbitProperties_pass'),
+                'relative_orbit': image.get('relativeOrbitNumber_start'),
+                'platform': image.get('platform_number'),
+                'angle_min': angle.get('angle_min'),
+                'angle_mean': angle.get('angle_mean'),
+                'angle_max': angle.get('angle_max'),
+            })
+
+        scenes = []
+        chunk_start = start
+        while chunk_start < end:
+            chunk_end = min(chunk_start + datetime.timedelta(days=FETCH_DAYS), end)
+            features = ee.FeatureCollection(
+                s1.filterDate(chunk_start, chunk_end).map(describe)).getInfo()["features"]
+            for f in features:
+                scene = dict(f["properties"])
+                scene["footprint"] = f.get("geometry")
+                scenes.append(scene)
+            chunk_start = chunk_end
+        return scenes
+
+
+class StaticSceneSource:
+    """
+    Fixed list of scenes with the EarthEngineSceneSource interface.
+
+    Offline stand-in for Earth Engine (tests, demos, replaying a saved
+    scene list). Each scene is a dict with keys id, time_ms, orbit_pass,
+    relative_orbit, platform, footprint (GeoJSON geometry or None) and
+    angle_min / angle_mean / angle_max.
+    """
+
+    def __init__(self, scenes):
+        self.scenes = list(scenes)
+        self.calls = []
+
+    def fetch(self, aoi_coords, start, end):
+        self.calls.append((start, end))
+        aoi = shape({"type": "Polygon", "coordinates": aoi_coords})
+        start_ms, end_ms = _ms(start), _ms(end)
+        return [s for s in self.scenes
+                if start_ms <= s["time_ms"] < end_ms
+                and (s.get("footprint") is None or shape(s["footprint"]).intersects(aoi))]
+
+
+# ============================================================
+# INDEX
+# ============================================================
+
+def connect(output_root):
+    """Open (and create if needed) the scene index of an Outputs root."""
+    os.makedirs(output_root, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(output_root, SCENE_INDEX_FILE), timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _store(conn, aoi_key, scenes):
+    conn.executemany(
+        "INSERT OR REPLACE INTO scenes (aoi, id, time_ms, date, orbit_pass, relative_orbit, "
+        "platform, footprint, angle_min, angle_mean, angle_max) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [(aoi_key, s["id"], int(s["time_ms"]),
+          datetime.datetime.fromtimestamp(s["time_ms"] / 1000, tz=datetime.timezone.utc).strftime("%Y-%m-%d"),
+          s["orbit_pass"], s.get("relative_orbit"), s.get("platform"),
+          json.dumps(s["footprint"]) if s.get("footprint") else None,
+          s.get("angle_min"), s.get("angle_mean"), s.get("angle_max"))
+         for s in scenes])
+
+
+def refresh(output_root, aoi_key, aoi_coords, source=None, until=None, start=None):
+    """
+    Bring the index of an AOI up to date.
+
+    Parameters
+    ----------
+    output_root : str
+        Folder holding scene_index.sqlite.
+    aoi_key : str
+        Stable AOI identifier (e.g. baseline.aoi_tag of the polygon).
+    aoi_coords : list
+        AOI polygon coordinates (GeoJSON).
+    source : object, optional
+        Scene source; defaults to EarthEngineSceneSource().
+    until : datetime.datetime, optional
+        End of the range to cover (default: now, UTC).
+    start : datetime.datetime, optional
+        Start of the range to cover (default: DEFAULT_HISTORY_DAYS before
+        until on the first refresh, otherwise the covered start).
+
+    Returns
+    -------
+    int
+        Number of scenes fetched.
+    """
+    source = source or EarthEngineSceneSource()
+    until = until or datetime.datetime.utcnow()
+    with closing(connect(output_root)) as conn:
+        row = conn.execute("SELECT covered_from, covered_to FROM aois WHERE aoi = ?",
+                           (aoi_key,)).fetchone()
+        ranges = []
+        if row is None:
+            covered_from = start or until - datetime.timedelta(days=DEFAULT_HISTORY_DAYS)
+            ranges.append((covered_from, until))
+            covered_to = until
+        else:
+            covered_from = datetime.datetime.fromisoformat(row[0])
+            covered_to = datetime.datetime.fromisoformat(row[1])
+            if start is not None and start < covered_from:
+                ranges.append((start, covered_from))
+                covered_from = start
+            if until > covered_to - datetime.timedelta(days=LAG_DAYS):
+                ranges.append((covered_to - datetime.timedelta(days=LAG_DAYS), until))
+                covered_to = max(covered_to, until)
+
+        fetched = 0
+        for range_start, range_end in ranges:
+            scenes = source.fetch(aoi_coords, range_start, range_end)
+            _store(conn, aoi_key, scenes)
+            fetched += len(scenes)
+
+        conn.execute(
+            "INSERT OR REPLACE INTO aois (aoi, coordinates, covered_from, covered_to, refreshed) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (aoi_key, json.dumps(aoi_coords), covered_from.isoformat(timespec="seconds"),
+             covered_to.isoformat(timespec="seconds"),
+             datetime.datetime.now().isoformat(timespec="seconds")))
+        conn.commit()
+    return fetched
+
+
+def covered_range(output_root, aoi_key):
+    """(covered_from, covered_to) datetimes of an AOI, or None if never refreshed."""
+    with closing(connect(output_root)) as conn:
+        row = conn.execute("SELECT covered_from, covered_to FROM aois WHERE aoi = ?",
+                           (aoi_key,)).fetchone()
+    if row is None:
+        return None
+    return datetime.datetime.fromisoformat(row[0]), datetime.datetime.fromisoformat(row[1])
+
+
+# ============================================================
+# QUERIES
+# ============================================================
+
+_COLUMNS = ("id", "time_ms", "date", "orbit_pass", "relative_orbit", "platform",
+            "footprint", "angle_min", "angle_mean", "angle_max")
+
+
+def scenes(output_root, aoi_key, start=None, end=None, orbit_pass=None):
+    """
+    Indexed scenes of an AOI acquired in [start, end), oldest first.
+
+    Returns a list of dicts with the index columns; footprint is parsed
+    back to a GeoJSON dict.
+    """
+    sql = f"SELECT {', '.join(_COLUMNS)} FROM scenes WHERE aoi = ?"
+    args = [aoi_key]
+    if start is not None:
+        sql += " AND time_ms >= ?"
+        args.append(_ms(start))
+    if end is not None:
+        sql += " AND time_ms < ?"
+        args.append(_ms(end))
+    if orbit_pass is not None:
+        sql += " AND orbit_pass = ?"
+        args.append(orbit_pass)
+    with closing(connect(output_root)) as conn:
+        rows = conn.execute(sql + " ORDER BY time_ms", args).fetchall()
+    out = []
+    for row in rows:
+        scene = dict(zip(_COLUMNS, row))
+        scene["footprint"] = json.loads(scene["footprint"]) if scene["footprint"] else None
+        out.append(scene)
+    return out
+
+
+def scene_ids(output_root, aoi_key, start, end, orbit_pass):
+    """Sorted system:index values of the scenes in [start, end) for one orbit pass."""
+    return sorted(s["id"] for s in scenes(output_root, aoi_key, start, end, orbit_pass))
+
+
+def coverage_fraction(scene, aoi_coords):
+    """Fraction of the AOI polygon covered by a scene footprint (1.0 if unknown)."""
+    if not scene.get("footprint"):
+        return 1.0
+    aoi = shape({"type": "Polygon", "coordinates": aoi_coords})
+    if aoi.area == 0:
+        return 1.0
+    return shape(scene["footprint"]).intersection(aoi).area / aoi.area
+
+
+def scenes_covering(output_root, aoi_key, aoi_coords, min_fraction=0.5, **filters):
+    """Indexed scenes covering at least min_fraction of the AOI (filters as in scenes())."""
+    return [s for s in scenes(output_root, aoi_key, **filters)
+            if coverage_fraction(s, aoi_coords) >= min_fraction]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python scene_index.py <output_root>")
+        sys.exit(1)
+    with closing(connect(sys.argv[1])) as conn:
+        for aoi, covered_from, covered_to, refreshed in conn.execute(
+                "SELECT aoi, covered_from, covered_to, refreshed FROM aois ORDER BY aoi"):
+            n = conn.execute("SELECT COUNT(*) FROM scenes WHERE aoi = ?", (aoi,)).fetchone()[0]
+            print(f"{aoi}: {n} scenes, {covered_from[:10]} to {covered_to[:10]} (refreshed {refreshed})")
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Shared pytest setup: the GEE modules are flat scripts, so the GEE folder is
+put on sys.path like the pipelines do with SCRIPT_DIR.
+
+Run from the repository root with: python -m pytest GEE/tests
+"""
+
+import os
+import sys
+
+GEE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if GEE_DIR not in sys.path:
+    sys.path.insert(0, GEE_DIR)
+
+
+import pytest
+
+
+@pytest.fixture
+def ee_session():
+    """
+    Initialised earthengine-api module; the test is skipped without credentials.
+
+    Uses the stored Earth Engine credentials (earthengine authenticate) or
+    GOOGLE_APPLICATION_CREDENTIALS, and the Cloud project in EE_PROJECT.
+    """
+    ee = pytest.importorskip("ee")
+    if not (os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
+            or os.path.exists(ee.oauth.get_credentials_path())):
+        pytest.skip("no Earth Engine credentials")
+    try:
+        ee.Initialize(project=os.environ.get("EE_PROJECT"))
+    except Exception as e:
+        pytest.skip(f"Earth Engine not available: {e}")
+    return ee
+
+
+@pytest.fixture
+def ee_offline():
+    """
+    earthengine-api initialised without credentials (graph_profile.initialize_offline):
+    graphs can be built and serialized, computing anything raises.
+    """
+    ee = pytest.importorskip("ee")
+    from graph_profile import initialize_offline
+    initialize_offline()
+    yield ee
+    ee.Reset()
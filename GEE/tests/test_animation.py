@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""Streaming GIF frames keep their own colours."""
+
+import numpy as np
+from PIL import Image, ImageSequence
+
+from animation import AnimationWriter
+from rendering import colormap_lut
+
+
+def _ramp(lut, width=256, height=24):
+    """Image showing every colour of a colormap table once per column."""
+    return Image.fromarray(np.repeat(lut[None, :256], height, axis=0))
+
+
+def _decoded_frames(path):
+    with Image.open(path) as gif:
+        return [np.asarray(f.convert("RGB"), dtype=int) for f in ImageSequence.Iterator(gif)]
+
+
+def test_gif_frames_keep_their_own_colours(tmp_path):
+    frames = [_ramp(colormap_lut("gray")), _ramp(colormap_lut("viridis")),
+              Image.new("RGB", (256, 24), (255, 107, 0))]
+    path = str(tmp_path / "animation.gif")
+    with AnimationWriter(path, duration=200) as writer:
+        for im in frames:
+            writer.append(im)
+
+    decoded = _decoded_frames(path)
+    assert len(decoded) == len(frames)
+    for original, frame in zip(frames, decoded):
+        # 256 distinct colours per frame fit a local palette exactly
+        assert np.abs(frame - np.asarray(original, dtype=int)).max() <= 2
+
+
+def test_gif_loops_and_sizes(tmp_path):
+    path = str(tmp_path / "animation.gif")
+    with AnimationWriter(path, duration=300, loop=0) as writer:
+        writer.append(Image.new("RGB", (40, 30), (10, 20, 30)))
+        writer.append(Image.new("RGB", (20, 10), (200, 20, 30)))   # pasted on the first frame's canvas
+    with Image.open(path) as gif:
+        assert gif.size == (40, 30) and gif.n_frames == 2
+        assert gif.info.get("loop") == 0 and gif.info.get("duration") == 300
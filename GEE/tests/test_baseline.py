@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+Running statistics of the baseline cache.
+
+The NumPy Welford update and merge are compared with np.nanmean / np.nanstd
+(population) on synthetic stacks with missing pixels. merge_stats is
+evaluated on NumPy stand-ins for ee.Image and compared with welford_merge.
+With Earth Engine credentials, the EE reducers and merge_stats are compared
+with ee.Reducer.mean().combine(stdDev) on synthetic collections as well.
+Concurrent updates of the cache index keep every entry.
+"""
+
+import os
+import datetime
+import warnings
+import threading
+
+import numpy as np
+import pytest
+
+from baseline import (welford_init, welford_update, welford_merge, welford_finalize,
+                      merge_stats, collection_stats, baseline_years, baseline_key,
+                      INDEX_FILE, _index_lock, _load_index, _save_index)
+
+SPLIT = 25
+
+
+@pytest.fixture
+def stack():
+    rng = np.random.default_rng(0)
+    data = rng.normal(-12.0, 3.0, size=(40, 16, 16))
+    data[rng.random(data.shape) < 0.2] = np.nan
+    data[:, 0, 0] = np.nan                      # pixel never observed
+    data[SPLIT:, 0, 1] = np.nan                 # observed in the first part only
+    data[:SPLIT, 0, 2] = np.nan                 # observed in the second part only
+    return data
+
+
+def _reference(stack):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)   # all-NaN pixel
+        return np.nanmean(stack, axis=0), np.nanstd(stack, axis=0)
+
+
+def _welford(scenes):
+    state = welford_init(scenes.shape[1:])
+    for scene in scenes:
+        welford_update(state, scene)
+    return state
+
+
+def test_welford_update_matches_nanmean_nanstd(stack):
+    mean, std = welford_finalize(_welford(stack))
+    ref_mean, ref_std = _reference(stack)
+    np.testing.assert_allclose(mean, ref_mean, rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(std, ref_std, rtol=1e-12, atol=1e-12)
+
+
+def test_welford_merge_matches_nanmean_nanstd(stack):
+    merged = welford_merge(_welford(stack[:SPLIT]), _welford(stack[SPLIT:]))
+    mean, std = welford_finalize(merged)
+    ref_mean, ref_std = _reference(stack)
+    np.testing.assert_allclose(mean, ref_mean, rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(std, ref_std, rtol=1e-12, atol=1e-12)
+
+
+# ------------------------------------------------------------
+# merge_stats on NumPy stand-ins for ee.Image
+# ------------------------------------------------------------
+
+class ArrayImage:
+    """
+    The ee.Image methods used by merge_stats, on NumPy arrays.
+
+    Bands are float arrays; NaN is a masked pixel. As in Earth Engine, the
+    result of a pixel-wise operation is masked wherever an input is masked.
+    """
+
+    def __init__(self, bands):
+        self.bands = dict(bands)
+
+    @staticmethod
+    def _values(other):
+        if isinstance(other, ArrayImage):
+            (values,) = other.bands.values()
+            return values
+        return other
+
+    def _unary(self, fn):
+        (name, values), = self.bands.items()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return ArrayImage({name: fn(values)})
+
+    def _binary(self, other, fn):
+        return self._unary(lambda v: fn(v, self._values(other)))
+
+    def select(self, name):
+        return ArrayImage({name: self.bands[name]})
+
+    def rename(self, name):
+        (values,) = self.bands.values()
+        return ArrayImage({name: values})
+
+    def unmask(self, value):
+        return self._unary(lambda v: np.where(np.isnan(v), value, v))
+
+    def add(self, other):
+        return self._binary(other, np.add)
+
+    def subtract(self, other):
+        return self._binary(other, np.subtract)
+
+    def multiply(self, other):
+        return self._binary(other, np.multiply)
+
+    def divide(self, other):
+        # Earth Engine masks the result of a division by zero
+        return self._binary(other, lambda a, b: np.where(b == 0, np.nan, a / np.where(b == 0, 1, b)))
+
+    def pow(self, exponent):
+        return self._binary(exponent, np.power)
+
+    def sqrt(self):
+        return self._unary(np.sqrt)
+
+    def gt(self, other):
+        return self._binary(other, lambda a, b: np.where(np.isnan(a), np.nan, (a > b).astype(float)))
+
+    def addBands(self, other):
+        return ArrayImage({**self.bands, **other.bands})
+
+    def updateMask(self, mask):
+        keep = self._values(mask)
+        return ArrayImage({k: np.where(keep > 0, v, np.nan) for k, v in self.bands.items()})
+
+
+def _as_image(state):
+    """Running statistics as collection_stats would return them (masked where count is 0)."""
+    observed = state["count"] > 0
+    return ArrayImage({
+        "VV_count": state["count"].astype(float),
+        "VV_mean": np.where(observed, state["mean"], np.nan),
+        "VV_M2": np.where(observed, state["M2"], np.nan),
+    })
+
+
+def test_merge_stats_matches_welford_merge(stack):
+    first, second = _welford(stack[:SPLIT]), _welford(stack[SPLIT:])
+    merged = merge_stats(_as_image(first), _as_image(second))
+    expected = welford_merge(first, second)
+    mean, std = welford_finalize(expected)
+    observed = expected["count"] > 0
+
+    np.testing.assert_allclose(merged.bands["VV_count"][observed], expected["count"][observed])
+    np.testing.assert_allclose(merged.bands["VV_mean"], mean, rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(merged.bands["VV_M2"][observed], expected["M2"][observed],
+                               rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(merged.bands["VV_stdDev"], std, rtol=1e-12, atol=1e-12)
+    assert all(np.isnan(band[0, 0]) for band in merged.bands.values())
+
+
+# ------------------------------------------------------------
+# Year range of a cache key
+# ------------------------------------------------------------
+
+def test_incomplete_current_year_is_excluded():
+    # Re-run of a past date in January: the March window of this year is still empty
+    now = datetime.datetime(2026, 1, 10)
+    ref = datetime.datetime(2024, 3, 1)
+    doy = ref.timetuple().tm_yday
+    years = baseline_years(ref, doy, 12, now)
+    assert years[-1] == 2025 and 2024 not in years
+
+    key_january, _ = baseline_key([[[86.0, 28.0], [86.1, 28.0], [86.1, 28.1]]], "ASCENDING",
+                                  doy, 12, ref, now)
+    key_april, _ = baseline_key([[[86.0, 28.0], [86.1, 28.0], [86.1, 28.1]]], "ASCENDING",
+                                doy, 12, ref, datetime.datetime(2026, 4, 1))
+    assert "_y2016-2025_" in key_january
+    assert "_y2016-2026_" in key_april
+    assert 2026 in baseline_years(ref, doy, 12, datetime.datetime(2026, 4, 1))
+
+
+def test_window_must_be_ingested_before_the_year_counts():
+    ref = datetime.datetime(2020, 6, 1)
+    doy = 150
+    # bin centre 148, window ends 9 June 2026, complete after the 7-day ingestion lag
+    assert 2026 not in baseline_years(ref, doy, 12, datetime.datetime(2026, 6, 14))
+    assert 2026 in baseline_years(ref, doy, 12, datetime.datetime(2026, 6, 16))
+
+
+# ------------------------------------------------------------
+# Earth Engine reducers (skipped without credentials)
+# ------------------------------------------------------------
+
+PIXELS = [(1, 1), (0, 1), (0, 2), (5, 7)]
+
+
+def test_concurrent_index_updates_keep_every_entry(tmp_path):
+    root = str(tmp_path)
+    barrier = threading.Barrier(8)
+
+    def submit(key):
+        barrier.wait()
+        with _index_lock(root):
+            index = _load_index(root)
+            index[key] = {"task_id": key}
+            _save_index(root, index)
+
+    threads = [threading.Thread(target=submit, args=(f"key{i}",)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(_load_index(root)) == [f"key{i}" for i in range(8)]
+    assert not [f for f in os.listdir(root) if f.endswith(".tmp")]
+    assert os.path.exists(os.path.join(root, INDEX_FILE))
+
+
+def test_ee_reducers_match_nanmean_nanstd(stack, ee_session):
+    ee = ee_session
+    point = ee.Geometry.Point([0, 0])
+
+    def to_collection(vals):
+        return ee.ImageCollection([
+            ee.Image.constant(float(v) if not np.isnan(v) else 0.0).rename("VV").toFloat()
+            .updateMask(0 if np.isnan(v) else 1)
+            for v in vals])
+
+    def sample(img):
+        return img.reduceRegion(ee.Reducer.first(), point, 10)
+
+    requests = {}
+    for r, c in PIXELS:
+        values = stack[:, r, c]
+        requests[f"direct_{r}_{c}"] = sample(to_collection(values).reduce(
+            ee.Reducer.mean().combine(reducer2=ee.Reducer.stdDev(), sharedInputs=True)))
+        requests[f"merged_{r}_{c}"] = sample(merge_stats(
+            collection_stats(to_collection(values[:SPLIT])),
+            collection_stats(to_collection(values[SPLIT:]))))
+    result = ee.Dictionary(requests).getInfo()
+
+    for r, c in PIXELS:
+        values = stack[:, r, c]
+        for name in ("direct", "merged"):
+            got = result[f"{name}_{r}_{c}"]
+            np.testing.assert_allclose(got["VV_mean"], np.nanmean(values), rtol=1e-5)
+            np.testing.assert_allclose(got["VV_stdDev"], np.nanstd(values), rtol=1e-5)
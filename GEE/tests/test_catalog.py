@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Catalog schema setup and the cluster history of reused runs."""
+
+import os
+import json
+import sqlite3
+from contextlib import closing
+
+import catalog
+
+
+def _count_migrations(monkeypatch):
+    calls = []
+    migrate = catalog._migrate
+    monkeypatch.setattr(catalog, "_migrate", lambda conn: (calls.append(1), migrate(conn)))
+    return calls
+
+
+def test_schema_is_set_up_once(tmp_path, monkeypatch):
+    calls = _count_migrations(monkeypatch)
+    for _ in range(5):
+        catalog.list_folders(str(tmp_path))
+    assert len(calls) == 1
+
+    # A new process sees a current user_version and skips the DDL as well
+    catalog._initialized.clear()
+    catalog.list_folders(str(tmp_path))
+    assert len(calls) == 1
+
+
+def test_deleted_catalog_is_recreated(tmp_path):
+    catalog.list_folders(str(tmp_path))
+    (tmp_path / catalog.CATALOG_FILE).unlink()
+    assert catalog.list_folders(str(tmp_path)) == []
+
+
+def test_old_catalog_is_migrated(tmp_path):
+    path = tmp_path / catalog.CATALOG_FILE
+    with closing(sqlite3.connect(path)) as conn:
+        conn.execute("CREATE TABLE folders (path TEXT PRIMARY KEY, folder_date TEXT NOT NULL, "
+                     "location TEXT NOT NULL DEFAULT '', updated REAL NOT NULL)")
+    catalog._initialized.discard(str(path))
+
+    with closing(catalog.connect(str(tmp_path))) as conn:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(folders)")}
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+    assert "aoi" in columns
+    assert version == catalog._USER_VERSION
+
+
+def _cluster_run(output_root, name, reused_from=None):
+    folder = os.path.join(output_root, name)
+    os.makedirs(folder)
+    polygon = {"type": "Polygon", "coordinates": [[[86.85, 27.95], [86.86, 27.95], [86.86, 27.96],
+                                                   [86.85, 27.96], [86.85, 27.95]]]}
+    with open(os.path.join(folder, "detected_clusters_run.geojson"), "w") as f:
+        json.dump({"type": "FeatureCollection", "features": [{
+            "type": "Feature", "geometry": polygon,
+            "properties": {"cluster_id": 1, "pixel_count": 12, "area_m2": 1200.0}}]}, f)
+    if reused_from:
+        with open(os.path.join(folder, catalog.FINGERPRINT_FILE), "w") as f:
+            json.dump({"reused_from": reused_from, "complete": True}, f)
+    catalog.register_folder(output_root, folder)
+    return polygon
+
+
+def test_reused_runs_do_not_add_flags(tmp_path):
+    root = str(tmp_path)
+    polygon = _cluster_run(root, "Outputs_2025-07-09_Khumbu")
+    _cluster_run(root, "Outputs_2025-07-10_Khumbu", reused_from="Outputs_2025-07-09_Khumbu")
+    _cluster_run(root, "Outputs_2025-07-16_Khumbu")
+
+    history, = catalog.cluster_history(root, [polygon])
+    assert history["times_flagged"] == 2
+    assert [d for d, _ in history["areas"]] == ["2025-07-09", "2025-07-16"]
+    # The reused run is still catalogued for the Output page
+    assert [os.path.basename(p) for p, _, _ in catalog.list_folders(root)] == [
+        "Outputs_2025-07-16_Khumbu", "Outputs_2025-07-10_Khumbu", "Outputs_2025-07-09_Khumbu"]
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+gee_core graph construction: built and serialized offline, and evaluated
+against Earth Engine where credentials are available.
+"""
+
+import datetime
+from collections import Counter
+
+import pytest
+
+ee = pytest.importorskip("ee")
+
+import gee_core  # noqa: E402
+
+
+def _functions(obj):
+    """Function names invoked by the serialized graph of obj, with counts."""
+    names = Counter()
+    stack = [ee.serializer.encode(obj, for_cloud_api=True)]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            if isinstance(item.get("functionName"), str):
+                names[item["functionName"]] += 1
+            stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(item)
+    return names
+
+
+# ============================================================
+# MEAN ANGLE PER RELATIVE ORBIT
+# ============================================================
+
+def _orbit_collection(ee):
+    """Two slices of orbit 12 (30 and 40 deg) splitting the AOI, one scene of orbit 99.0 (45 deg)."""
+    west = ee.Geometry.Rectangle([0, 0, 0.5, 1])
+    east = ee.Geometry.Rectangle([0.5, 0, 1, 1])
+    full = ee.Geometry.Rectangle([0, 0, 1, 1])
+
+    def scene(angle, geometry, orbit):
+        return ee.Image.constant(angle).rename('angle').toFloat().clip(geometry) \
+            .set('relativeOrbitNumber_start', orbit)
+
+    collection = ee.ImageCollection([
+        scene(30, west, 12), scene(40, east, 12), scene(45, full, 99.0)])
+    return collection, full
+
+
+def test_orbit_key_formats_an_integer(ee_offline):
+    functions = _functions(gee_core.orbit_key(ee_offline.Number(12.0)))
+    assert functions["Number.toInt"] == 1
+    assert functions["Number.format"] == 1
+    assert '"pattern": {"constantValue": "%d"}' in gee_core.orbit_key(12).serialize(for_cloud_api=True)
+
+
+def test_mean_angle_reduces_each_orbit_mosaic(ee_offline):
+    collection, aoi = _orbit_collection(ee_offline)
+    annotated = gee_core.annotate_collection_with_mean_angle(collection, aoi)
+    functions = _functions(annotated)
+    assert "ImageCollection.mosaic" in functions
+    assert "Collection.first" not in functions
+    # keys and lookups go through the same orbit_key: one format for each
+    assert functions["Number.format"] == 2
+
+
+def test_orbit_key_values(ee_session):
+    ee = ee_session
+    assert ee.List([gee_core.orbit_key(12), gee_core.orbit_key(12.0),
+                    gee_core.orbit_key(175)]).getInfo() == ["12", "12", "175"]
+
+
+def test_mean_angle_covers_partial_slices(ee_session):
+    ee = ee_session
+    collection, aoi = _orbit_collection(ee)
+    annotated = gee_core.annotate_collection_with_mean_angle(collection, aoi, scale=1000)
+    angles = annotated.aggregate_array('mean_angle').getInfo()
+    assert angles[0] == pytest.approx(35, abs=0.5)
+    assert angles[1] == pytest.approx(35, abs=0.5)
+    assert angles[2] == pytest.approx(45, abs=1e-6)
+
+
+# ============================================================
+# HISTORICAL COLLECTION
+# ============================================================
+
+def _day(scene, field):
+    date = scene["date"]
+    return date.timetuple().tm_yday if field == "day_of_year" else date.year
+
+
+FILTERS = {
+    "Filter.equals": lambda scene, leftField, rightValue: scene[leftField] == rightValue,
+    "Filter.calendarRange": lambda scene, field, start, end: start <= _day(scene, field) <= end,
+    "Filter.and": lambda scene, filters: all(f(scene) for f in filters),
+    "Filter.or": lambda scene, filters: any(f(scene) for f in filters),
+}
+
+
+def _select(collection, scenes):
+    """Scenes kept by a serialized chain of Collection.filter calls over ImageCollection.load."""
+    encoded = ee.serializer.encode(collection, for_cloud_api=True)
+    values = encoded["values"]
+
+    def value(node):
+        if "constantValue" in node:
+            return node["constantValue"]
+        if "valueReference" in node:
+            return value(values[node["valueReference"]])
+        if "arrayValue" in node:
+            return [value(v) for v in node["arrayValue"]["values"]]
+        call = node["functionInvocationValue"]
+        name, args = call["functionName"], {k: value(v) for k, v in call["arguments"].items()}
+        if name == "ImageCollection.load":
+            return scenes
+        if name == "Collection.filter":
+            return [scene for scene in args["collection"] if args["filter"](scene)]
+        return lambda scene: FILTERS[name](scene, **args)
+
+    return value(values[encoded["result"]])
+
+
+def _expected(scenes, orbit_pass, doy, window, years):
+    """Scenes within [target - window, target + window) of the target day of each year."""
+    selected = []
+    for scene in scenes:
+        for y in years:
+            target = datetime.datetime(y, 1, 1) + datetime.timedelta(days=doy - 1)
+            if (scene["orbitProperties_pass"] == orbit_pass
+                    and target - datetime.timedelta(days=window) <= scene["date"]
+                    < target + datetime.timedelta(days=window)):
+                selected.append(scene)
+                break
+    return selected
+
+
+# Target years whose wrapped neighbour year is not a leap year: there the
+# day-of-year ranges and the date windows agree to the day.
+@pytest.mark.parametrize("doy, years", [
+    (180, [2016, 2017, 2019, 2020, 2023]),
+    (5, [2019, 2020, 2022, 2023]),       # window starts in December of the previous year
+    (360, [2017, 2018, 2021, 2023]),     # window ends in January of the following year
+])
+def test_historical_collection_day_of_year_and_year_wrap(ee_offline, doy, years):
+    start = datetime.datetime(2015, 1, 1)
+    scenes = [{"date": start + datetime.timedelta(days=i),
+               "orbitProperties_pass": ("ASCENDING", "DESCENDING")[i % 2]}
+              for i in range(11 * 366)]
+    collection = gee_core.get_historical_collection(
+        ee_offline.ImageCollection("COPERNICUS/S1_GRD"), "ASCENDING", doy, 12,
+        datetime.datetime(2024, 1, 1), years=years)
+    selected = _select(collection, scenes)
+    assert selected == _expected(scenes, "ASCENDING", doy, 12, years)
+    assert {scene["date"].year for scene in selected} >= set(years)
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""Expression-graph sizes of both pipelines against the committed graph_budget.json."""
+
+import os
+
+import pytest
+
+import graph_profile
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+@pytest.mark.parametrize("config", ["graph_lakedetection.json", "graph_tracking.json"])
+def test_pipeline_graphs_within_budget(ee_offline, config):
+    cfg = graph_profile.load_config(os.path.join(DATA_DIR, config))
+    pipeline, profiles = graph_profile.profile_pipeline(cfg)
+    assert graph_profile.check_budget(pipeline, profiles, graph_profile.load_budget()) == []
+
+
+def test_offline_session_computes_nothing(ee_offline):
+    with pytest.raises(RuntimeError):
+        ee_offline.Number(1).add(1).getInfo()
+
+
+def test_check_budget_reports_growth():
+    profiles = {"z_score": {"unique_nodes": 10, "expanded_nodes": 120}}
+    budget = {"lakedetection": {"z_score": {"unique_nodes": 10, "expanded_nodes": 100}}}
+    assert graph_profile.check_budget("lakedetection", profiles, budget) == [
+        "lakedetection/z_score: expanded_nodes 120 > budget 100"]
+    assert graph_profile.check_budget("tracking", profiles, budget)
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""
+Offline radar geometry engine: look direction shared with gee_core, analytic
+planes, block-size independence and a regression scene.
+
+tests/data/offline_scene holds a small VV / incidence angle / DEM scene on a
+UTM 45N grid (Khumbu) with the VV_corrected and valid_mask bands of the
+tracking preprocessing as computed by offline_core itself (*_regression.tif).
+They catch changes in the offline results, not differences from Earth
+Engine. GEE parity is still open: it is checked once the same bands exported
+from Earth Engine for these inputs are added as *_gee.tif.
+Regenerate the scene from the GEE folder with: python -m tests.test_offline_core
+"""
+
+import os
+import ast
+import math
+
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import Affine
+
+import gee_core
+from offline_core import (angle_aspect, terrain_stack, radar_geometry, focal_median,
+                          process_scene, compare, disc_offsets, _shifted,
+                          DEFAULT_TOLERANCE, FOCAL_RADIUS)
+
+SCENE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "offline_scene")
+SCENE_PASS = "ASCENDING"
+SCENE_BANDS = ("VV_corrected", "valid_mask")
+LATITUDES = (-65.0, -20.0, 0.0, 28.0, 46.5, 70.0, 85.0)
+
+RES, LAT = 10.0, 28.0
+INTERIOR = (slice(5, -5), slice(5, -5))
+
+
+def _run_expression(expression, vars):
+    """Number.expression with Python math, after checking every function is an ee.Number algorithm."""
+    import ee
+    functions = set()
+    for node in ast.walk(ast.parse(expression, mode="eval")):
+        if isinstance(node, ast.Call):
+            functions.add(node.func.id)
+        elif isinstance(node, ast.Name) and node.id not in vars:
+            functions.add(node.id)
+    signatures = ee.ApiFunction.allSignatures()
+    assert all(f"Number.{name}" in signatures for name in functions), functions
+    names = {name: getattr(math, name) for name in functions}
+    return eval(expression, {"__builtins__": {}}, {**names, **vars})
+
+
+GRAPH_FUNCTIONS = {
+    "Number.expression": _run_expression,
+    "Number.add": lambda left, right: left + right,
+    "Number.multiply": lambda left, right: left * right,
+    "Number.max": lambda left, right: max(left, right),
+    "Number.min": lambda left, right: min(left, right),
+    "Dictionary.get": lambda dictionary, key: dictionary[key],
+}
+
+
+def _evaluate_graph(obj):
+    """Evaluate a small serialized Earth Engine graph made of GRAPH_FUNCTIONS."""
+    import ee
+    encoded = ee.serializer.encode(obj, for_cloud_api=True)
+    values = encoded["values"]
+
+    def value(node):
+        if "constantValue" in node:
+            return node["constantValue"]
+        if "valueReference" in node:
+            return value(values[node["valueReference"]])
+        if "dictionaryValue" in node:
+            return {k: value(v) for k, v in node["dictionaryValue"]["values"].items()}
+        call = node["functionInvocationValue"]
+        args = {k: value(v) for k, v in call["arguments"].items()}
+        return GRAPH_FUNCTIONS[call["functionName"]](**args)
+
+    return value(values[encoded["result"]])
+
+
+def _plane(shape, res, slope_deg, aspect_deg):
+    """DEM of a plane with the given slope and downslope aspect."""
+    rows, cols = np.indices(shape, dtype=np.float64)
+    east, north = cols * res, -rows * res
+    g = math.tan(math.radians(slope_deg))
+    a = math.radians(aspect_deg)
+    return 1000.0 - g * (east * math.sin(a) + north * math.cos(a))
+
+
+def _write_raster(path, array, res=RES):
+    profile = {"driver": "GTiff", "count": 1, "dtype": "float32", "nodata": np.nan,
+               "width": array.shape[1], "height": array.shape[0], "crs": "EPSG:32645",
+               "transform": Affine(res, 0, 490000.0, 0, -res, 3095000.0), "compress": "deflate"}
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(array.astype(np.float32), 1)
+
+
+def _scene_arrays(seed=0, size=(48, 56)):
+    """Flat lake basin in the west, steep ridges both ways in the east, some missing VV."""
+    rng = np.random.default_rng(seed)
+    rows, cols = np.indices(size, dtype=np.float64)
+    ridges = 120 * np.sin(rows / 5.0) * np.clip(cols - 24, 0, None) / 10 + 6 * np.clip(cols - 24, 0, None) ** 1.3
+    dem = 5000 + ridges + rng.normal(0, 0.2, size)
+    vv = rng.normal(-14, 4, size)
+    vv[rng.random(size) < 0.02] = np.nan
+    angle = 30 + 15 * cols / size[1]
+    return {"vv": vv, "angle": angle, "dem": dem}
+
+
+def _scene_inputs():
+    return [os.path.join(SCENE_DIR, f"{name}.tif") for name in ("vv", "angle", "dem")]
+
+
+# ============================================================
+# LOOK DIRECTION
+# ============================================================
+
+@pytest.mark.parametrize("orbit_pass", ["ASCENDING", "DESCENDING"])
+@pytest.mark.parametrize("lat", LATITUDES)
+def test_earth_engine_graph_matches_numpy(ee_offline, orbit_pass, lat):
+    graph = gee_core.angle_aspect(ee_offline.Number(lat), ee_offline.String(orbit_pass))
+    expected = angle_aspect(lat, orbit_pass)
+    assert _evaluate_graph(graph) == pytest.approx(expected, abs=1e-12)
+
+
+def test_look_direction_varies_with_latitude():
+    def aspect_deg(lat, orbit_pass):
+        return math.degrees(angle_aspect(lat, orbit_pass)) % 360
+
+    # Himalaya: within a degree of the former fixed 257° / 103°
+    assert aspect_deg(28, "ASCENDING") == pytest.approx(257, abs=1)
+    assert aspect_deg(28, "DESCENDING") == pytest.approx(103, abs=1)
+    # Equator: S1 ascending heading ~348°, i.e. aspect ~258°
+    assert aspect_deg(0, "ASCENDING") == pytest.approx(258, abs=1)
+    # High latitudes: the ground track turns west, a fixed constant is >10° off
+    assert aspect_deg(70, "ASCENDING") < 246 and aspect_deg(70, "DESCENDING") > 114
+    for lat in LATITUDES:
+        # Descending passes mirror ascending passes about north; hemispheres are symmetric
+        assert aspect_deg(lat, "ASCENDING") + aspect_deg(lat, "DESCENDING") == pytest.approx(360)
+        assert aspect_deg(-lat, "ASCENDING") == pytest.approx(aspect_deg(lat, "ASCENDING"))
+
+
+# ============================================================
+# ANALYTIC PLANES
+# ============================================================
+
+def test_plane_slope_and_aspect():
+    terrain = terrain_stack(_plane((40, 40), RES, 20, 135), RES, RES)
+    np.testing.assert_allclose(np.degrees(terrain["slope"][INTERIOR]), 20, atol=1e-9)
+    np.testing.assert_allclose(np.degrees(terrain["aspect"][INTERIOR]), 135, atol=1e-9)
+    # Like ee.Terrain, the outermost pixels have no slope
+    assert np.isnan(terrain["slope"][0]).all() and np.isnan(terrain["slope"][:, -1]).all()
+
+
+def test_flat_terrain_gamma0():
+    shape, angle = (40, 40), 35.0
+    flat = terrain_stack(np.full(shape, 1000.0), RES, RES)
+    gamma0_db, mask = radar_geometry(np.full(shape, -10.0), np.full(shape, angle), flat, "ASCENDING", LAT)
+    np.testing.assert_allclose(gamma0_db[INTERIOR], -10 - 10 * math.log10(math.cos(math.radians(angle))))
+    assert (mask[INTERIOR] == 1).all()
+
+
+@pytest.mark.parametrize("orbit_pass", ["ASCENDING", "DESCENDING"])
+def test_layover_and_shadow_planes(orbit_pass):
+    shape, angle = (40, 40), 35.0
+    vv, angles = np.full(shape, -10.0), np.full(shape, angle)
+    phi_i = math.degrees(angle_aspect(LAT, orbit_pass))
+
+    # Facing the sensor, steeper than the incidence angle: layover
+    _, mask, parts = radar_geometry(vv, angles, terrain_stack(_plane(shape, RES, 45, phi_i), RES, RES),
+                                    orbit_pass, LAT, details=True)
+    np.testing.assert_allclose(np.degrees(parts["alpha_r"][INTERIOR]), 45, atol=1e-9)
+    assert parts["layover"][INTERIOR].all() and (mask[INTERIOR] == 0).all()
+
+    # Facing away at 60°: local incidence 95° > 85°, shadow
+    _, mask, parts = radar_geometry(vv, angles, terrain_stack(_plane(shape, RES, 60, phi_i + 180), RES, RES),
+                                    orbit_pass, LAT, details=True)
+    np.testing.assert_allclose(np.degrees(parts["theta_lia"][INTERIOR]), angle + 60, atol=1e-9)
+    assert parts["shadow"][INTERIOR].all() and (mask[INTERIOR] == 0).all()
+
+
+def test_focal_median_matches_nanmedian():
+    rng = np.random.default_rng(0)
+    binary = (rng.random((30, 30)) < 0.5).astype(np.float64)
+    binary[rng.random(binary.shape) < 0.1] = np.nan
+    values = rng.normal(0, 1, binary.shape)
+    values[np.isnan(binary)] = np.nan
+    pad = FOCAL_RADIUS
+    for array in (binary, values):   # binary shortcut and general path
+        padded = np.pad(array, pad, constant_values=np.nan)
+        stack = np.stack([_shifted(padded, pad, dy, dx, array.shape) for dy, dx in disc_offsets(pad)])
+        np.testing.assert_array_equal(focal_median(array, pad), np.nanmedian(stack, axis=0))
+
+
+# ============================================================
+# SCENES
+# ============================================================
+
+@pytest.mark.parametrize("tracking", [False, True])
+def test_blocked_processing_matches_single_block(tmp_path, tracking):
+    inputs = []
+    for name, array in _scene_arrays(seed=1, size=(150, 170)).items():
+        inputs.append(str(tmp_path / f"{name}.tif"))
+        _write_raster(inputs[-1], array)
+    small = process_scene(*inputs, str(tmp_path / "small"), "DESCENDING", tracking=tracking, block=32)
+    whole = process_scene(*inputs, str(tmp_path / "whole"), "DESCENDING", tracking=tracking, block=170)
+    assert small["blocks"] > 1 and whole["blocks"] == 1
+    for band, path in small["paths"].items():
+        with rasterio.open(path) as a, rasterio.open(whole["paths"][band]) as b:
+            np.testing.assert_array_equal(a.read(1), b.read(1), err_msg=band)
+    assert compare(small["paths"]["gamma0_db"], whole["paths"]["gamma0_db"], 0)["passed"]
+
+
+@pytest.mark.parametrize("band", SCENE_BANDS)
+def test_regression_scene(tmp_path, band):
+    result = process_scene(*_scene_inputs(), str(tmp_path), SCENE_PASS, tracking=True, block=16)
+    assert result["latitude"] == pytest.approx(27.9, abs=0.1)
+    agreement = compare(result["paths"][band], os.path.join(SCENE_DIR, f"{band}_regression.tif"),
+                        DEFAULT_TOLERANCE)
+    assert agreement["passed"], agreement
+    assert agreement["n_offline_only"] == 0 and agreement["n_gee_only"] == 0
+
+
+@pytest.mark.parametrize("band", SCENE_BANDS)
+def test_gee_parity_scene(tmp_path, band):
+    gee_path = os.path.join(SCENE_DIR, f"{band}_gee.tif")
+    if not os.path.exists(gee_path):
+        pytest.skip(f"no Earth Engine export {os.path.basename(gee_path)}")
+    result = process_scene(*_scene_inputs(), str(tmp_path), SCENE_PASS, tracking=True)
+    agreement = compare(result["paths"][band], gee_path, DEFAULT_TOLERANCE)
+    assert agreement["passed"], agreement
+
+
+def test_regression_scene_exercises_every_class():
+    with rasterio.open(os.path.join(SCENE_DIR, "valid_mask_regression.tif")) as src:
+        mask = src.read(1)
+    with rasterio.open(os.path.join(SCENE_DIR, "VV_corrected_regression.tif")) as src:
+        corrected = src.read(1)
+    assert (mask == 0).any() and (mask == 1).any()
+    assert np.isfinite(corrected).any() and np.isnan(corrected).any()
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    os.makedirs(SCENE_DIR, exist_ok=True)
+    for name, array in _scene_arrays().items():
+        _write_raster(os.path.join(SCENE_DIR, f"{name}.tif"), array)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = process_scene(*_scene_inputs(), tmp, SCENE_PASS, tracking=True)["paths"]
+        for band in SCENE_BANDS:
+            with rasterio.open(paths[band]) as src:
+                _write_raster(os.path.join(SCENE_DIR, f"{band}_regression.tif"), src.read(1))
+    print(f"Scene written to {SCENE_DIR}")
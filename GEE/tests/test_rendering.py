@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""Frame cache shared by concurrent dashboard sessions."""
+
+import os
+import json
+import glob
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from rendering import FRAME_CACHE_DIR, build_frame_cache, cached_panel
+
+
+def _write_band(path, seed):
+    data = np.random.default_rng(seed).uniform(-25, 0, (40, 60)).astype(np.float32)
+    with rasterio.open(path, "w", driver="GTiff", width=60, height=40, count=1, dtype="float32",
+                       crs="EPSG:32645", transform=from_origin(500000, 3100000, 10, 10)) as dst:
+        dst.write(data, 1)
+
+
+def test_concurrent_sessions_keep_every_manifest_entry(tmp_path):
+    sources = []
+    for i in range(12):
+        sources.append(str(tmp_path / f"2025-06-{i + 1:02d}_VV_raw.tif"))
+        _write_band(sources[-1], i)
+    jobs = [(source, width) for source in sources for width in (120, 180)]
+
+    # Threads of one process, like Streamlit sessions sharing a PID
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        panels = list(pool.map(lambda job: cached_panel(str(tmp_path), job[0], "VV_raw", job[1]), jobs))
+
+    assert [p.width for p in panels] == [width for _, width in jobs]
+    cache_dir = tmp_path / FRAME_CACHE_DIR
+    with open(cache_dir / "manifest.json", encoding="utf-8") as f:
+        entries = json.load(f)["panels"]
+    assert set(entries) == {f"{os.path.basename(s)}@{w}" for s, w in jobs}
+    assert not glob.glob(str(cache_dir / "*.tmp"))
+
+
+def test_build_frame_cache_skips_cached_panels(tmp_path):
+    for i in range(3):
+        _write_band(str(tmp_path / f"2025-06-{i + 1:02d}_VV_raw.tif"), i)
+    assert build_frame_cache(str(tmp_path), widths=(100, 200)) == 3
+    assert build_frame_cache(str(tmp_path), widths=(100, 200)) == 0
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""Area time series from likelihood histograms and persistent lake IDs."""
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from reporting import compute_likelihood_histograms, areas_from_histograms
+
+RES = 10.0
+
+
+def _write_frame(path, data):
+    with rasterio.open(path, "w", driver="GTiff", width=data.shape[1], height=data.shape[0],
+                       count=1, dtype="float32", crs="EPSG:32645",
+                       transform=from_origin(500000, 3100000, RES, RES)) as dst:
+        dst.write(data.astype(np.float32), 1)
+
+
+def _square(shape, r0, c0, size, value=1.0):
+    data = np.zeros(shape)
+    data[r0:r0 + size, c0:c0 + size] = value
+    return data
+
+
+def _store(frame_dates, frame, n_bins=4):
+    """Histogram store with one lake of 10 full-likelihood pixels per row."""
+    cum = np.full((len(frame), n_bins + 1), 10)
+    return {
+        "frame_dates": np.array(frame_dates, dtype=str),
+        "frame": np.array(frame, dtype=np.int64),
+        "date": np.array([frame_dates[f] for f in frame], dtype=str),
+        "lake_id": np.zeros(len(frame), dtype=np.int64),
+        "pixel_area_km2": np.full(len(frame), 1e-4),
+        "weighted_sum": np.full(len(frame), 10.0),
+        "edges": np.arange(n_bins + 1) / n_bins,
+        "cum_counts": cum,
+        "lower_thresh": np.array(0.1),
+    }
+
+
+def test_same_day_frames_are_not_double_counted():
+    hist = _store(["2025-06-01", "2025-06-01", "2025-06-13"], [0, 1, 2])
+    df = areas_from_histograms(hist)
+    assert list(df["date"]) == ["2025-06-01", "2025-06-01", "2025-06-13"]
+    np.testing.assert_allclose(df["mean_area_km2"], 1e-3)
+
+
+def test_frames_without_clusters_have_zero_area():
+    hist = _store(["2025-06-01", "2025-06-07", "2025-06-13"], [0, 2])
+    df = areas_from_histograms(hist)
+    np.testing.assert_allclose(df["lower_area_km2"], [1e-3, 0, 1e-3])
+
+
+def test_store_without_frame_index_has_one_row_per_date():
+    hist = _store(["2025-06-01", "2025-06-01", "2025-06-13"], [0, 1, 2])
+    del hist["frame"]
+    df = areas_from_histograms(hist)
+    assert list(df["date"]) == ["2025-06-01", "2025-06-13"]
+
+
+def test_same_day_frames_from_rasters(tmp_path):
+    blob = _square((60, 60), 20, 20, 10)
+    _write_frame(tmp_path / "2025-06-01_a_lake_likelihood.tif", blob)
+    _write_frame(tmp_path / "2025-06-01_b_lake_likelihood.tif", blob)
+    df = areas_from_histograms(compute_likelihood_histograms(str(tmp_path)))
+    assert len(df) == 2
+    np.testing.assert_allclose(df["lower_area_km2"], 100 * RES * RES / 1e6)
+
+
+def test_new_lake_footprint_is_the_cluster_hull(tmp_path):
+    shape = (200, 200)
+    rows, cols = np.indices(shape)
+    stripe = ((np.abs(rows - cols) <= 2) & (rows >= 10) & (rows <= 150)).astype(float)
+    _write_frame(tmp_path / "2025-06-01_lake_likelihood.tif", stripe)
+    # Inside the stripe's bounding box, far from the stripe itself
+    _write_frame(tmp_path / "2025-06-13_lake_likelihood.tif",
+                 np.maximum(stripe, _square(shape, 120, 20, 10)))
+
+    hist = compute_likelihood_histograms(str(tmp_path))
+    second = hist["lake_id"][hist["frame"] == 1]
+    assert len(second) == 2 and len(set(second)) == 2
+    assert set(hist["lake_id"][hist["frame"] == 0]) < set(second)
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""Sidecar files of a run log shared by the pipeline Logger and the dashboard."""
+
+import json
+import os
+
+from run_files import events_path_for, status_path_for, write_status_file
+
+
+def test_status_file_next_to_log(tmp_path):
+    log = tmp_path / "pipeline_log_20250101_120000.txt"
+    assert status_path_for(str(log)) == str(tmp_path / "pipeline_log_20250101_120000_status.json")
+
+    write_status_file(str(log), "running", pid=1234)
+    write_status_file(str(log), "failed", "Cancelled by user.")
+    with open(status_path_for(str(log)), encoding="utf-8") as f:
+        status = json.load(f)
+    assert (status["status"], status["message"], status["pid"]) == ("failed", "Cancelled by user.", None)
+    assert os.listdir(tmp_path) == [os.path.basename(status_path_for(str(log)))]
+
+
+def test_events_file_next_to_log():
+    assert events_path_for(os.path.join("logs", "tracking_log_X.txt")) == os.path.join("logs", "tracking_log_X_events.jsonl")
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Skip-if-unchanged: a scheduled run reuses the previous outputs only when its input scenes match."""
+
+import os
+import datetime
+
+from lakedetection_headless import scene_fingerprint, reusable_run, write_fingerprint
+from scene_index import StaticSceneSource, _ms
+
+AOI = [[[86.8, 27.9], [86.95, 27.9], [86.95, 28.0], [86.8, 28.0], [86.8, 27.9]]]
+DAY = datetime.datetime(2025, 7, 9, 12)
+
+
+def _scene(scene_id, when, orbit_pass):
+    return {"id": scene_id, "time_ms": _ms(when), "orbit_pass": orbit_pass, "relative_orbit": 12,
+            "platform": "A", "footprint": None, "angle_min": 35.0, "angle_mean": 38.0, "angle_max": 41.0}
+
+
+def _previous_run(output_root, fingerprint, run_label="20250709_0600_27950_86875"):
+    """A completed run folder as run_pipeline leaves it."""
+    run_dir = os.path.join(output_root, "Outputs_2025-07-09_Khumbu")
+    os.makedirs(run_dir)
+    open(os.path.join(run_dir, f"z_score_{run_label}.tif"), "w").close()
+    write_fingerprint(run_dir, fingerprint=fingerprint, run_label=run_label, task_name="Khumbu",
+                      coord_tag="27950_86875", complete=True, created="2025-07-09T06:00:00")
+    return run_dir
+
+
+def test_unchanged_scenes_reuse_previous_run(tmp_path):
+    source = StaticSceneSource([
+        _scene("S1A_ASC_1", DAY - datetime.timedelta(days=3), "ASCENDING"),
+        _scene("S1A_DESC_1", DAY - datetime.timedelta(days=16), "DESCENDING"),
+    ])
+    first = scene_fingerprint(str(tmp_path), AOI, DAY, source=source)
+    assert first["asc_recent"] == ["S1A_ASC_1"] and first["desc_earlier"] == ["S1A_DESC_1"]
+    run_dir = _previous_run(str(tmp_path), first)
+
+    # Next day, nothing new acquired: same scenes in both windows, same DOY bin
+    second = scene_fingerprint(str(tmp_path), AOI, DAY + datetime.timedelta(days=1), source=source)
+    assert second == first
+    prev_dir, prev = reusable_run(str(tmp_path), "Khumbu", "27950_86875", second)
+    assert prev_dir == run_dir and prev["run_label"] == "20250709_0600_27950_86875"
+
+
+def test_new_scene_rebuilds(tmp_path):
+    source = StaticSceneSource([_scene("S1A_ASC_1", DAY - datetime.timedelta(days=3), "ASCENDING")])
+    _previous_run(str(tmp_path), scene_fingerprint(str(tmp_path), AOI, DAY, source=source))
+
+    source.scenes.append(_scene("S1A_DESC_2", DAY + datetime.timedelta(hours=6), "DESCENDING"))
+    changed = scene_fingerprint(str(tmp_path), AOI, DAY + datetime.timedelta(days=1), source=source)
+    assert changed["desc_recent"] == ["S1A_DESC_2"]
+    assert reusable_run(str(tmp_path), "Khumbu", "27950_86875", changed) == (None, None)
+
+
+def test_missing_outputs_rebuild(tmp_path):
+    source = StaticSceneSource([_scene("S1A_ASC_1", DAY - datetime.timedelta(days=3), "ASCENDING")])
+    fingerprint = scene_fingerprint(str(tmp_path), AOI, DAY, source=source)
+    run_dir = _previous_run(str(tmp_path), fingerprint)
+    os.remove(os.path.join(run_dir, "z_score_20250709_0600_27950_86875.tif"))
+    assert reusable_run(str(tmp_path), "Khumbu", "27950_86875", fingerprint) == (None, None)
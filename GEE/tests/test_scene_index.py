@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""Incremental refreshes of the local scene index and the mosaic window counts taken from it."""
+
+import datetime
+
+import scene_index
+from scene_index import StaticSceneSource, LAG_DAYS, DEFAULT_HISTORY_DAYS, _ms
+from lakedetection_headless import scene_fingerprint, window_sizes_from_fingerprint, MOSAIC_SPAN_DAYS
+from baseline import aoi_tag
+
+AOI = [[[86.8, 27.9], [86.95, 27.9], [86.95, 28.0], [86.8, 28.0], [86.8, 27.9]]]
+ELSEWHERE = {"type": "Polygon", "coordinates": [[[10.0, 46.0], [10.1, 46.0], [10.1, 46.1],
+                                                 [10.0, 46.1], [10.0, 46.0]]]}
+KEY = "khumbu"
+NOW = datetime.datetime(2025, 7, 20)
+DAY = datetime.timedelta(days=1)
+
+
+def _scene(scene_id, when, orbit_pass="ASCENDING", footprint=None):
+    return {"id": scene_id, "time_ms": _ms(when), "orbit_pass": orbit_pass, "relative_orbit": 12,
+            "platform": "A", "footprint": footprint, "angle_min": 35.0, "angle_mean": 38.0,
+            "angle_max": 41.0}
+
+
+def _archive():
+    """One scene every six days over the last two years, alternating orbit passes."""
+    scenes = []
+    for i in range(120):
+        when = NOW - DAY * (6 * i + 1)
+        scenes.append(_scene(f"S1_{i:03d}", when, "ASCENDING" if i % 2 else "DESCENDING"))
+    scenes.append(_scene("S1_OTHER_AOI", NOW - DAY * 2, footprint=ELSEWHERE))
+    return scenes
+
+
+def test_first_refresh_covers_default_history(tmp_path):
+    source = StaticSceneSource(_archive())
+    fetched = scene_index.refresh(str(tmp_path), KEY, AOI, source=source, until=NOW)
+    assert source.calls == [(NOW - DAY * DEFAULT_HISTORY_DAYS, NOW)]
+    assert fetched == 20   # scenes 1, 7, ..., 115 days back; the other AOI's scene is filtered out
+    assert scene_index.covered_range(str(tmp_path), KEY) == (NOW - DAY * DEFAULT_HISTORY_DAYS, NOW)
+
+
+def test_forward_refresh_refetches_lag(tmp_path):
+    source = StaticSceneSource(_archive())
+    scene_index.refresh(str(tmp_path), KEY, AOI, source=source, until=NOW - DAY * 10)
+    source.calls.clear()
+
+    # A scene acquired before the last refresh but ingested after it is picked up
+    source.scenes.append(_scene("S1_LATE", NOW - DAY * 12))
+    scene_index.refresh(str(tmp_path), KEY, AOI, source=source, until=NOW)
+    assert source.calls == [(NOW - DAY * (10 + LAG_DAYS), NOW)]
+    assert "S1_LATE" in scene_index.scene_ids(str(tmp_path), KEY, NOW - DAY * 13, NOW, "ASCENDING")
+    assert scene_index.covered_range(str(tmp_path), KEY)[1] == NOW
+
+
+def test_refresh_within_covered_range_fetches_nothing_new(tmp_path):
+    source = StaticSceneSource(_archive())
+    scene_index.refresh(str(tmp_path), KEY, AOI, source=source, until=NOW)
+    source.calls.clear()
+    scene_index.refresh(str(tmp_path), KEY, AOI, source=source, until=NOW - DAY * 30)
+    assert source.calls == []
+
+
+def test_start_extends_backwards(tmp_path):
+    source = StaticSceneSource(_archive())
+    scene_index.refresh(str(tmp_path), KEY, AOI, source=source, until=NOW)
+    source.calls.clear()
+
+    start = NOW - DAY * 400
+    scene_index.refresh(str(tmp_path), KEY, AOI, source=source, until=NOW, start=start)
+    assert source.calls[0] == (start, NOW - DAY * DEFAULT_HISTORY_DAYS)
+    assert scene_index.covered_range(str(tmp_path), KEY) == (start, NOW)
+    assert len(scene_index.scenes(str(tmp_path), KEY, start, NOW)) == 67   # 1 ... 397 days back
+
+
+def test_scene_ids_filter_window_and_orbit(tmp_path):
+    scene_index.refresh(str(tmp_path), KEY, AOI, source=StaticSceneSource(_archive()), until=NOW)
+    # [start, end): the scene 25 days back is in, the one 7 days back is not
+    start, end = NOW - DAY * 25, NOW - DAY * 7
+    assert scene_index.scene_ids(str(tmp_path), KEY, start, end, "ASCENDING") == ["S1_003"]
+    assert scene_index.scene_ids(str(tmp_path), KEY, start, end, "DESCENDING") == ["S1_002", "S1_004"]
+    assert scene_index.scene_ids(str(tmp_path), KEY, NOW - DAY * 7, NOW, "ASCENDING") == ["S1_001"]
+
+
+def test_historical_fingerprint_indexes_its_windows(tmp_path):
+    root = str(tmp_path)
+    source = StaticSceneSource(_archive())
+    scene_index.refresh(root, aoi_tag(AOI), AOI, source=source, until=NOW)
+
+    # A run for a date a year back: its windows lie before the covered range
+    ref_date = NOW - DAY * 365
+    assert window_sizes_from_fingerprint(root, AOI, ref_date, {}) is None
+    fingerprint = scene_fingerprint(root, AOI, ref_date, source=source)
+    sizes = window_sizes_from_fingerprint(root, AOI, ref_date, fingerprint)
+    # Scenes 367, 373, 379, 385 days back fall into the 25 days before the reference date
+    assert sizes == {"ASC recent": 1, "DESC recent": 1, "ASC earlier": 1, "DESC earlier": 1}
+    assert sum(sizes.values()) == len(scene_index.scenes(
+        root, aoi_tag(AOI), ref_date - DAY * MOSAIC_SPAN_DAYS, ref_date))
@@ -27,6 +27,8 @@ import shapely.geometry
 from shapely.geometry import mapping
 from shapely.ops import transform
 
+from gee_core import InfoBatch
+
 
 # ============================================================
 # AOI AND TERRAIN INPUTS
@@ -82,12 +84,32 @@ def load_dem(aoi, dem_source='JAXA/ALOS/AW3D30/V2_2'):
     return dem, slope, aspect, terrain_mask
 
 
+def glacier_geometry(aoi, buffer_m=200):
+    """
+    Lazy GLIMS glacier outline count and buffered glacier geometry within the AOI.
+
+    Nothing is requested from Earth Engine; resolve both together with the
+    other preflight values (gee_core.InfoBatch). The geometry is only valid
+    when the count is non-zero.
+
+    Returns
+    -------
+    (ee.Number, ee.Geometry)
+    """
+    rgi = ee.FeatureCollection("GLIMS/20230607").filterBounds(aoi)
+    buffered = rgi.map(lambda f: f.buffer(buffer_m))
+    geom = buffered.union().geometry().intersection(aoi)
+    return rgi.size(), geom
+
+
 def load_glacier_mask(aoi, buffer_m=200, output_dir="outputs"):
     """
     Load GLIMS glacier outlines within the AOI, buffer them, and return
     a single clipped ee.Geometry. Also exports the result as GeoJSON.
     Falls back to the AOI itself if no glacier outlines are found.
 
+    The outline count and the geometry are fetched in one request.
+
     Parameters
     ----------
     aoi : ee.Geometry
@@ -100,20 +122,19 @@ def load_glacier_mask(aoi, buffer_m=200, output_dir="outputs"):
     -------
     ee.Geometry
     """
-    rgi = ee.FeatureCollection("GLIMS/20230607").filterBounds(aoi)
+    n_glaciers, geom = glacier_geometry(aoi, buffer_m)
+    info = InfoBatch()
+    info.add("n_glaciers", n_glaciers)
+    info.add("geojson", ee.Algorithms.If(n_glaciers.gt(0), geom, None))
+    values = info.resolve()
 
-    if rgi.size().getInfo() == 0:
+    if values["n_glaciers"] == 0:
         print("Warning: no glacier outlines found in AOI — skipping glacier mask and thinning correction.", flush=True)
         return None
 
-    buffered = rgi.map(lambda f: f.buffer(buffer_m))
-    unioned = buffered.union().geometry()
-    geom = unioned.intersection(aoi)
-
     os.makedirs(output_dir, exist_ok=True)
-    shapely_glacier_geom = ee_to_shapely(geom)
     export_glacier_polygon(
-        shapely_glacier_geom,
+        shapely.geometry.shape(values["geojson"]),
         crs_epsg=4326,
         output_path=os.path.join(output_dir, "glacier_geom.geojson")
     )
@@ -130,6 +151,13 @@ def ee_to_shapely(ee_geom):
     return shapely.geometry.shape(geojson)
 
 
+def as_shapely(geom):
+    """Shapely geometry as is; ee.Geometry fetched with one getInfo."""
+    if isinstance(geom, shapely.geometry.base.BaseGeometry):
+        return geom
+    return ee_to_shapely(geom)
+
+
 def export_glacier_polygon(shapely_geom, crs_epsg=4326, output_path="glacier_geom.geojson"):
     """Export a Shapely geometry as GeoJSON or Shapefile."""
     gdf = gpd.GeoDataFrame({"geometry": [shapely_geom]}, crs=f"EPSG:{crs_epsg}")
@@ -159,10 +187,14 @@ def lonlat_to_tilename(lon, lat):
 
 
 def get_tile_names_for_geometry(geom):
-    """Return the set of Hugonnet tile names intersecting an ee.Geometry."""
-    coords = geom.bounds().coordinates().get(0).getInfo()
-    xs = [pt[0] for pt in coords]
-    ys = [pt[1] for pt in coords]
+    """Return the set of Hugonnet tile names intersecting an ee.Geometry or Shapely geometry."""
+    if isinstance(geom, shapely.geometry.base.BaseGeometry):
+        min_x, min_y, max_x, max_y = geom.bounds
+        xs, ys = [min_x, max_x], [min_y, max_y]
+    else:
+        coords = geom.bounds().coordinates().get(0).getInfo()
+        xs = [pt[0] for pt in coords]
+        ys = [pt[1] for pt in coords]
     tiles = set()
     for lat in range(math.floor(min(ys)), math.ceil(max(ys))):
         for lon in range(math.floor(min(xs)), math.ceil(max(xs))):
@@ -195,10 +227,10 @@ def download_tiff_tile(tile_url, download_path):
 
 
 def clip_raster_to_aoi(raster_path, aoi_geom):
-    """Clip a raster to an ee.Geometry AOI, reprojecting the AOI to the raster CRS."""
+    """Clip a raster to an ee.Geometry or Shapely AOI, reprojecting the AOI to the raster CRS."""
     import pyproj
 
-    sh_aoi_geom = ee_to_shapely(aoi_geom)
+    sh_aoi_geom = as_shapely(aoi_geom)
 
     with rasterio.open(raster_path) as src:
         project_to_raster_crs = pyproj.Transformer.from_crs(
@@ -249,7 +281,9 @@ def get_glacier_thinning_correction(aoi_geom, sar_year, dem, dem_year=2000,
 
     Parameters
     ----------
-    aoi_geom : ee.Geometry
+    aoi_geom : ee.Geometry or shapely geometry
+        Fetched once if an ee.Geometry; pass the Shapely geometry when it is
+        already known locally to avoid the request.
     sar_year : int
         Target SAR acquisition year for scaling.
     dem : ee.Image
@@ -269,6 +303,7 @@ def get_glacier_thinning_correction(aoi_geom, sar_year, dem, dem_year=2000,
     os.makedirs(cache_dir, exist_ok=True)
     os.makedirs(output_dir, exist_ok=True)
 
+    aoi_geom = as_shapely(aoi_geom)
     tile_names = get_tile_names_for_geometry(aoi_geom)
     print(f"Tiles intersecting AOI: {tile_names}")
 
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+THAW - Tile pyramid module
+
+Pre-renders the map layers of a lake detection run (z_score, potential_water,
+mean_diff COGs) into Web-Mercator XYZ tile pyramids at the end of the
+pipeline, so the dashboard opens a finished run without any raster work.
+
+Layout inside the run's output folder:
+
+    tiles/manifest.json              — per layer: source COG, mtime, vis params, zoom range
+    tiles/{layer}/{z}/{x}/{y}.png    — 256 px RGBA tiles (fully empty tiles are not written)
+
+Layers are built in parallel and skipped when the source COG and the
+visualisation parameters are unchanged. The dashboard tile server serves
+pyramid tiles directly and renders zoom levels outside the pyramid on demand.
+"""
+
+import os
+import glob
+import json
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+from rio_tiler.io import Reader
+from rio_tiler.errors import TileOutsideBounds
+
+from rendering import VIS_BY_LAYER, colorize
+
+TILES_DIR = "tiles"
+TILE_SIZE = 256
+_MANIFEST = "manifest.json"
+
+
+# ============================================================
+# TILE RENDERING
+# ============================================================
+
+def render_tile(src, x, y, z, vis_min, vis_max, palette, mask_below_zero=False):
+    """
+    Render one XYZ tile of an open rio-tiler Reader as PNG bytes.
+
+    Returns None when the tile lies outside the raster or holds no valid pixels.
+    """
+    try:
+        img = src.tile(x, y, z, tilesize=TILE_SIZE, indexes=1, resampling_method="bilinear")
+    except TileOutsideBounds:
+        return None
+    data = img.data[0].astype(np.float32, copy=False)
+    data[img.mask == 0] = np.nan
+    if mask_below_zero:
+        data[data < 0] = np.nan
+    if np.isnan(data).all():
+        return None
+    buf = BytesIO()
+    Image.fromarray(colorize(data, palette, vis_min, vis_max, alpha=True), mode="RGBA").save(
+        buf, format="PNG", compress_level=1)
+    return buf.getvalue()
+
+
+def _layer_of(tif_path):
+    basename = os.path.basename(tif_path)
+    return next((k for k in VIS_BY_LAYER if k in basename), None)
+
+
+def _layer_spec(tif_path, vis):
+    return {
+        "source": os.path.basename(tif_path),
+        "mtime": os.path.getmtime(tif_path),
+        "vis": {k: vis[k] for k in ("min", "max", "palette")},
+        "mask_below_zero": bool(vis.get("mask_below_zero", False)),
+    }
+
+
+# ============================================================
+# PYRAMID BUILD
+# ============================================================
+
+def build_layer_pyramid(tif_path, layer_dir, vis):
+    """
+    Write the XYZ pyramid of one COG between its native min and max zoom.
+
+    Parameters
+    ----------
+    tif_path : str
+        Source COG.
+    layer_dir : str
+        Output folder; tiles are written to layer_dir/{z}/{x}/{y}.png.
+    vis : dict
+        Visualisation parameters (min, max, palette, optional mask_below_zero).
+
+    Returns
+    -------
+    dict
+        Zoom range, WGS84 bounds and number of tiles written.
+    """
+    n_tiles = 0
+    with Reader(tif_path) as src:
+        minzoom, maxzoom = src.minzoom, src.maxzoom
+        bounds = src.get_geographic_bounds(src.tms.rasterio_geographic_crs)
+        for t in src.tms.tiles(*bounds, zooms=range(minzoom, maxzoom + 1)):
+            png = render_tile(src, t.x, t.y, t.z, vis["min"], vis["max"], vis["palette"],
+                              vis.get("mask_below_zero", False))
+            if png is None:
+                continue
+            tile_dir = os.path.join(layer_dir, str(t.z), str(t.x))
+            os.makedirs(tile_dir, exist_ok=True)
+            with open(os.path.join(tile_dir, f"{t.y}.png"), "wb") as f:
+                f.write(png)
+            n_tiles += 1
+    return {"minzoom": minzoom, "maxzoom": maxzoom, "bounds": list(bounds), "tiles": n_tiles}
+
+
+def load_tile_manifest(output_dir):
+    """Return the tile manifest of a run folder ({} if there is none)."""
+    try:
+        with open(os.path.join(output_dir, TILES_DIR, _MANIFEST), "r", encoding="utf-8") as f:
+            return json.load(f).get("layers", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def pyramid_for(tif_path, vis):
+    """
+    Manifest entry of an up-to-date pyramid for tif_path and vis, or None.
+
+    The entry gains a "dir" key with the absolute layer tile folder.
+    """
+    layer = _layer_of(tif_path)
+    output_dir = os.path.dirname(os.path.abspath(tif_path))
+    entry = load_tile_manifest(output_dir).get(layer) if layer else None
+    if not entry or {k: entry.get(k) for k in ("source", "mtime", "vis", "mask_below_zero")} \
+            != _layer_spec(tif_path, vis):
+        return None
+    return dict(entry, dir=os.path.join(output_dir, TILES_DIR, layer))
+
+
+def _build_one(tif_path, tiles_root, layer, vis):
+    """Build a layer pyramid in a temporary folder and swap it into place."""
+    final_dir = os.path.join(tiles_root, layer)
+    tmp_dir = f"{final_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    info = build_layer_pyramid(tif_path, tmp_dir, vis)
+    shutil.rmtree(final_dir, ignore_errors=True)
+    os.replace(tmp_dir, final_dir)
+    return info
+
+
+def build_output_tiles(output_dir, max_workers=None):
+    """
+    Pre-render tile pyramids for every map layer COG of a run folder.
+
+    Layers whose source COG (name and mtime) and visualisation parameters
+    match the manifest are skipped; the others are rebuilt in parallel.
+
+    Parameters
+    ----------
+    output_dir : str
+        Run folder containing the *_cog.tif layers.
+    max_workers : int, optional
+        Thread pool size (default: one thread per layer).
+
+    Returns
+    -------
+    dict
+        {layer: "built" | "unchanged" | "failed: <error>"}
+    """
+    tiles_root = os.path.join(output_dir, TILES_DIR)
+    os.makedirs(tiles_root, exist_ok=True)
+    manifest = load_tile_manifest(output_dir)
+
+    todo, status = {}, {}
+    for tif_path in sorted(glob.glob(os.path.join(output_dir, "*_cog.tif"))):
+        layer = _layer_of(tif_path)
+        if layer is None:
+            continue
+        vis = VIS_BY_LAYER[layer]
+        if pyramid_for(tif_path, vis) is not None and os.path.isdir(os.path.join(tiles_root, layer)):
+            status[layer] = "unchanged"
+        else:
+            todo[layer] = tif_path
+
+    if todo:
+        with ThreadPoolExecutor(max_workers=max_workers or len(todo)) as pool:
+            futures = {layer: pool.submit(_build_one, tif_path, tiles_root, layer, VIS_BY_LAYER[layer])
+                       for layer, tif_path in todo.items()}
+            for layer, future in futures.items():
+                try:
+                    info = future.result()
+                except Exception as e:
+                    manifest.pop(layer, None)
+                    status[layer] = f"failed: {e}"
+                    continue
+                manifest[layer] = dict(_layer_spec(todo[layer], VIS_BY_LAYER[layer]),
+                                       format="png", **info)
+                status[layer] = "built"
+
+        path = os.path.join(tiles_root, _MANIFEST)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"layers": manifest}, f, indent=1)
+        os.replace(tmp, path)
+
+    return status
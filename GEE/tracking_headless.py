@@ -16,6 +16,7 @@ import json
 import datetime
 from pathlib import Path
 import re
+from shapely.geometry import shape
 
 # Path resolution for local imports
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -24,6 +25,7 @@ if SCRIPT_DIR not in sys.path:
     
 # Local imports
 from gee_core import (
+    InfoBatch,
     preprocess_s1_collection,
     compute_temporal_spatial_mean,
     apply_temporal_spatial_smoothing_by_orbit,
@@ -31,12 +33,14 @@ from gee_core import (
 )
 from thinning import (
     load_aoi,
-    load_glacier_mask,
+    glacier_geometry,
+    export_glacier_polygon,
     load_dem,
     get_glacier_thinning_correction,
 )
 from reporting import generate_lake_metrics_report
-from drive_io import Logger, export_images_via_drive, CancelledError
+from catalog import register_tracking_run
+from drive_io import Logger, export_images_via_drive, CancelledError, emit, stage, skip_stage
 from gee_auth import initialize_ee, build_drive_service
 
 
@@ -60,6 +64,7 @@ def retry(fn, label, max_attempts=5, base_wait=30):
                 raise
             wait = base_wait * (2 ** (attempt - 1))
             print(f"{label} failed (attempt {attempt}/{max_attempts}): {e}", flush=True)
+            emit("retry", label=label, attempt=attempt, max_attempts=max_attempts, wait_s=wait, error=str(e))
             print(f"Retrying in {wait}s...", flush=True)
             _time.sleep(wait)
 
@@ -86,6 +91,22 @@ def clear_checkpoint(out_dir):
         path.unlink()
 
 
+# ============================================================
+# EXPRESSION GRAPH
+# ============================================================
+def build_scored_collection(s1_preprocessed):
+    """
+    Smooth a preprocessed Sentinel-1 collection per orbit and add the
+    lake likelihood score; the collection exported by the pipeline.
+    """
+    s1_smoothed = apply_temporal_spatial_smoothing_by_orbit(
+        s1_preprocessed,
+        smoothing_fn=compute_temporal_spatial_mean,
+        smoothed_band_name="VV_smoothed",
+    )
+    return s1_smoothed.map(likelihood_score)
+
+
 # ============================================================
 # MAIN PROCESSING PIPELINE
 # ============================================================
@@ -133,6 +154,10 @@ def run_tracking_pipeline(config_path):
     # Write PID so dashboard can detect if this process dies
     pid_file = final_out_dir / "pipeline.pid"
     pid_file.write_text(str(os.getpid()))
+    emit("pipeline_start", pipeline="tracking", stages=2, task_name=task_name,
+         start_date=start_date, end_date=end_date)
+    output_root = str(_parent_out.parent)
+    register_tracking_run(output_root, final_out_dir_str)
 
     print("--- THAW Tracking Analysis Started ---", flush=True)
     print(f"Time Range:   {start_date} to {end_date}", flush=True)
@@ -145,14 +170,17 @@ def run_tracking_pipeline(config_path):
     if ckpt and "download" in ckpt.get("steps_complete", []):
         print(f"Resuming incomplete tracking pipeline from checkpoint.", flush=True)
         done = ckpt.get("steps_complete", [])
+        skip_stage("download", 1, 2)
         if "reporting" not in done:
             print("Step 2/2: Generating lake metrics report...", flush=True)
-            retry(
-                lambda: generate_lake_metrics_report(output_dir=final_out_dir_str),
-                label="Reporting", max_attempts=3, base_wait=10,
-            )
+            with stage("reporting", 2, 2):
+                retry(
+                    lambda: generate_lake_metrics_report(output_dir=final_out_dir_str),
+                    label="Reporting", max_attempts=3, base_wait=10,
+                )
             done.append("reporting")
             write_checkpoint(final_out_dir_str, steps_complete=done)
+        register_tracking_run(output_root, final_out_dir_str)
         clear_checkpoint(final_out_dir_str)
         try:
             pid_file.unlink(missing_ok=True)
@@ -170,14 +198,41 @@ def run_tracking_pipeline(config_path):
 # SPATIAL AND TERRAIN INPUTS
 # ============================================================
     aoi          = load_aoi(aoi_input)
-    glacier_geom = load_glacier_mask(aoi, buffer_m=100, output_dir=final_out_dir_str)
     dem, slope_rad, aspect, terrain_mask = load_dem(aoi)
 
-    if glacier_geom is None:
+    # Preflight: glacier outline count, glacier geometry and the number of
+    # scenes over the analysis area are fetched in a single request
+    n_glaciers, glacier = glacier_geometry(aoi, buffer_m=100)
+    has_glacier = n_glaciers.gt(0)
+    analysis_geom = ee.Geometry(ee.Algorithms.If(has_glacier, glacier, aoi))
+    info = InfoBatch()
+    info.add("n_glaciers", n_glaciers)
+    info.add("glacier_geojson", ee.Algorithms.If(has_glacier, glacier, None))
+    info.add("n_images", preprocess_s1_collection(
+        analysis_geom, start_date, end_date,
+        slope_rad, dem, aspect, analysis_geom, terrain_mask,
+    ).size())
+    preflight = info.resolve()
+
+    img_count = preflight["n_images"]
+    print(f"Found {img_count} Sentinel-1 images.", flush=True)
+    if img_count == 0:
+        print("WARNING: No imagery found for the specified period. Terminating.", flush=True)
+        return "No imagery found."
+
+    if preflight["n_glaciers"] == 0:
+        print("Warning: no glacier outlines found in AOI — skipping glacier mask and thinning correction.", flush=True)
+        glacier_geom = None
         refined_aoi = aoi
         thinning_correction = 0.0
         print("No glacier mask — thinning correction set to 0.", flush=True)
     else:
+        glacier_geom = glacier
+        glacier_shape = shape(preflight["glacier_geojson"])
+        export_glacier_polygon(
+            glacier_shape, crs_epsg=4326,
+            output_path=os.path.join(final_out_dir_str, "glacier_geom.geojson"),
+        )
         print("Clipping analysis to buffered glacier geometry...", flush=True)
         refined_aoi = glacier_geom
 
@@ -187,7 +242,7 @@ def run_tracking_pipeline(config_path):
             target_year = datetime.datetime.now().year
 
         thinning_correction = float(get_glacier_thinning_correction(
-            refined_aoi, target_year, dem,
+            glacier_shape, target_year, dem,
             cache_dir=str(thinning_cache_dir),
             output_dir=final_out_dir_str,
         ))
@@ -205,20 +260,7 @@ def run_tracking_pipeline(config_path):
         terrain_mask, thinning_correction,
     )
 
-    img_count = s1_preprocessed.size().getInfo()
-    print(f"Found and preprocessed {img_count} Sentinel-1 images.", flush=True)
-
-    if img_count == 0:
-        print("WARNING: No imagery found for the specified period. Terminating.", flush=True)
-        return "No imagery found."
-
-    s1_smoothed = apply_temporal_spatial_smoothing_by_orbit(
-        s1_preprocessed,
-        smoothing_fn=compute_temporal_spatial_mean,
-        smoothed_band_name="VV_smoothed",
-    )
-
-    s1_scored = s1_smoothed.map(likelihood_score)
+    s1_scored = build_scored_collection(s1_preprocessed)
 
 
 # ============================================================
@@ -238,21 +280,23 @@ def run_tracking_pipeline(config_path):
         _center_lat = (aoi_input[1] + aoi_input[3]) / 2
         coord_tag = f"{int(round(_center_lat * 1000))}_{int(round(_center_lon * 1000))}"
         prefix = f"{task_name}_{submission_date}_{coord_tag}"
-        retry(
-            lambda: export_images_via_drive(
-                s1_scored,
-                aoi,
-                token_path=cfg.get("drive_token_path"),
-                bands_to_export=bands,
-                output_dir=final_out_dir_str,
-                prefix=prefix,
-            ),
-            label="Download",
-        )
+        with stage("download", 1, 2):
+            retry(
+                lambda: export_images_via_drive(
+                    s1_scored,
+                    aoi,
+                    token_path=cfg.get("drive_token_path"),
+                    bands_to_export=bands,
+                    output_dir=final_out_dir_str,
+                    prefix=prefix,
+                ),
+                label="Download",
+            )
         done.append("download")
         write_checkpoint(final_out_dir_str, steps_complete=done)
     else:
         print("Step 1/2: Download already complete, skipping.", flush=True)
+        skip_stage("download", 1, 2)
 
 
 # ============================================================
@@ -260,17 +304,20 @@ def run_tracking_pipeline(config_path):
 # ============================================================
     if "reporting" not in done:
         print("Step 2/2: Generating lake metrics report...", flush=True)
-        retry(
-            lambda: generate_lake_metrics_report(output_dir=final_out_dir_str),
-            label="Reporting",
-            max_attempts=3,
-            base_wait=10,
-        )
+        with stage("reporting", 2, 2):
+            retry(
+                lambda: generate_lake_metrics_report(output_dir=final_out_dir_str),
+                label="Reporting",
+                max_attempts=3,
+                base_wait=10,
+            )
         done.append("reporting")
         write_checkpoint(final_out_dir_str, steps_complete=done)
     else:
         print("Step 2/2: Reporting already complete, skipping.", flush=True)
+        skip_stage("reporting", 2, 2)
 
+    register_tracking_run(output_root, final_out_dir_str)
     clear_checkpoint(final_out_dir_str)
     try:
         pid_file.unlink(missing_ok=True)